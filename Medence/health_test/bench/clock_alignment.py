@@ -0,0 +1,99 @@
+"""设备时钟对齐仿真：对齐后的读数时刻与只用到达时刻相比的误差，以及漂移估计误差
+
+模拟一台按自身晶振定时采样的设备：晶振相对主机偏快 --drift-ppm，每条读数带 ticks_ms（或只带序号 seq），
+经过 --latency-ms 的固定延迟加指数分布的排队延迟（均值 --jitter-ms）到达，主机每 --poll-ms 读取一次
+（定时器每次推迟 0 ~ --poll-jitter-ms），同一次读取到的读数共用一个到达时刻（与 SerialSource 相同）。
+采样周期恰为读取间隔整数倍时，量化误差随晶振漂移极慢地变化，设 --poll-jitter-ms 0 可观察这种最坏情况。
+对每条读数比较两种时刻与真实采样时刻之差：
+    arrival  只用 host_ns（到达时刻）
+    aligned  ClockAligner 对齐后的 device_ns
+固定延迟无法从单向数据中得知，误差去掉中位数后再统计，即读数之间相对时刻的误差。
+
+用法: python bench/clock_alignment.py [--minutes 30] [--rates 10,50] [--drift-ppm 80]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from common.clock import DEVICE_CLOCKS, DeviceTiming
+from common.timing import percentiles
+
+MS = 1_000_000
+
+
+def poll_instant(k, args, start):
+    """第 k 次读取的时刻：定时器标称时刻加上该次的推迟"""
+    delay = random.Random(k).random() * args.poll_jitter_ms * MS
+    return start + k * args.poll_ms * MS + delay
+
+
+def simulate(rate, clock, args, seed):
+    rng = random.Random(seed)
+    timing = DeviceTiming()
+    period = 1e9 / rate
+    poll = args.poll_ms * MS
+    count = int(args.minutes * 60 * rate)
+    start = 10**12  # monotonic_ns 的任意起点
+    # 设备按自身晶振每 period 采样一次；晶振偏快时真实间隔更短、同样的真实时间内计数更多
+    speed = 1 + args.drift_ppm * 1e-6
+    arrivals = []
+    for n in range(count):
+        true_ns = start + n * period / speed + rng.gauss(0, 0.05 * MS)
+        arrived = true_ns + args.latency_ms * MS + rng.expovariate(1 / (args.jitter_ms * MS))
+        k = int(-(-(arrived - start) // poll))   # 下一次读取时才拿到
+        host_ns = poll_instant(k, args, start)
+        if host_ns < arrived:
+            host_ns = poll_instant(k + 1, args, start)
+        ticks = int((true_ns - start) / 1e6 * speed) if clock == "ticks_ms" else n
+        arrivals.append((host_ns, true_ns, ticks))
+    arrivals.sort()
+
+    naive, aligned = [], []
+    for host_ns, true_ns, ticks in arrivals:
+        device_ns = timing.observe(int(host_ns), clock, ticks)
+        naive.append((host_ns - true_ns) / MS)
+        if device_ns is not None:
+            aligned.append((device_ns - true_ns) / MS)
+    return spread(naive[len(naive) // 10:]), spread(aligned[len(aligned) // 10:]), timing
+
+
+def spread(errors):
+    """误差去掉中位数后的绝对值百分位（ms）；前 10% 为拟合预热，不计入"""
+    median = sorted(errors)[len(errors) // 2]
+    return percentiles([abs(e - median) for e in errors], (50, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--rates", default="10,50", help="设备采样速率（Hz），逗号分隔")
+    parser.add_argument("--drift-ppm", type=float, default=80)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--jitter-ms", type=float, default=3, help="排队延迟的均值")
+    parser.add_argument("--poll-ms", type=float, default=20, help="主机读取间隔")
+    parser.add_argument("--poll-jitter-ms", type=float, default=1, help="定时器每次推迟的上限")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"仿真 {args.minutes:g} 分钟，设备晶振 {args.drift_ppm:+g} ppm，延迟 {args.latency_ms:g} ms + "
+          f"指数({args.jitter_ms:g} ms)，每 {args.poll_ms:g}(+{args.poll_jitter_ms:g}) ms 读取一次")
+    print(f"{'速率':>6s} {'设备时钟':9s} {'到达时刻误差 ms（p50/p99）':>26s} {'对齐后误差 ms（p50/p99）':>26s} "
+          f"{'漂移估计 ppm':>12s}")
+    for rate in (float(r) for r in args.rates.split(",")):
+        for clock in ("ticks_ms", "seq"):
+            naive, aligned, timing = simulate(rate, clock, args, args.seed)
+            aligner = timing.aligner
+            if DEVICE_CLOCKS[clock]:
+                drift = f"{aligner.drift_ppm():+12.1f}"
+            else:
+                # 序号没有标称频率，按采样速率换算
+                drift = f"{(aligner.rate_hz() / rate - 1) * 1e6:+12.1f}"
+            print(f"{rate:5g}Hz {clock:9s} {naive['p50']:12.2f}/{naive['p99']:<12.2f} "
+                  f"{aligned['p50']:12.2f}/{aligned['p99']:<12.2f} {drift}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""色觉测试排序方式的仿真对比：固定全部图版 vs 自适应提前结束
+
+按人群先验抽取受试者真实类别，依 sequencer.P_CORRECT 模拟作答，
+统计平均题数、分类准确率以及每小时可完成的人数。
+用法: python bench/color_sequencer.py [--users N] [--seconds-per-plate S] [--overhead S]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLOR_DIR = os.path.join(HERE, "..", "scripts", "color")
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+sys.path.insert(0, COLOR_DIR)
+
+from sequencer import CLASSES, P_CORRECT, PRIOR, AdaptiveSequencer
+from test_bank import compile_manifest
+
+
+def simulate(bank, truth, adaptive, rng):
+    """返回 (作答题数, 判定类别)；固定模式只区分正常 / 异常"""
+    if adaptive:
+        sequencer = AdaptiveSequencer(bank, **bank.adaptive)
+        while (index := sequencer.next_plate()) is not None:
+            sequencer.record(index, rng.random() < P_CORRECT[bank[index].category][truth])
+        return len(sequencer.answers), sequencer.classification
+
+    score = sum(rng.random() < P_CORRECT[plate.category][truth] for plate in bank.plates)
+    return len(bank), "normal" if score >= bank.pass_score() else "abnormal"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--manifest", default=os.path.join(COLOR_DIR, "plates.json"))
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--seconds-per-plate", type=float, default=6.0)
+    parser.add_argument("--overhead", type=float, default=20.0, help="每人固定耗时（入座、说明、出结果）")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(args.manifest, encoding="utf-8") as f:
+        data = json.load(f)
+    bank = compile_manifest(data, os.path.dirname(os.path.abspath(args.manifest)))
+    if not bank.adaptive:
+        bank.adaptive = {}
+
+    rng = random.Random(args.seed)
+    population = rng.choices(CLASSES, weights=[PRIOR[c] for c in CLASSES], k=args.users)
+
+    print(f"题库 {len(bank)} 张，受试者 {args.users} 人，每张 {args.seconds_per_plate}s，每人固定 {args.overhead}s")
+    for name, adaptive in (("固定顺序", False), ("自适应", True)):
+        plates = []
+        binary_hits = 0
+        exact_hits = 0
+        for truth in population:
+            count, verdict = simulate(bank, truth, adaptive, rng)
+            plates.append(count)
+            binary_hits += (verdict == "normal") == (truth == "normal")
+            exact_hits += verdict == truth
+        seconds = args.overhead + statistics.mean(plates) * args.seconds_per_plate
+        line = (f"{name:6s} 平均 {statistics.mean(plates):5.2f} 张 (正常者 "
+                f"{statistics.mean(p for p, t in zip(plates, population) if t == 'normal'):4.2f} 张)  "
+                f"正常/异常判定准确率 {binary_hits / args.users:6.2%}  ")
+        if adaptive:
+            line += f"类型判定准确率 {exact_hits / args.users:6.2%}  "
+        print(line + f"吞吐 {3600 / seconds:6.1f} 人/小时")
+
+
+if __name__ == "__main__":
+    main()
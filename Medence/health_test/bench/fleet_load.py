@@ -0,0 +1,145 @@
+"""汇总服务压力测试：在本机启动 fleet/server.py，模拟多台终端并发上传后执行查询
+
+每台模拟终端是一个独立进程，用与 main.py 相同的 post_batch 上传 gzip 批次，
+其中约 1% 的批次会重传一次以检验去重。上传结束后核对入库条数，
+再随机执行按人员、按终端区间与按天聚合三类查询，报告吞吐与延迟百分位。
+
+用法: python bench/fleet_load.py [--kiosks 20] [--batches 50] [--batch-size 200] [--queries 300]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from common.timing import percentiles
+from common.uploader import post_batch
+
+DAY = 86400
+MODULES = ("height", "weight", "vitals", "color", "eyes")
+
+
+def make_result(rng, module):
+    if module == "height":
+        return {"height_cm": round(rng.gauss(168, 9), 1)}
+    if module == "weight":
+        return {"weight_g": round(rng.gauss(65000, 12000), 1)}
+    if module == "vitals":
+        return {"spo2": rng.randint(92, 100), "temp": round(rng.gauss(36.6, 0.3), 1), "bpm": rng.randint(55, 110)}
+    if module == "color":
+        score = rng.randint(8, 12)
+        return {"score": score, "asked": 12, "normal": score >= 10}
+    return {"left": round(rng.choice((0.6, 0.8, 1.0, 1.2)), 1), "right": round(rng.choice((0.6, 0.8, 1.0, 1.2)), 1),
+            "trials": rng.randint(10, 30), "total_ms": rng.randint(30000, 120000)}
+
+
+def kiosk(url, station, batches, batch_size, persons, start, seed):
+    """模拟一台终端，返回 (上传条数, 每批延迟 ms 列表)"""
+    rng = random.Random(seed)
+    sent, latencies = 0, []
+    for index in range(batches):
+        records = []
+        for _ in range(batch_size):
+            module = rng.choice(MODULES)
+            records.append({"id": f"{station}-{index}-{len(records)}",
+                            "person": f"P{rng.randrange(persons):05d}", "module": module,
+                            "ts": start + rng.uniform(0, 30 * DAY), "data": make_result(rng, module)})
+        began = time.perf_counter()
+        post_batch(url, station, records, timeout=30)
+        latencies.append((time.perf_counter() - began) * 1000)
+        sent += len(records)
+        if rng.random() < 0.01:
+            post_batch(url, station, records, timeout=30)  # 模拟确认丢失后的重传
+    return sent, latencies
+
+
+def get(url, path, **params):
+    query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+    with urllib.request.urlopen(f"{url}{path}?{query}", timeout=30) as response:
+        return json.loads(response.read())
+
+
+def start_server(db):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "fleet", "server.py"),
+                             "--host", "127.0.0.1", "--port", "0", "--db", db],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    match = re.search(r"http://[\d.]+:(\d+)", line)
+    if not match:
+        proc.kill()
+        raise RuntimeError(f"汇总服务启动失败: {line!r}")
+    return proc, f"http://127.0.0.1:{match.group(1)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kiosks", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=50, help="每台终端上传的批次数")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--persons", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--db", help="数据库路径，默认使用临时文件")
+    args = parser.parse_args()
+
+    db = args.db or os.path.join(tempfile.mkdtemp(prefix="health_fleet_"), "fleet.sqlite3")
+    proc, url = start_server(db)
+    start = time.time() - 30 * DAY
+    try:
+        began = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.kiosks) as pool:
+            futures = [pool.submit(kiosk, url, f"kiosk-{n:02d}", args.batches, args.batch_size,
+                                   args.persons, start, n) for n in range(args.kiosks)]
+            outcomes = [future.result() for future in futures]
+        elapsed = time.perf_counter() - began
+        sent = sum(count for count, _ in outcomes)
+        latencies = [ms for _, batch in outcomes for ms in batch]
+        health = get(url, "/healthz")
+        stored = sum(s["results"] for s in get(url, "/api/stations")["stations"])
+
+        print(f"上传: {args.kiosks} 台终端 × {args.batches} 批 × {args.batch_size} 条 = {sent} 条，"
+              f"{elapsed:.2f} s，{sent / elapsed:.0f} 条/秒")
+        print(f"每批延迟 ms: {percentiles(latencies)}")
+        print(f"写入事务 {health['commits']} 次 / 批次 {health['batches']}，去重 {health['duplicates']} 条，"
+              f"数据库 {os.path.getsize(db) / 1e6:.1f} MB（另有 WAL）")
+
+        rng = random.Random(0)
+        timings = {"person": [], "station_day": [], "aggregate": []}
+        for _ in range(args.queries):
+            kind = rng.choice(list(timings))
+            began = time.perf_counter()
+            if kind == "person":
+                get(url, "/api/results", person=f"P{rng.randrange(args.persons):05d}")
+            elif kind == "station_day":
+                day = start + rng.randrange(30) * DAY
+                get(url, "/api/results", station=f"kiosk-{rng.randrange(args.kiosks):02d}",
+                    since=day, until=day + DAY, limit=5000)
+            else:
+                module, metric = rng.choice((("height", "height_cm"), ("weight", "weight_g"), ("vitals", "spo2")))
+                get(url, "/api/aggregate", module=module, metric=metric, bucket=DAY,
+                    by="station" if rng.random() < 0.5 else None)
+            timings[kind].append((time.perf_counter() - began) * 1000)
+        for kind, values in timings.items():
+            print(f"查询 {kind:12s} {len(values):4d} 次，延迟 ms: {percentiles(values)}")
+    finally:
+        proc.send_signal(signal.SIGINT)  # 服务端收到后关闭写线程与数据库
+        proc.wait()
+
+    if stored != sent:
+        print(f"入库条数 {stored} 与上传条数 {sent} 不一致")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
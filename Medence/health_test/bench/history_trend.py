@@ -0,0 +1,94 @@
+"""受检者历史库基准：证件号查找、最近一次读数与多年趋势查询的延迟
+
+在临时目录中生成 --persons 人、每人 --visits 次检测（时间跨度 --years 年，
+各人的记录按时间交错写入，与真实终端一致），随后随机查询。
+趋势查询的 p99 超过一帧（默认 16 ms）时以非零状态退出。
+
+用法: python bench/history_trend.py [--persons 20000] [--visits 50] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+
+from common.history import HistoryStore
+from common.timing import percentiles
+
+YEAR = 365 * 86400
+
+
+def populate(store, persons, visits, years, rng):
+    ids = []
+    store.db.execute("BEGIN")
+    for n in range(persons):
+        person, _ = store.find_or_create(f"ID{n:08d}")
+        ids.append(person.id)
+    # 所有检测按时间排序后依次写入，各人的记录在日志中交错分布
+    start = time.time() - years * YEAR
+    events = sorted((start + rng.uniform(0, years * YEAR), person_id)
+                    for person_id in ids for _ in range(visits))
+    for ts, person_id in events:
+        store.start_session(person_id, ts)
+        store.record(person_id, "height", {"height_cm": rng.gauss(168, 9)}, ts)
+        store.record(person_id, "weight", {"weight_g": rng.gauss(65000, 12000)}, ts)
+    store.db.execute("COMMIT")
+    return len(events)
+
+
+def timed_ms(func, *args, **kwargs):
+    began = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - began) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persons", type=int, default=20000)
+    parser.add_argument("--visits", type=int, default=50, help="每人检测次数")
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--frame-ms", type=float, default=16.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="health_history_") as directory:
+        timings = run(args, directory)
+    for kind, values in timings.items():
+        print(f"{kind:10s} 延迟 ms: {percentiles(values)}")
+    worst = percentiles(timings["trend"])["p99"]
+    if worst > args.frame_ms:
+        print(f"趋势查询 p99 {worst:.2f} ms 超过一帧 {args.frame_ms} ms")
+        sys.exit(1)
+
+
+def run(args, directory):
+    rng = random.Random(1)
+    store = HistoryStore(directory)
+    began = time.perf_counter()
+    sessions = populate(store, args.persons, args.visits, args.years, rng)
+    print(f"生成 {args.persons} 人 × {args.visits} 次 = {sessions} 次检测，{time.perf_counter() - began:.1f} s")
+
+    # 重新打开，查询走冷启动后的映射
+    store.close()
+    store = HistoryStore(directory)
+    timings = {"find": [], "last": [], "trend": [], "trend_1y": []}
+    since = time.time() - YEAR
+    for _ in range(args.queries):
+        code = f"ID{rng.randrange(args.persons):08d}"
+        timings["find"].append(timed_ms(store.find, code))
+        person = store.find(code)
+        timings["last"].append(timed_ms(store.last, person.id, "weight.weight_g"))
+        timings["trend"].append(timed_ms(store.trend, person.id, "height.height_cm"))
+        timings["trend_1y"].append(timed_ms(store.trend, person.id, "height.height_cm", since=since))
+    ts, values = store.trend(person.id, "height.height_cm")
+    assert len(ts) == args.visits and all(ts[i] <= ts[i + 1] for i in range(len(ts) - 1))
+    store.close()
+    return timings
+
+
+if __name__ == "__main__":
+    main()
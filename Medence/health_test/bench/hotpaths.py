@@ -0,0 +1,277 @@
+"""热点路径微基准：串口解析、MQTT 消息入队、卡片绘制与色觉图版切换
+
+在 offscreen Qt 平台上无界面运行。身高 / 体重模块通过伪终端接收合成数据流，
+血氧模块的 MQTT 服务器指向本机不可达端口，只测消息处理本身。
+每个用例运行若干轮，每轮记录平均单次耗时；与保存的基线比较中位数，
+变慢超过阈值且 Mann-Whitney U 检验显著时判为退化，以非零状态退出。
+
+用法:
+    python bench/hotpaths.py --save            # 在目标机器上记录基线
+    python bench/hotpaths.py                   # 与基线比较
+    python bench/hotpaths.py --filter paint --rounds 15 --threshold 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import pty
+import random
+import select
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "scripts", "color"))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(HERE, "hotpaths_baseline.json")
+
+
+def write_config(directory, height_port, weight_port):
+    """基准专用配置：串口指向伪终端，MQTT 指向不可达端口"""
+    path = os.path.join(directory, "config.ini")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"[height]\nport = {height_port}\n\n"
+                f"[weight]\nport = {weight_port}\n\n"
+                "[vitals]\nbroker = 127.0.0.1\nport = 9\n")
+    return path
+
+
+def open_pty():
+    master, slave = pty.openpty()
+    return master, os.ttyname(slave), slave
+
+
+def feed(master, ser, line):
+    """写入一行合成数据，并等到它经过终端线路规程、在串口端可读"""
+    os.write(master, line.encode())
+    select.select([ser.fileno()], [], [], 1.0)
+
+
+def timed(func, *args):
+    start = time.perf_counter_ns()
+    func(*args)
+    return time.perf_counter_ns() - start
+
+
+class Bench:
+    """持有被测窗口与伪终端，每个用例是一个返回单次耗时（纳秒）的函数"""
+
+    def __init__(self, app, workdir):
+        self.app = app
+        self.rng = random.Random(1)
+        self.height_master, height_port, self.height_slave = open_pty()
+        self.weight_master, weight_port, self.weight_slave = open_pty()
+        os.environ["HEALTH_CONFIG"] = write_config(workdir, height_port, weight_port)
+        os.environ.pop("HEALTH_RESULT_SOCKET", None)
+
+        import main
+        import oil
+        from height_measure import HeightMonitor
+        from weight_measure import WeightMonitor
+
+        self.height = HeightMonitor()
+        self.weight = WeightMonitor()
+        self.vitals = oil.HealthMonitor()
+        self.launcher_card = main.GradientFrame("#FF6B6B", "#FF8E8E")
+        self.launcher_card.resize(260, 200)
+        for window in (self.height, self.weight, self.vitals):
+            window.show()
+        self.color = None
+        # 串口与 MQTT 在首帧绘制后才建立
+        deadline = time.monotonic() + 5
+        while None in (self.height.source, self.weight.source, self.vitals.source) and time.monotonic() < deadline:
+            app.processEvents()
+        self.vitals.spool_timer.stop()  # 由用例手动消化缓冲
+
+        self.cases = {
+            "height.read_data": self.height_read,
+            "weight.read_data": self.weight_read,
+            "vitals.on_message": self.vitals_on_message,
+            "vitals.drain": self.vitals_drain,
+            "paint.launcher_card": lambda: self.paint(self.launcher_card),
+            "paint.vitals_card": lambda: self.paint(self.vitals.spo2_card),
+            "paint.height_value": lambda: self.paint(self.height.height_value),
+            "paint.weight_value": self.paint_weight_value,
+            "color.plate_switch": self.plate_switch,
+        }
+
+    def close(self):
+        for window in (self.height, self.weight, self.vitals, self.color):
+            if window is not None:
+                window.close()
+        for fd in (self.height_master, self.height_slave, self.weight_master, self.weight_slave):
+            os.close(fd)
+
+    def height_read(self):
+        feed(self.height_master, self.height.source.ser, f"height: {self.rng.uniform(150, 190):.1f} cm\r\n")
+        return timed(self.height.read_data)
+
+    def weight_read(self):
+        feed(self.weight_master, self.weight.source.ser, f"Weight: {self.rng.uniform(40000, 90000):.1f} g\r\n")
+        return timed(self.weight.read_data)
+
+    def vitals_payload(self):
+        return json.dumps({"spo2": self.rng.randint(94, 99),
+                           "temp": round(self.rng.uniform(36.0, 37.2), 1),
+                           "ts": time.time()}).encode()
+
+    def vitals_on_message(self):
+        payload = self.vitals_payload()
+        ns = timed(self.vitals.source.on_message, "sensor/combined", payload)
+        if len(self.vitals.spool) > 5000:
+            self.vitals.spool.drain(10000)
+        return ns
+
+    def vitals_drain(self):
+        """消化一条缓冲读数（落盘不计时）"""
+        self.vitals.spool.put("sensor/combined", self.vitals_payload())
+        return timed(self.vitals.drain_spool)
+
+    def paint(self, widget):
+        from PyQt5.QtGui import QImage
+        image = QImage(widget.size(), QImage.Format_ARGB32_Premultiplied)
+        return timed(widget.render, image)
+
+    def paint_weight_value(self):
+        """体重数值带淡入效果，透明度为 0 时 Qt 会跳过绘制，这里固定在淡入中途的一帧"""
+        self.weight.value_animation.stop()
+        self.weight.value_label.graphicsEffect().setOpacity(0.5)
+        return self.paint(self.weight.value_label)
+
+    def plate_switch(self):
+        """答题到下一张图版绘制完成；后台预取先完成，与真实作答间隔一致"""
+        from dome import ColorVisionTest
+        if self.color is None or self.color.current_test is None:
+            if self.color is not None:
+                self.color.close()
+                self.color.deleteLater()
+            self.color = ColorVisionTest()
+            self.color.show()
+        self.color.plate_cache.wait()
+        self.app.processEvents()
+        test = self.color.tests[self.color.current_test]
+        answer = test.correct if self.rng.random() < 0.8 else test.options[0]
+
+        def switch():
+            self.color.check_answer(answer)
+            if self.color.current_test is not None:
+                self.color.image_label.repaint()
+        with contextlib.redirect_stdout(io.StringIO()):  # 测试结束时打印的结果 JSON
+            return timed(switch)
+
+
+def measure(case, rounds, number, warmup):
+    for _ in range(warmup):
+        case()
+    samples = []
+    for _ in range(rounds):
+        total = sum(case() for _ in range(number))
+        samples.append(total / number / 1000.0)  # 微秒 / 次
+    return samples
+
+
+def mann_whitney_p(current, baseline):
+    """单侧 Mann-Whitney U 检验（正态近似）：current 大于 baseline 的 p 值"""
+    n1, n2 = len(current), len(baseline)
+    u = sum(1.0 if a > b else 0.5 if a == b else 0.0 for a in current for b in baseline)
+    sigma = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12.0)
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / sigma
+    return 1.0 - statistics.NormalDist().cdf(z)
+
+
+def quartiles(samples):
+    if len(samples) < 2:
+        return samples[0], samples[0]
+    q = statistics.quantiles(samples, n=4)
+    return q[0], q[2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--rounds", type=int, default=9)
+    parser.add_argument("--number", type=int, default=50, help="每轮执行次数")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.10, help="中位数变慢超过该比例视为退化")
+    parser.add_argument("--alpha", type=float, default=0.05, help="显著性水平")
+    args = parser.parse_args()
+
+    # 缓存与数据目录指向临时目录，不动本机的磁盘队列、字体缓存与历史记录（与 import_budget 相同）
+    workdir = tempfile.mkdtemp(prefix="health_bench_")
+    os.environ["XDG_CACHE_HOME"] = os.path.join(workdir, "cache")
+    os.environ["XDG_DATA_HOME"] = os.path.join(workdir, "data")
+
+    from PyQt5.QtCore import QT_VERSION_STR
+    from PyQt5.QtWidgets import QApplication
+    import dome  # noqa: F401  高 DPI 属性须在创建 QApplication 前设置
+
+    app = QApplication(sys.argv)
+    bench = Bench(app, workdir)
+    results = {}
+    try:
+        for name, case in bench.cases.items():
+            if args.filter in name:
+                results[name] = measure(case, args.rounds, args.number, args.warmup)
+    finally:
+        bench.close()
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["cases"]
+
+    regressions = []
+    print(f"{'用例':22s} {'中位数 us':>10s} {'IQR':>17s} {'次/秒':>10s} {'基线 us':>10s} {'变化':>8s} {'p':>6s}")
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        low, high = quartiles(samples)
+        line = f"{name:22s} {median:10.1f} {low:8.1f}-{high:<8.1f} {1e6 / median:10.0f}"
+        base = baseline.get(name)
+        if base:
+            base_median = statistics.median(base["samples"])
+            change = median / base_median - 1
+            p = mann_whitney_p(samples, base["samples"])
+            regressed = change > args.threshold and p < args.alpha
+            line += f" {base_median:10.1f} {change:+8.1%} {p:6.3f}" + ("  退化" if regressed else "")
+            if regressed:
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        data = {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "machine": platform.machine(),
+            "saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "cases": {name: {"unit": "us/op", "samples": samples} for name, samples in results.items()},
+        }
+        if os.path.exists(args.baseline):
+            # 只运行部分用例时保留其余用例的基线
+            with open(args.baseline, encoding="utf-8") as f:
+                data["cases"] = dict(json.load(f)["cases"], **data["cases"])
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"基线已保存: {args.baseline}")
+    elif not baseline:
+        print(f"未找到基线 {args.baseline}，先用 --save 记录")
+
+    if regressions:
+        print(f"性能退化: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""启动开销检查：模块导入耗时与首帧绘制前加载的重量级依赖
+
+对每个模块分别启动一个干净的解释器：
+1. python -X importtime 导入模块，取该模块的累计导入耗时（us），与预算比较；
+2. 在 offscreen 平台创建主窗口并显示，在首次绘制时记录耗时，并检查
+   DEFERRED 中的依赖（paho、serial、numpy 等）此时尚未加载。
+任何一项超出预算或提前加载都以非零状态退出。
+
+预算按目标设备取值，慢机器上可用 --scale 放宽。
+用法: python bench/import_budget.py [--scale 2] [--repeat 3] [--module oil]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+SCRIPTS = os.path.join(ROOT, "scripts")
+COLOR = os.path.join(SCRIPTS, "color")
+
+# 首帧绘制前不应加载的模块
+DEFERRED = ("numpy", "serial", "paho", "sqlite3", "PyQt5.QtNetwork", "cProfile", "tracemalloc")
+
+# 模块 -> (导入路径, 主窗口类, 导入预算 ms, 首帧预算 ms)
+MODULES = {
+    "main": (ROOT, "HealthCheckApp", 150, 400),
+    "oil": (SCRIPTS, "HealthMonitor", 150, 400),
+    "height_measure": (SCRIPTS, "HeightMonitor", 150, 400),
+    "weight_measure": (SCRIPTS, "WeightMonitor", 150, 400),
+    "dome": (COLOR, "ColorVisionTest", 150, 500),
+}
+
+FIRST_PAINT = """
+import os, sys, time, json
+start = time.perf_counter()
+sys.path[:0] = {paths!r}
+import {module} as target
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtWidgets import QApplication
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            loaded = [name for name in {deferred!r} if name in sys.modules]
+            print(json.dumps({{"ms": (time.perf_counter() - start) * 1000, "loaded": loaded}}), flush=True)
+            os._exit(0)
+        return False
+
+app = QApplication(sys.argv)
+window = target.{window}()
+watcher = FirstPaint()
+window.installEventFilter(watcher)
+window.show()
+app.exec_()
+"""
+
+
+def child_env(workdir):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", XDG_CACHE_HOME=os.path.join(workdir, "cache"))
+    env.pop("HEALTH_PROFILE", None)
+    env.pop("HEALTH_RESULT_SOCKET", None)
+    return env
+
+
+def import_time_ms(module, path, env):
+    code = f"import sys; sys.path[:0] = {[path, SCRIPTS]!r}; import {module}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          env=env, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+    for line in proc.stderr.splitlines():
+        # import time:   self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module and not parts[2].startswith("  "):
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"-X importtime 输出中没有 {module}")
+
+
+def first_paint(module, path, window, env):
+    code = FIRST_PAINT.format(paths=[path, SCRIPTS], module=module, window=window, deferred=DEFERRED)
+    proc = subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT,
+                          capture_output=True, text=True, timeout=60)
+    for line in proc.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"{module} 未完成首帧绘制:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", choices=sorted(MODULES), action="append")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最小值")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算放大倍数")
+    args = parser.parse_args()
+
+    import tempfile
+    workdir = tempfile.mkdtemp(prefix="health_import_")
+    env = child_env(workdir)
+    failures = []
+    print(f"{'模块':16s} {'导入 ms':>8s} {'预算':>6s} {'首帧 ms':>8s} {'预算':>6s}  首帧前已加载")
+    for module in args.module or MODULES:
+        path, window, import_budget, paint_budget = MODULES[module]
+        # 第一次运行会生成字体、题库等缓存，不计入
+        first_paint(module, path, window, env)
+        imported = min(import_time_ms(module, path, env) for _ in range(args.repeat))
+        paints = [first_paint(module, path, window, env) for _ in range(args.repeat)]
+        painted = min(p["ms"] for p in paints)
+        loaded = sorted({name for p in paints for name in p["loaded"]})
+        print(f"{module:16s} {imported:8.1f} {import_budget * args.scale:6.0f} "
+              f"{painted:8.1f} {paint_budget * args.scale:6.0f}  {', '.join(loaded) or '-'}")
+        if imported > import_budget * args.scale:
+            failures.append(f"{module} 导入耗时 {imported:.1f} ms 超出预算")
+        if painted > paint_budget * args.scale:
+            failures.append(f"{module} 首帧耗时 {painted:.1f} ms 超出预算")
+        if loaded:
+            failures.append(f"{module} 首帧前加载了 {', '.join(loaded)}")
+
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""MQTT 传输方式对比：paho 网络线程 vs asyncio(qasync) 主循环
+
+需要一个可用的 MQTT 服务器（默认 127.0.0.1:1883）。
+用法: python bench/mqtt_transport.py [--broker HOST] [--port PORT] [--count N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import paho.mqtt.client as mqtt
+import qasync
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from common.mqtt_async import AsyncMqttLink
+from common.mqtt_link import MqttLink
+
+TOPIC = "bench/health/transport"
+
+
+class Relay(QObject):
+    """线程模式下把读数投递回主线程，与 oil.py 的信号切换方式一致"""
+    text = pyqtSignal(str)
+
+
+def publish(broker, port, count, rate):
+    """独立线程发布 count 条带发送时刻的消息"""
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv311)
+    client.connect(broker, port, 60)
+    client.loop_start()
+    interval = 1.0 / rate if rate else 0
+    for seq in range(count):
+        payload = json.dumps({"seq": seq, "sent": time.perf_counter_ns(), "spo2": 98, "temp": 36.5})
+        client.publish(TOPIC, payload, qos=1).wait_for_publish()
+        if interval:
+            time.sleep(interval)
+    client.loop_stop()
+    client.disconnect()
+
+
+def run_transport(app, name, args):
+    label = QLabel()
+    relay = Relay()
+    relay.text.connect(label.setText)
+    latencies = []
+    done = threading.Event()
+    ready = threading.Event()
+
+    def on_status(text, color):
+        if color == "green":
+            ready.set()
+
+    def on_message(topic, payload):
+        # asyncio 模式已在主线程，直接更新控件；线程模式经信号排队切回主线程
+        received = time.perf_counter_ns()
+        data = json.loads(payload)
+        latencies.append((received - data["sent"]) / 1e6)
+        if threading.current_thread() is threading.main_thread():
+            label.setText(f"{data['spo2']} %")
+        else:
+            relay.text.emit(f"{data['spo2']} %")
+        if len(latencies) >= args.count:
+            done.set()
+
+    link_class = AsyncMqttLink if name == "asyncio" else MqttLink
+    loop = asyncio.get_event_loop()
+    link = link_class(args.broker, args.port, TOPIC, on_message=on_message, on_status=on_status,
+                      client_id=f"health-bench-{name}", qos=1)
+    link.start()
+
+    deadline = time.monotonic() + 10
+    while not ready.is_set() and time.monotonic() < deadline:
+        loop.run_until_complete(asyncio.sleep(0.01))
+        app.processEvents()
+    time.sleep(0.2)  # 等待订阅生效
+    threads = threading.active_count()
+
+    started = time.perf_counter()
+    publisher = threading.Thread(target=publish, args=(args.broker, args.port, args.count, args.rate))
+    publisher.start()
+    deadline = time.monotonic() + 60
+    while not done.is_set() and time.monotonic() < deadline:
+        loop.run_until_complete(asyncio.sleep(0.001))
+        app.processEvents()
+    elapsed = time.perf_counter() - started
+    publisher.join()
+    link.stop()
+    loop.run_until_complete(asyncio.sleep(0.05))
+
+    if not latencies:
+        print(f"{name:8s} 未收到消息")
+        return
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:8s} 收到 {len(latencies):6d} 条  吞吐 {len(latencies) / elapsed:9.1f} 条/秒  "
+          f"延迟 p50 {statistics.median(latencies):7.3f} ms  p99 {p99:7.3f} ms  "
+          f"线程数 {threads}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--broker", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0, help="每秒发布条数，0 表示尽快发布")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    for name in ("thread", "asyncio"):
+        run_transport(app, name, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""报告生成基准：进程池生成与在界面线程直接生成的对比
+
+在 offscreen Qt 平台上运行事件循环，用 5 ms 的心跳定时器测量界面线程的响应间隔，
+分别以两种方式生成 --count 份报告（每份带 20 次历史趋势）：
+    inline  在界面线程中逐份调用 render_report（旧做法的代价）
+    pool    经 ReportQueue 提交到工作进程池
+报告两种方式的总耗时、吞吐与心跳间隔百分位。
+
+用法: python bench/report_pipeline.py [--count 200] [--workers 0]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+
+from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtWidgets import QApplication
+
+from common.report import CHARTS, ReportQueue, render_report, report_filename
+from common.timing import percentiles
+
+DAY = 86400
+Settings = namedtuple("Settings", "workers format output_dir")
+
+
+def make_job(rng, n):
+    started = time.time() - n
+    trends = {}
+    for metric, _, _, _ in CHARTS:
+        base = {"height.height_cm": 168, "weight.weight_g": 65000, "vitals.spo2": 97, "vitals.temp": 36.6}[metric]
+        trends[metric] = [(started - (20 - k) * 30 * DAY, base * rng.uniform(0.97, 1.03)) for k in range(20)]
+    return {
+        "person": f"ID{n:08d}",
+        "started": started,
+        "results": {
+            "height": {"height_cm": rng.gauss(168, 9)},
+            "weight": {"weight_g": rng.gauss(65000, 12000)},
+            "vitals": {"spo2": rng.randint(93, 99), "temp": round(rng.gauss(36.6, 0.3), 1), "bpm": rng.randint(58, 104)},
+            "color": {"score": 11, "asked": 12, "normal": True},
+            "eyes": {"left": "1.0", "right": "0.8"},
+        },
+        "previous": {"height": {"height_cm": 167.5}, "weight": {"weight_g": 64000}},
+        "trends": trends,
+    }
+
+
+class Heartbeat:
+    """界面线程心跳：记录相邻两次触发的间隔（ms）"""
+
+    def __init__(self, interval_ms=5):
+        self.gaps = []
+        self.last = time.perf_counter()
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.beat)
+        self.timer.start(interval_ms)
+
+    def beat(self):
+        now = time.perf_counter()
+        self.gaps.append((now - self.last) * 1000)
+        self.last = now
+
+    def reset(self):
+        self.gaps = []
+        self.last = time.perf_counter()
+
+
+def run_inline(app, jobs, directory, heartbeat):
+    """每次事件循环迭代生成一份，与在按钮回调里直接生成等价"""
+    pending = list(jobs)
+
+    def step():
+        if not pending:
+            app.quit()
+            return
+        job = pending.pop()
+        render_report(dict(job, format="html",
+                           output=os.path.join(directory, report_filename(job["person"], job["started"], "html"))))
+        QTimer.singleShot(0, step)
+
+    heartbeat.reset()
+    QTimer.singleShot(0, step)
+    began = time.perf_counter()
+    app.exec_()
+    return time.perf_counter() - began
+
+
+def run_pool(app, jobs, directory, heartbeat, workers):
+    queue = ReportQueue(Settings(workers, "html", directory))
+    done = []
+    queue.finished.connect(lambda job_id, path: (done.append(path), len(done) == len(jobs) and app.quit()))
+    queue.failed.connect(lambda job_id, error: print(f"任务 {job_id} 失败: {error}"))
+    # 先启动工作进程（只在首次使用时发生一次），不计入
+    queue.submit(jobs[0])
+    while queue.pending:
+        app.processEvents()
+        time.sleep(0.001)
+
+    heartbeat.reset()
+    began = time.perf_counter()
+    for job in jobs:
+        queue.submit(job)
+    app.exec_()
+    elapsed = time.perf_counter() - began
+    queue.shutdown()
+    return elapsed, queue.workers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=0, help="0 表示 CPU 核数减一")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    rng = random.Random(1)
+    jobs = [make_job(rng, n) for n in range(args.count)]
+    heartbeat = Heartbeat()
+    with tempfile.TemporaryDirectory(prefix="health_reports_") as directory:
+        inline = run_inline(app, jobs, os.path.join(directory, "inline"), heartbeat)
+        inline_gaps = heartbeat.gaps
+        pool, workers = run_pool(app, jobs, os.path.join(directory, "pool"), heartbeat, args.workers)
+        pool_gaps = heartbeat.gaps
+
+    print(f"{'方式':8s} {'耗时 s':>8s} {'份/秒':>8s}  心跳间隔 ms（定时 5 ms）")
+    print(f"{'inline':8s} {inline:8.2f} {args.count / inline:8.0f}  {percentiles(inline_gaps, (50, 99, 100))}")
+    print(f"{'pool':8s} {pool:8.2f} {args.count / pool:8.0f}  {percentiles(pool_gaps, (50, 99, 100))}  "
+          f"（{workers} 个工作进程）")
+
+
+if __name__ == "__main__":
+    main()
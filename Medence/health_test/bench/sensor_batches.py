@@ -0,0 +1,133 @@
+"""传感器数据源批量吞吐：串口、MQTT 与文件回放共用同一段消费代码
+
+    replay  回放 --count 条录制的身高读数（不等待原始间隔）
+    serial  伪终端另一端的线程尽快写入 --count 行体重读数，数据源边收边取
+    mqtt    生产线程以网络线程的方式调用 on_message，分别经内存队列和磁盘缓冲（DiskSpool）
+每种后端按 --batches 中的批大小各跑一次，消费代码只有 consume() 一处，
+报告每秒读数、平均每批条数与每批处理耗时，并核对收到的读数条数。
+
+用法: python bench/sensor_batches.py [--count 100000] [--batches 1,32,200,1000]
+"""
+import argparse
+import json
+import os
+import pty
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+
+from common.sensors import MqttSource, ReplaySource, SerialSource, parse_height, parse_vitals, parse_weight
+from common.spool import DiskSpool
+from common.timing import percentiles
+
+
+def consume(source, expected, timeout=60):
+    """各后端共用的消费循环：返回 (读数条数, 批数, 耗时 s, 每批处理耗时 us 列表)"""
+    count = batches = 0
+    batch_us = []
+    began = time.perf_counter()
+    deadline = began + timeout
+    while count < expected and time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        batch = source.poll()
+        if not batch:
+            if source.finished:
+                break
+            time.sleep(0.0005)
+            continue
+        batch_us.append((time.perf_counter_ns() - start) / 1000)
+        count += len(batch)
+        batches += 1
+    return count, batches, time.perf_counter() - began, batch_us
+
+
+def run_replay(directory, count, batch):
+    path = os.path.join(directory, "height.jsonl")
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            for n in range(count):
+                f.write(json.dumps({"t": 1.7e9 + n * 0.1, "topic": None,
+                                    "raw": f"height: {160 + n % 400 / 10:.1f} cm"}) + "\n")
+    source = ReplaySource("height", parse_height, path, speed=0, batch=batch)
+    source.open()
+    try:
+        return consume(source, count)
+    finally:
+        source.close()
+
+
+def run_serial(count, batch):
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    source = SerialSource("weight", parse_weight, os.ttyname(slave), 115200, batch=batch)
+    source.open()
+
+    def write():
+        chunk = []
+        for n in range(count):
+            chunk.append(f"Weight: {60000 + n % 30000}.0 g\r\n")
+            if len(chunk) == 64:
+                os.write(master, "".join(chunk).encode())
+                chunk = []
+        if chunk:
+            os.write(master, "".join(chunk).encode())
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    try:
+        return consume(source, count)
+    finally:
+        writer.join(timeout=5)
+        source.close()
+        os.close(master)
+        os.close(slave)
+
+
+def run_mqtt(directory, count, batch, spooled):
+    spool = DiskSpool(os.path.join(directory, f"spool-{batch}.sqlite3"), max_rows=count * 2) if spooled else None
+    # 不连接服务器：生产线程直接调用 on_message，与 paho 网络线程的调用方式相同
+    source = MqttSource("vitals", parse_vitals, "127.0.0.1", 9, "sensor/+/combined", link_class=None,
+                        spool=spool, batch=batch)
+    payloads = [json.dumps({"spo2": 95 + n % 5, "temp": 36.5, "ts": 1.7e9 + n}).encode() for n in range(count)]
+
+    def produce():
+        for n, payload in enumerate(payloads):
+            source.on_message(f"sensor/dev{n % 50}/combined", payload)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        return consume(source, count)
+    finally:
+        producer.join(timeout=5)
+        if spool is not None:
+            spool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--batches", default="1,32,200,1000", help="批大小，逗号分隔")
+    args = parser.parse_args()
+
+    print(f"{'后端':14s} {'批大小':>6s} {'读数/秒':>10s} {'条/批':>7s} {'每批 us（p50/p99）':>20s}  核对")
+    with tempfile.TemporaryDirectory(prefix="health_sensors_") as directory:
+        for batch in (int(b) for b in args.batches.split(",")):
+            for name, run in (("replay", lambda: run_replay(directory, args.count, batch)),
+                              ("serial", lambda: run_serial(args.count, batch)),
+                              ("mqtt(memory)", lambda: run_mqtt(directory, args.count, batch, False)),
+                              ("mqtt(spool)", lambda: run_mqtt(directory, args.count, batch, True))):
+                count, batches, elapsed, batch_us = run()
+                stats = percentiles(batch_us, (50, 99))
+                check = "ok" if count == args.count else f"只收到 {count}"
+                print(f"{name:14s} {batch:6d} {count / elapsed:10.0f} {count / max(batches, 1):7.1f} "
+                      f"{stats.get('p50', 0):9.0f}/{stats.get('p99', 0):<9.0f}  {check}")
+
+
+if __name__ == "__main__":
+    main()
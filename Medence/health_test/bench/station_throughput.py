@@ -0,0 +1,118 @@
+"""多工位吞吐仿真：每小时能完成多少名受检者
+
+离散事件仿真，直接使用 common.scheduler 的调度逻辑。受检者按泊松过程到达，
+每人做完全部检测（身高、体重、血氧、色觉、视力）；各项用时服从对数正态分布，
+每换一个工位另加走动与准备时间。对比两种方式：
+    serial      一次只服务一名受检者（改造前 main.py 的用法）
+    concurrent  多名受检者同时在不同设备上检测，空闲设备按调度器分配
+并逐台增加当前利用率最高的设备（如第二块显示屏），给出 N 台设备时的每小时人数。
+
+用法: python bench/station_throughput.py [--hours 8] [--rate 120] [--extra 2] [--seed 1]
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from common.scheduler import DEVICES, MODULES, SessionScheduler
+from common.timing import percentiles
+
+# 各项检测的平均用时（秒）与离散程度（对数正态分布的 sigma）
+DURATIONS = {"height": (25, 0.3), "weight": (35, 0.3), "vitals": (70, 0.4), "color": (100, 0.35), "eyes": (150, 0.4)}
+CHANGEOVER_S = 10
+
+
+def sample_duration(rng, module):
+    mean, sigma = DURATIONS[module]
+    return CHANGEOVER_S + rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+
+def simulate(devices, mode, hours, rate, seed):
+    """返回 (每小时完成人数, 在场时间列表 s, 设备利用率)"""
+    rng = random.Random(seed)
+    horizon = hours * 3600
+    scheduler = SessionScheduler(devices)
+    events = []  # (时刻, 序号, 类型, 数据)
+    sequence = 0
+
+    def push(at, kind, payload=None):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (at, sequence, kind, payload))
+
+    at = rng.expovariate(rate / 3600)
+    while at < horizon:
+        push(at, "arrive")
+        at += rng.expovariate(rate / 3600)
+
+    waiting = []       # serial 方式下排队等待的到达时刻
+    busy_time = {device: 0.0 for device in devices}
+    times_in_system = []
+    completed = 0
+    now = 0.0
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+        if now > horizon:
+            break
+        if kind == "arrive":
+            if mode == "concurrent" or not scheduler.sessions:
+                scheduler.open(now=now)
+            else:
+                waiting.append(now)
+        else:
+            session, module, device, started = payload
+            scheduler.finish(module, now, session)
+            busy_time[device] += now - started
+            if not session.todo:
+                scheduler.close(session)
+                completed += 1
+                times_in_system.append(now - session.started)
+                if waiting:
+                    scheduler.open(now=waiting.pop(0))
+        for session, module, device in scheduler.dispatch():
+            push(now + sample_duration(rng, module), "done", (session, module, device, now))
+
+    utilization = {device: busy / horizon for device, busy in busy_time.items()}
+    return completed / hours, times_in_system, utilization
+
+
+def with_extra(devices, utilization):
+    """复制一台利用率最高的设备"""
+    busiest = max(utilization, key=utilization.get)
+    base = busiest.rstrip("0123456789")
+    copies = sum(1 for name in devices if name.rstrip("0123456789") == base)
+    extended = dict(devices)
+    extended[f"{base}{copies + 1}"] = devices[busiest]
+    return extended
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=8)
+    parser.add_argument("--rate", type=float, default=120, help="每小时到达人数（高于产能时测得的是最大吞吐）")
+    parser.add_argument("--extra", type=int, default=2, help="逐台增加瓶颈设备的次数")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"检测项目: {', '.join(MODULES)}；到达 {args.rate:.0f} 人/时，仿真 {args.hours:g} 小时")
+    print(f"{'方式':11s} {'设备':>4s} {'人/时':>7s} {'在场 s（p50/p90）':>18s}  设备利用率")
+    devices = dict(DEVICES)
+    rows = [("serial", devices)]
+    for step in range(args.extra + 1):
+        rows.append(("concurrent", devices))
+        _, _, utilization = simulate(devices, "concurrent", args.hours, args.rate, args.seed)
+        devices = with_extra(devices, utilization)
+
+    for mode, devices in rows:
+        per_hour, durations, utilization = simulate(devices, mode, args.hours, args.rate, args.seed)
+        stay = percentiles(durations, (50, 90))
+        usage = " ".join(f"{name}={value:.0%}" for name, value in utilization.items())
+        print(f"{mode:11s} {len(devices):4d} {per_hour:7.1f} {stay.get('p50', 0):8.0f}/{stay.get('p90', 0):<8.0f}  {usage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""串口看门狗仿真：中断判定延迟、恢复时长与误判次数
+
+在虚拟时钟上模拟一台按固定速率（带抖动与偶发迟到）发送读数的设备，
+每隔一段时间注入一次故障：
+    silence  设备卡死不再发送，端口重开（可选 DTR 复位后等待启动）才恢复
+    garbage  设备持续发送无法解析的数据，端口重开后恢复
+主程序按 poll_ms 定时读取并调用 StreamWatchdog，与 height_measure / weight_measure 的用法一致。
+对比自适应窗口（按实际到达间隔缩短）与固定窗口（始终 stall_ms），报告
+判定延迟、中断时长（故障开始 -> 首个有效读数）的百分位与每小时误判次数。
+
+用法: python bench/stream_watchdog.py [--hours 4] [--rates 5,10,20] [--stall-ms 2000]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from common.timing import percentiles
+from common.watchdog import StreamWatchdog
+
+MS = 1_000_000
+
+
+class VirtualClock:
+    def __init__(self):
+        self.ns = 0
+
+    def __call__(self):
+        return self.ns
+
+
+class FixedWindow(StreamWatchdog):
+    """对照：不跟踪速率，始终等满 stall_ms"""
+
+    def window_ns(self):
+        return self.stall_ns
+
+
+def simulate(watchdog_class, rate, args, seed):
+    rng = random.Random(seed)
+    clock = VirtualClock()
+    watchdog = watchdog_class(args.stall_ms, clock=clock)
+    period = 1e9 / rate
+    horizon = int(args.hours * 3600e9)
+    poll = args.poll_ms * MS
+
+    next_sample = period
+    next_fault = rng.expovariate(1 / (args.fault_every_s * 1e9))
+    fault = None        # (类型, 开始时刻)
+    resume_at = None    # 端口重开后设备恢复发送的时刻
+    pending = []        # 上次读取后到达的读数：True 有效 / False 乱码
+    detect_ms, outage_ms = [], []
+    false_stalls = 0
+    stalls_seen = 0
+
+    while clock.ns < horizon:
+        clock.ns += poll
+        # 本次读取前设备发出的数据
+        while next_sample <= clock.ns:
+            if fault is not None and resume_at is not None and next_sample >= resume_at:
+                outage_ms.append((clock.ns - fault[1]) / MS)  # 在本次读取时拿到首个有效读数
+                fault, resume_at = None, None
+            if fault is None:
+                pending.append(True)
+            elif fault[0] == "garbage":
+                pending.append(False)
+            gap = period * max(0.2, rng.gauss(1, args.jitter))
+            if rng.random() < args.late:
+                gap += period * rng.uniform(1, args.late_factor)
+            next_sample += gap
+        if fault is None and next_fault <= clock.ns:
+            fault = (rng.choice(("silence", "garbage")), clock.ns)
+            next_fault = clock.ns + rng.expovariate(1 / (args.fault_every_s * 1e9))
+
+        if pending:
+            watchdog.received(len(pending))
+            if any(pending):
+                watchdog.valid()
+            pending.clear()
+        if watchdog.check() is not None:
+            # 重开端口；故障中的设备复位后经 boot_ms 再开始发送
+            clock.ns += args.reopen_ms * MS
+            if fault is not None:
+                resume_at = clock.ns + args.boot_ms * MS
+        if watchdog.stalls > stalls_seen:
+            stalls_seen = watchdog.stalls
+            if fault is None:
+                false_stalls += 1
+            else:
+                detect_ms.append((watchdog.stalled_since - fault[1]) / MS)
+    return detect_ms, outage_ms, false_stalls / args.hours, watchdog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=4)
+    parser.add_argument("--rates", default="5,10,20", help="设备发送速率（Hz），逗号分隔")
+    parser.add_argument("--stall-ms", type=int, default=2000)
+    parser.add_argument("--poll-ms", type=int, default=100)
+    parser.add_argument("--fault-every-s", type=float, default=120, help="平均故障间隔")
+    parser.add_argument("--jitter", type=float, default=0.15, help="到达间隔的相对标准差")
+    parser.add_argument("--late", type=float, default=0.01, help="读数迟到的概率")
+    parser.add_argument("--late-factor", type=float, default=2.5, help="迟到最多几个周期")
+    parser.add_argument("--reopen-ms", type=int, default=20)
+    parser.add_argument("--boot-ms", type=int, default=50, help="复位后设备恢复发送所需时间")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"仿真 {args.hours:g} 小时，平均每 {args.fault_every_s:g} s 一次故障，读取间隔 {args.poll_ms} ms")
+    print(f"{'速率':>6s} {'窗口':8s} {'判定 ms（p50/p99）':>20s} {'中断 ms（p50/p99）':>20s} {'误判/时':>8s}")
+    for rate in (float(r) for r in args.rates.split(",")):
+        for name, watchdog_class in (("自适应", StreamWatchdog), ("固定", FixedWindow)):
+            detect, outage, false_rate, _ = simulate(watchdog_class, rate, args, args.seed)
+            d = percentiles(detect, (50, 99))
+            o = percentiles(outage, (50, 99))
+            print(f"{rate:5g}Hz {name:8s} {d.get('p50', 0):9.0f}/{d.get('p99', 0):<9.0f} "
+                  f"{o.get('p50', 0):9.0f}/{o.get('p99', 0):<9.0f} {false_rate:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,40 @@
 #include <iostream>
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <ctime>
+#include <string>
+#include <deque>
+#include <map>
 #include <fcntl.h>
+#include <poll.h>
 #include <unistd.h>
+#include <arpa/inet.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/un.h>
 #include <termios.h>
 #include <vector>
 #include <cstring>
 #include <errno.h>
 #include <stdio.h>
 #include <stdlib.h>
-#include <sys/select.h>
 #include <iconv.h>
 #include <opencv2/opencv.hpp>
 
+// 波特率数值 -> termios 常量，不支持的取值按 9600 处理
+static speed_t baudConstant(int baud) {
+    switch (baud) {
+        case 19200: return B19200;
+        case 38400: return B38400;
+        case 57600: return B57600;
+        case 115200: return B115200;
+        default: return B9600;
+    }
+}
+
 // 串口初始化函数
-int init_uart(const char* dev = "/dev/ttyS9")
+int init_uart(const char* dev = "/dev/ttyS9", int baud = 9600)
 {
     int fd = open(dev, O_RDWR | O_NOCTTY | O_NDELAY);
     if (fd < 0) {
@@ -25,8 +47,8 @@ int init_uart(const char* dev = "/dev/ttyS9")
     newtio.c_cflag &= ~CSIZE;
     newtio.c_cflag |= CS8;
     newtio.c_cflag &= ~PARENB;
-    cfsetispeed(&newtio, B9600);
-    cfsetospeed(&newtio, B9600);
+    cfsetispeed(&newtio, baudConstant(baud));
+    cfsetospeed(&newtio, baudConstant(baud));
     newtio.c_cflag &= ~CSTOPB;
     newtio.c_cc[VTIME] = 0;
     newtio.c_cc[VMIN] = 0;
@@ -39,122 +61,468 @@ int init_uart(const char* dev = "/dev/ttyS9")
     return fd;
 }
 
-// 串口接收
-int uart_read_frame(int fd, unsigned char *p_receive_buff, int count, int timeout_data)
-{
-    int nread = 0;
-    fd_set rd;
-    int retval = 0;
-    struct timeval timeout = {0, timeout_data*1000};
-    FD_ZERO(&rd);
-    FD_SET(fd, &rd);
-    memset(p_receive_buff, 0x0, count);
-    retval = select(fd + 1, &rd, NULL, NULL, &timeout);
-    switch (retval)
-    {
-        case 0:
-            nread = 0;
-            break;
-        case -1:
-            printf("select%s\n", strerror(errno));
-            nread = -1;
-            break;
-        default:
-            nread = read(fd, p_receive_buff, count-1); // 留一个字节给\0
-            break;
+// 语音识别模块的流式读取器
+// - 用 poll 阻塞等待串口数据，空闲时不占用 CPU
+// - 串口数据逐段追加到复用的缓冲区，线路空闲超过 kFrameGapMs 即认为一帧结束
+// - GBK -> UTF-8 转换器在构造时打开一次，之后每帧复用
+class VoiceReader {
+public:
+    // 9600 波特率下约 10 个字节的传输时间
+    static const int kFrameGapMs = 12;
+    // 0xFD 协议包中识别文本位于包尾的字节数
+    static const size_t kFdTextBytes = 9;
+
+    explicit VoiceReader(int fd) : fd_(fd) {
+        cd_ = iconv_open("UTF-8", "GBK");
+        frame_.reserve(256);
+    }
+
+    ~VoiceReader() {
+        if (cd_ != (iconv_t)-1) iconv_close(cd_);
     }
-    if (nread > 0) p_receive_buff[nread] = '\0'; // 保证字符串结束
-    return nread;
+
+    // 丢弃上一题之后才说出、尚未读取的语音
+    void discardPending() {
+        tcflush(fd_, TCIFLUSH);
+    }
+
+    // 等待一帧识别结果并转换为 UTF-8，timeout_ms < 0 表示一直等待
+    // 返回 false 表示超时或串口出错
+    bool next(std::string& text, int timeout_ms) {
+        frame_.clear();
+        int wait_ms = timeout_ms;
+        while (true) {
+            struct pollfd pfd = {fd_, POLLIN, 0};
+            int ret = poll(&pfd, 1, wait_ms);
+            if (ret < 0) {
+                if (errno == EINTR) continue;
+                printf("poll%s\n", strerror(errno));
+                return false;
+            }
+            if (ret == 0) {
+                if (frame_.empty()) return false;  // 调用方给定的时间内没有数据
+                break;                              // 帧间空闲，一帧结束
+            }
+            unsigned char chunk[256];
+            ssize_t n = read(fd_, chunk, sizeof(chunk));
+            if (n < 0) {
+                if (errno == EAGAIN || errno == EINTR) continue;
+                printf("read%s\n", strerror(errno));
+                return false;
+            }
+            if (n == 0) continue;
+            frame_.insert(frame_.end(), chunk, chunk + n);
+            if (frame_.size() >= 255) break;        // 与旧实现一致，单帧最多 255 字节
+            wait_ms = kFrameGapMs;
+        }
+
+        // 判断是否为FD开头的协议包，是则只取包尾的识别文本
+        const unsigned char* data = &frame_[0];
+        size_t len = frame_.size();
+        if (data[0] == 0xFD && len > kFdTextBytes) {
+            data += len - kFdTextBytes;
+            len = kFdTextBytes;
+        }
+        decode(data, len, text);
+        return true;
+    }
+
+private:
+    void decode(const unsigned char* gbk, size_t len, std::string& out) {
+        out.clear();
+        if (cd_ == (iconv_t)-1) return;
+        // 与 C 字符串语义一致：遇到 0 字节即结束
+        const void* nul = memchr(gbk, 0, len);
+        if (nul) len = static_cast<const unsigned char*>(nul) - gbk;
+        iconv(cd_, NULL, NULL, NULL, NULL);  // 复位转换状态
+        char* inbuf = (char*)gbk;
+        size_t inlen = len;
+        char* outbuf = utf8_;
+        size_t outlen = sizeof(utf8_) - 1;
+        iconv(cd_, &inbuf, &inlen, &outbuf, &outlen);
+        out.assign(utf8_, outbuf - utf8_);
+    }
+
+    int fd_;
+    iconv_t cd_;
+    std::vector<unsigned char> frame_;
+    char utf8_[512];
+};
+
+// 单题计时（单调时钟）：出题请求 -> 首帧绘制 -> 收到语音答案
+typedef std::chrono::steady_clock Clock;
+
+struct Trial {
+    int eye;            // 0 左眼，1 右眼
+    int level;          // 视标大小级别
+    int direction;      // 视标方向
+    bool correct;
+    bool timed_out;     // 超时未作答
+    double ui_ms;       // 界面延迟：请求显示到首帧绘制
+    double reaction_ms; // 反应时间：首帧绘制到收到答案（超时为等待时长）
+    double trial_ms;    // 本题总用时：请求显示到进入下一题
+};
+
+static double elapsed_ms(Clock::time_point from, Clock::time_point to) {
+    return std::chrono::duration<double, std::milli>(to - from).count();
+}
+
+// 最近秩法百分位数
+static double percentile(std::vector<double> values, int point) {
+    if (values.empty()) return 0.0;
+    std::sort(values.begin(), values.end());
+    size_t rank = (point * values.size() + 99) / 100;
+    if (rank < 1) rank = 1;
+    return values[rank - 1];
 }
 
-// GBK转UTF-8函数
-void gbk_to_utf8(const char* gbk, char* utf8, size_t utf8_len) {
-    iconv_t cd = iconv_open("UTF-8", "GBK");
-    if (cd == (iconv_t)-1) {
-        utf8[0] = '\0';
-        return;
+static void printLatencySummary(const std::vector<Trial>& trials) {
+    std::vector<double> ui, reaction;
+    for (size_t k = 0; k < trials.size(); ++k) {
+        ui.push_back(trials[k].ui_ms);
+        if (!trials[k].timed_out) reaction.push_back(trials[k].reaction_ms);
     }
-    size_t inlen = strlen(gbk);
-    char* inbuf = (char*)gbk;
-    char* outbuf = utf8;
-    size_t outlen = utf8_len - 1;
-    iconv(cd, &inbuf, &inlen, &outbuf, &outlen);
-    *outbuf = '\0';
-    iconv_close(cd);
+    printf("响应时间统计（%zu 题）\n", trials.size());
+    printf("界面延迟 ms:  p50 %.1f  p90 %.1f  p99 %.1f\n",
+           percentile(ui, 50), percentile(ui, 90), percentile(ui, 99));
+    printf("反应时间 ms:  p50 %.1f  p90 %.1f  p99 %.1f\n",
+           percentile(reaction, 50), percentile(reaction, 90), percentile(reaction, 99));
 }
 
-char* read_uart_data(int fd, int timeout_ms) {
-    unsigned char buffer[256];
-    int n = uart_read_frame(fd, buffer, sizeof(buffer), timeout_ms);
-    
-    if (n <= 0) {
-        return nullptr;
+// 向主控程序回传进度与结果：AF_UNIX 流套接字，帧为 4 字节大端长度 + UTF-8 JSON
+// 套接字路径由 main.py 通过环境变量 HEALTH_RESULT_SOCKET 传入，单独运行时不发送
+class ResultChannel {
+public:
+    explicit ResultChannel(const char* module) : module_(module), fd_(-1), failed_(false) {
+        const char* path = getenv("HEALTH_RESULT_SOCKET");
+        if (path) path_ = path;
     }
-    // 打印原始数据(调试用)
-    //printf("原始数据: ");
-    //for (int i = 0; i < n; ++i) printf("%02X ", buffer[i]);
-    //printf("\n");
-    char* utf8buf = (char*)malloc(512);
-    if (!utf8buf) {
-        return nullptr;
+    ~ResultChannel() { if (fd_ >= 0) close(fd_); }
+
+    void progress(const std::string& fields) { send("progress", fields); }
+    void result(const std::string& fields) { send("result", fields); }
+
+    // JSON 字符串字段：转义引号和反斜杠，控制字符替换为空格
+    static std::string str(const char* key, const std::string& value) {
+        std::string out = std::string("\"") + key + "\":\"";
+        for (size_t k = 0; k < value.size(); ++k) {
+            char c = value[k];
+            if (c == '"' || c == '\\') { out += '\\'; out += c; }
+            else if (static_cast<unsigned char>(c) < 0x20) out += ' ';
+            else out += c;
+        }
+        return out + "\"";
     }
-    memset(utf8buf, 0, 512);
-    // 判断是否为FD开头的协议包
-    if (buffer[0] == 0xFD && n > 9) {
-        gbk_to_utf8((char*)(buffer + n - 9), utf8buf, 512);
-    } else {
-        gbk_to_utf8((char*)buffer, utf8buf, 512);
+
+    static std::string num(const char* key, double value) {
+        char buf[64];
+        snprintf(buf, sizeof(buf), "\"%s\":%.10g", key, value);
+        return buf;
     }
 
-    return utf8buf;
-}
+private:
+    bool connectOnce() {
+        if (fd_ >= 0) return true;
+        if (path_.empty() || failed_ || path_.size() >= sizeof(sockaddr_un().sun_path)) return false;
+        fd_ = socket(AF_UNIX, SOCK_STREAM, 0);
+        sockaddr_un addr;
+        memset(&addr, 0, sizeof(addr));
+        addr.sun_family = AF_UNIX;
+        strncpy(addr.sun_path, path_.c_str(), sizeof(addr.sun_path) - 1);
+        if (fd_ < 0 || connect(fd_, reinterpret_cast<sockaddr*>(&addr), sizeof(addr)) < 0) {
+            fail();
+            return false;
+        }
+        return true;
+    }
+
+    void fail() {
+        // 主控程序不在或已退出时不影响检测本身，之后不再尝试
+        perror("结果回传失败");
+        if (fd_ >= 0) close(fd_);
+        fd_ = -1;
+        failed_ = true;
+    }
+
+    void send(const char* kind, const std::string& fields) {
+        if (!connectOnce()) return;
+        char ts[32];
+        snprintf(ts, sizeof(ts), "%ld", static_cast<long>(time(NULL)));
+        std::string payload = "{" + str("module", module_) + "," + str("type", kind) +
+                              ",\"ts\":" + ts + ",\"data\":{" + fields + "}}";
+        uint32_t length = htonl(static_cast<uint32_t>(payload.size()));
+        std::string frame(reinterpret_cast<const char*>(&length), sizeof(length));
+        frame += payload;
+        size_t sent = 0;
+        while (sent < frame.size()) {
+            ssize_t n = ::send(fd_, frame.data() + sent, frame.size() - sent, MSG_NOSIGNAL);
+            if (n < 0 && errno == EINTR) continue;
+            if (n <= 0) { fail(); return; }
+            sent += n;
+        }
+    }
 
+    std::string module_;
+    std::string path_;
+    int fd_;
+    bool failed_;
+};
 
-char* read_from_uart(int fd) {
-    char* received_data = nullptr;  // 初始化为 nullptr
+// 事件驱动的节奏控制：收到有效答案且已达最短呈现时间就进入下一题；
+// 超时时间取近期反应时间中位数的若干倍，并限制在 [min, max] 内
+class Pacer {
+public:
+    Pacer() : min_exposure_ms(800), base_timeout_ms(6000), min_timeout_ms(2500), max_timeout_ms(10000) {}
 
-    while (true) {
-        char* new_data = read_uart_data(fd, 100);  // 100ms 超时
-        if (new_data) {
-            if (received_data) free(received_data);  // 释放旧数据（如果有）
-            received_data = new_data;  // 保存新数据
-            break;
+    // 配置变化时可在两题之间调用，已记录的近期反应时间保留
+    void configure(int min_exposure, int base_timeout, int min_timeout, int max_timeout) {
+        min_exposure_ms = min_exposure;
+        base_timeout_ms = base_timeout;
+        min_timeout_ms = min_timeout;
+        max_timeout_ms = max_timeout;
+    }
+
+    int timeoutMs() const {
+        if (recent_.empty()) return base_timeout_ms;
+        std::vector<double> sorted(recent_.begin(), recent_.end());
+        std::sort(sorted.begin(), sorted.end());
+        int adaptive = static_cast<int>(sorted[sorted.size() / 2] * kTimeoutFactor);
+        return std::max(min_timeout_ms, std::min(max_timeout_ms, adaptive));
+    }
+
+    void observe(double reaction_ms) {
+        recent_.push_back(reaction_ms);
+        if (recent_.size() > kWindow) recent_.pop_front();
+    }
+
+    int min_exposure_ms;
+
+private:
+    static const size_t kWindow = 8;
+    static constexpr double kTimeoutFactor = 2.5;
+    int base_timeout_ms;
+    int min_timeout_ms;
+    int max_timeout_ms;
+    std::deque<double> recent_;
+};
+
+// 等待受试者作答：每 15ms 处理一次窗口事件，其余时间阻塞在串口上
+// 收到包含 keywords 之一的语音即返回 true；到达 timeout_ms 返回 false
+// 提前作答时仍保证视标至少呈现 min_exposure_ms
+bool awaitAnswer(VoiceReader& voice, const char* const* keywords, int keywordCount,
+                 Clock::time_point shown, int min_exposure_ms, int timeout_ms,
+                 std::string& text, Clock::time_point& answered) {
+    const int kPumpMs = 15;
+    Clock::time_point deadline = shown + std::chrono::milliseconds(timeout_ms);
+    bool got = false;
+    while (!got) {
+        int remaining = static_cast<int>(elapsed_ms(Clock::now(), deadline));
+        if (remaining <= 0) break;
+        cv::waitKey(1);
+        if (voice.next(text, std::min(remaining, kPumpMs))) {
+            got = keywordCount == 0;  // 不限定关键词时任意语音都算作回应
+            for (int k = 0; k < keywordCount && !got; ++k) {
+                got = text.find(keywords[k]) != std::string::npos;
+            }
         }
     }
+    answered = Clock::now();
+    if (!got) text.clear();
 
-    return received_data;
+    int exposure_left = min_exposure_ms - static_cast<int>(elapsed_ms(shown, Clock::now()));
+    if (exposure_left > 0) cv::waitKey(exposure_left);
+    return got;
 }
 
+// 追加一行到节奏日志，便于统计多次检测节省的时间
+static void appendPacingLog(const char* path, double total_ms, double fixed_ms, size_t trialCount) {
+    FILE* log = fopen(path, "a");
+    if (!log) return;
+    fprintf(log, "%ld,%.0f,%.0f,%zu\n", static_cast<long>(time(NULL)), total_ms, fixed_ms, trialCount);
+    fclose(log);
+}
 
-// 函数：按比例缩放图片并在固定窗口中显示（空白部分用白色填充）
-void displayScaledImage(const cv::Mat& image, double scale, const std::string& windowName, int windowWidth, int windowHeight) {
-    if (image.empty()) {
-        std::cerr << "Error: Input image is empty!" << std::endl;
-        return;
-    }
-    // 计算缩放后的尺寸（保持原比例）
+// 按比例缩放图片（保持原比例），只在启动预处理时调用
+cv::Mat scaleImage(const cv::Mat& image, double scale) {
     int newWidth = static_cast<int>(image.cols * scale);
     int newHeight = static_cast<int>(image.rows * scale);
-    // 等比例缩放图片
     cv::Mat resizedImage;
     cv::resize(image, resizedImage, cv::Size(newWidth, newHeight), 0, 0, cv::INTER_AREA);
-    // 创建固定大小的白色背景
-    cv::Mat displayImage(windowHeight, windowWidth, image.type(), cv::Scalar(255, 255, 255));
-    // 计算居中位置
-    int xOffset = (windowWidth - newWidth) / 2;
-    int yOffset = (windowHeight - newHeight) / 2;
-    // 确保缩放后的图片不会超出窗口边界
-    if (xOffset >= 0 && yOffset >= 0 && (xOffset + newWidth) <= windowWidth && (yOffset + newHeight) <= windowHeight) {
-        // 将缩放后的图片复制到白色背景的中央
-        cv::Rect roi(xOffset, yOffset, newWidth, newHeight);
-        resizedImage.copyTo(displayImage(roi));
-    } else {
-        std::cerr << "Error: Scaled image exceeds window dimensions!" << std::endl;
-        return;
+    return resizedImage;
+}
+
+// 启动时解码全部图片并预缩放到每个大小级别：pyramid[级别][图片]
+// 同时检查缩放后的图片不会超出窗口，答题过程中不再读盘或重采样
+bool buildPyramid(const char* const* paths, int count, const double* scales, int levelCount,
+                  int windowWidth, int windowHeight, std::vector<std::vector<cv::Mat> >& pyramid) {
+    std::vector<cv::Mat> originals;
+    for (int k = 0; k < count; ++k) {
+        cv::Mat image = cv::imread(paths[k]);
+        if (image.empty()) {
+            std::cerr << "Error: 无法读取图片 " << paths[k] << std::endl;
+            return false;
+        }
+        originals.push_back(image);
     }
-    // 创建窗口并显示图片
-    cv::namedWindow(windowName, cv::WINDOW_AUTOSIZE);
-    cv::imshow(windowName, displayImage);
+    pyramid.assign(levelCount, std::vector<cv::Mat>());
+    for (int level = 0; level < levelCount; ++level) {
+        for (int k = 0; k < count; ++k) {
+            cv::Mat scaled = scales[level] == 1.0 ? originals[k] : scaleImage(originals[k], scales[level]);
+            if (scaled.cols > windowWidth || scaled.rows > windowHeight) {
+                std::cerr << "Error: Scaled image exceeds window dimensions! " << paths[k] << std::endl;
+                return false;
+            }
+            pyramid[level].push_back(scaled);
+        }
+    }
+    return true;
+}
+
+// 视标尺寸：E 字高为 5 个最小分辨角，最小分辨角 = 1 / 小数视力（角分）
+// 按观看距离与屏幕 DPI 换算为像素
+int optotypePixels(double decimal_acuity, double distance_mm, double dpi) {
+    double height_rad = 5.0 / decimal_acuity / 60.0 * M_PI / 180.0;
+    double height_mm = 2.0 * distance_mm * tan(height_rad / 2.0);
+    return std::max(5, static_cast<int>(lround(height_mm / 25.4 * dpi)));
+}
+
+// 矢量绘制 E 字视标：5x5 笔画网格先按超采样尺寸绘制再缩小，
+// 任意像素尺寸下笔画比例准确、边缘平滑
+// direction: 0 上, 1 下, 2 左, 3 右（开口朝向）
+cv::Mat renderTumblingE(int size_px, int direction) {
+    const int supersample = 8;
+    int unit = (size_px * supersample + 4) / 5;
+    const cv::Scalar black(0, 0, 0);
+    cv::Mat big(5 * unit, 5 * unit, CV_8UC3, cv::Scalar(255, 255, 255));
+    // 开口朝右：左侧竖笔画 + 三条横笔画
+    cv::rectangle(big, cv::Rect(0, 0, unit, 5 * unit), black, cv::FILLED);
+    for (int row = 0; row < 5; row += 2) {
+        cv::rectangle(big, cv::Rect(0, row * unit, 5 * unit, unit), black, cv::FILLED);
+    }
+    cv::Mat oriented;
+    switch (direction) {
+        case 0: cv::rotate(big, oriented, cv::ROTATE_90_COUNTERCLOCKWISE); break;
+        case 1: cv::rotate(big, oriented, cv::ROTATE_90_CLOCKWISE); break;
+        case 2: cv::rotate(big, oriented, cv::ROTATE_180); break;
+        default: oriented = big; break;
+    }
+    cv::Mat optotype;
+    cv::resize(oriented, optotype, cv::Size(size_px, size_px), 0, 0, cv::INTER_AREA);
+    return optotype;
+}
+
+// 每个视力级别、每个方向各生成一份视标：pyramid[级别][方向]（每次运行生成一次）
+bool buildOptotypes(const double* acuity, int levelCount, double distance_mm, double dpi,
+                    int windowWidth, int windowHeight, std::vector<std::vector<cv::Mat> >& pyramid) {
+    pyramid.assign(levelCount, std::vector<cv::Mat>());
+    for (int level = 0; level < levelCount; ++level) {
+        int size = optotypePixels(acuity[level], distance_mm, dpi);
+        if (size > windowWidth || size > windowHeight) {
+            std::cerr << "Error: 视力 " << acuity[level] << " 的视标 " << size
+                      << "px 超出窗口，请减小观看距离或 DPI" << std::endl;
+            return false;
+        }
+        printf("视力 %.2f: 视标 %d px\n", acuity[level], size);
+        for (int direction = 0; direction < 4; ++direction) {
+            pyramid[level].push_back(renderTumblingE(size, direction));
+        }
+    }
+    return true;
+}
+
+static double envOr(const char* name, double fallback) {
+    const char* value = getenv(name);
+    return (value && *value) ? atof(value) : fallback;
+}
+
+static std::string trim(const std::string& text) {
+    size_t begin = text.find_first_not_of(" \t\r\n");
+    if (begin == std::string::npos) return "";
+    size_t end = text.find_last_not_of(" \t\r\n");
+    return text.substr(begin, end - begin + 1);
+}
+
+// 统一配置文件 config.ini 中的 [eyes] 节（格式与校验见 scripts/common/config.py）
+// 只在文件修改时间或大小变化时重新解析；缺少的项取默认值，环境变量 EYES_* 优先
+class EyesConfig {
+public:
+    explicit EyesConfig(const std::string& path) : path_(path), mtime_ns_(-1), size_(-1) { reload(); }
+
+    // 文件有变化时重新读取并返回 true
+    bool reload() {
+        struct stat st;
+        long long mtime_ns = 0, size = 0;
+        if (stat(path_.c_str(), &st) == 0) {
+            mtime_ns = static_cast<long long>(st.st_mtim.tv_sec) * 1000000000LL + st.st_mtim.tv_nsec;
+            size = st.st_size;
+        }
+        if (mtime_ns == mtime_ns_ && size == size_) return false;
+        mtime_ns_ = mtime_ns;
+        size_ = size;
+        values_.clear();
+
+        FILE* file = fopen(path_.c_str(), "r");
+        if (!file) return true;
+        char line[512];
+        bool in_section = false;
+        while (fgets(line, sizeof(line), file)) {
+            std::string text = trim(line);
+            if (text.empty() || text[0] == ';' || text[0] == '#') continue;
+            if (text[0] == '[') {
+                in_section = text == "[eyes]";
+                continue;
+            }
+            size_t eq = text.find('=');
+            if (!in_section || eq == std::string::npos) continue;
+            std::string value = text.substr(eq + 1);
+            size_t comment = value.find(" ;");
+            if (comment != std::string::npos) value.erase(comment);
+            values_[trim(text.substr(0, eq))] = trim(value);
+        }
+        fclose(file);
+        return true;
+    }
+
+    std::string text(const char* key, const char* fallback) const {
+        std::map<std::string, std::string>::const_iterator it = values_.find(key);
+        return (it != values_.end() && !it->second.empty()) ? it->second : fallback;
+    }
+
+    double number(const char* key, const char* env, double fallback) const {
+        if (env && getenv(env) && *getenv(env)) return envOr(env, fallback);
+        std::string value = text(key, "");
+        char* end = NULL;
+        double parsed = strtod(value.c_str(), &end);
+        if (value.empty() || *end != '\0') {
+            if (!value.empty()) fprintf(stderr, "配置项 [eyes] %s = %s 无效，使用默认值\n", key, value.c_str());
+            return fallback;
+        }
+        return parsed;
+    }
+
+private:
+    std::string path_;
+    long long mtime_ns_;
+    long long size_;
+    std::map<std::string, std::string> values_;
+};
+
+// 节奏参数（毫秒）：最短呈现时间、初始 / 最短 / 最长超时
+static void configurePacer(const EyesConfig& config, Pacer& pacer) {
+    pacer.configure(static_cast<int>(config.number("min_exposure_ms", "EYES_MIN_EXPOSURE_MS", 800)),
+                    static_cast<int>(config.number("timeout_ms", "EYES_TIMEOUT_MS", 6000)),
+                    static_cast<int>(config.number("min_timeout_ms", "EYES_MIN_TIMEOUT_MS", 2500)),
+                    static_cast<int>(config.number("max_timeout_ms", "EYES_MAX_TIMEOUT_MS", 10000)));
+}
+
+// 把预缩放好的图片居中复制到常驻画布并显示（空白部分用白色填充）
+// 画布在启动时分配一次，这里只有内存拷贝，没有分配与重采样
+void showOnFrame(cv::Mat& frame, const cv::Mat& image, const std::string& windowName) {
+    frame.setTo(cv::Scalar(255, 255, 255));
+    int xOffset = (frame.cols - image.cols) / 2;
+    int yOffset = (frame.rows - image.rows) / 2;
+    image.copyTo(frame(cv::Rect(xOffset, yOffset, image.cols, image.rows)));
+    cv::imshow(windowName, frame);
 }
 
 void displayVision(const char* leftEye, const char* rightEye) {
@@ -238,46 +606,85 @@ int main() {
     //    return -1;
     //}
 
+    // 统一配置：由 main.py 启动时经 HEALTH_CONFIG 传入路径，单独运行时读取上级目录的 config.ini
+    const char* config_path = getenv("HEALTH_CONFIG");
+    EyesConfig config(config_path && *config_path ? config_path : "../config.ini");
+
     // 初始化串口
     //int fd = init_uart(argv[1]);
-    int fd = init_uart();
+    int fd = init_uart(config.text("uart", "/dev/ttyS9").c_str(),
+                       static_cast<int>(config.number("baud", NULL, 9600)));
     if (fd < 0) return -1;
+    VoiceReader voice(fd);
+    std::string received_data;
 
-    // 设置窗口大小
-    const int windowWidth = 950;
-    const int windowHeight = 600;
+    // 设置窗口大小（显示画布按此分配，只在启动时读取）
+    const int windowWidth = static_cast<int>(config.number("window_width", NULL, 950));
+    const int windowHeight = static_cast<int>(config.number("window_height", NULL, 600));
 
     // 定义图片路径（应该放在文件头部全局区域）
     const char* eyes[] = {"SnellenChart/请闭上右眼.png", "SnellenChart/请闭上左眼.png"};
-    const char* direction[] = {"SnellenChart/上.png", "SnellenChart/下.png", 
-                        "SnellenChart/左.png", "SnellenChart/右.png"};
 
     // 答案
     const char* answer[] = {"上", "下", "左", "右"};
 
-    // 比例
-    double image_size[] = {1.0, 0.8, 0.6, 0.4, 0.2};
+    // 视力级别：按 logMAR 0.4 ~ -0.1 每行 0.1 递减（小数视力 0.4 ~ 1.2）
+    const double logmar[] = {0.4, 0.3, 0.2, 0.1, 0.0, -0.1};
+    const char* result[] = {"0.4", "0.5", "0.6", "0.8", "1.0", "1.2"};
+    const int levelCount = sizeof(logmar) / sizeof(logmar[0]);
+    double acuity[levelCount];
+    for (int level = 0; level < levelCount; ++level) {
+        acuity[level] = pow(10.0, -logmar[level]);
+    }
+
+    // 观看距离（毫米）与屏幕 DPI，决定视标的实际像素大小
+    double distance_mm = config.number("distance_mm", "EYES_DISTANCE_MM", 2500.0);
+    double dpi = config.number("dpi", "EYES_DPI", 96.0);
+
+    // 启动时一次性准备：提示图解码一次，视标按每个级别矢量生成
+    const double prompt_scale[] = {1.0};
+    std::vector<std::vector<cv::Mat> > eye_images, direction_pyramid;
+    if (!buildPyramid(eyes, 2, prompt_scale, 1, windowWidth, windowHeight, eye_images) ||
+        !buildOptotypes(acuity, levelCount, distance_mm, dpi, windowWidth, windowHeight, direction_pyramid)) {
+        close(fd);
+        return -1;
+    }
+
+    // 常驻显示画布与窗口，每题复用
+    cv::Mat frame(windowHeight, windowWidth, eye_images[0][0].type(), cv::Scalar(255, 255, 255));
+    cv::namedWindow("Eyes Test", cv::WINDOW_AUTOSIZE);
+
+    Pacer pacer;
+    configurePacer(config, pacer);
+    const int kPromptMinMs = 1000;   // 闭眼提示至少显示 1 秒，之后任意语音即可继续
+    const int kPromptMaxMs = 3000;
+    const int kFixedDelayMs = 3000;  // 原固定节奏，用于估算节省的时间
+    Clock::time_point run_started = Clock::now();
+    double fixed_estimate_ms = 0;
 
-    // 视力结果
-    //double result[] = {0.4, 0.6, 0.8, 1.0, 1.2};
-    const char* result[] = {"0.4", "0.6", "0.8", "1.0", "1.2"};
-    //double left = 1.2, right = 1.2;
-    const char* left = "1.2";
-    const char* right = "1.2";
+    // 视力结果：最后一个通过的级别，第一级即未通过时记为 "<0.4"
+    std::string left = result[levelCount - 1];
+    std::string right = result[levelCount - 1];
+
+    std::vector<Trial> trials;
+    ResultChannel channel("eyes");
+    const char* eye_names[] = {"左眼", "右眼"};
     
     // 左右眼睛
     for(int i = 0; i < 2; i++){
 
         // 测量左右眼睛
-        cv::Mat image_eye = cv::imread(eyes[i]);
-        displayScaledImage(image_eye, 1.0, "Eyes Test",  windowWidth, windowHeight);
-        cv::waitKey(3000);
-        cv::destroyAllWindows();
+        Clock::time_point prompt_shown = Clock::now();
+        showOnFrame(frame, eye_images[0][i], "Eyes Test");
+        voice.discardPending();
+        Clock::time_point prompt_done;
+        awaitAnswer(voice, answer, 0, prompt_shown, kPromptMinMs, kPromptMaxMs, received_data, prompt_done);
+        fixed_estimate_ms += kFixedDelayMs;
 
         int index = -1;
 
         // 大小
-        for(int j = 0; j < 5; j++){
+        for(int j = 0; j < levelCount; j++){
 
             // 判断正确的结果
             int ans = 0;
@@ -292,39 +699,76 @@ int main() {
                 }while(current_index == index);
                 index = current_index;
 
-                // 图片
-                cv::Mat image_direction = cv::imread(direction[index]);
+                // 配置文件在两题之间被修改时，节奏参数与视标尺寸从下一题起生效
+                if (config.reload()) {
+                    configurePacer(config, pacer);
+                    double new_distance = config.number("distance_mm", "EYES_DISTANCE_MM", 2500.0);
+                    double new_dpi = config.number("dpi", "EYES_DPI", 96.0);
+                    std::vector<std::vector<cv::Mat> > rebuilt;
+                    if ((new_distance != distance_mm || new_dpi != dpi) &&
+                        buildOptotypes(acuity, levelCount, new_distance, new_dpi, windowWidth, windowHeight, rebuilt)) {
+                        direction_pyramid.swap(rebuilt);
+                        distance_mm = new_distance;
+                        dpi = new_dpi;
+                    }
+                }
 
-                // 显示当前测量的方向
-                displayScaledImage(image_direction, image_size[j], "Eyes Test", windowWidth, windowHeight);
-                cv::waitKey(3000);
+                // 显示当前测量的方向；imshow 的绘制在 waitKey 中完成，
+                // waitKey(1) 返回即首帧已绘制
+                Clock::time_point requested = Clock::now();
+                showOnFrame(frame, direction_pyramid[j][index], "Eyes Test");
+                voice.discardPending();
+                cv::waitKey(1);
+                Clock::time_point painted = Clock::now();
 
-                // 接受语音
-                char* received_data = read_from_uart(fd);
+                // 接受语音：说出任一方向即作答，超时未作答按错误处理
+                Clock::time_point answered;
+                bool responded = awaitAnswer(voice, answer, 4, painted, pacer.min_exposure_ms,
+                                             pacer.timeoutMs(), received_data, answered);
 
                 // 判断
-                if (strstr(received_data, answer[index]) != NULL) {
+                bool correct = responded && received_data.find(answer[index]) != std::string::npos;
+                if (correct) {
                     printf("判断正确\n");
                     ans++ ;
-                    free(received_data);
+                } else if (!responded) {
+                    printf("超时未作答\n");
                 }
-                cv::destroyAllWindows();
+
+                double reaction_ms = elapsed_ms(painted, answered);
+                if (responded) pacer.observe(reaction_ms);
+                Trial trial = {i, j, index, correct, !responded, elapsed_ms(requested, painted),
+                               reaction_ms, elapsed_ms(requested, Clock::now())};
+                trials.push_back(trial);
+                // 原节奏：固定等待 3 秒后再阻塞读取答案
+                fixed_estimate_ms += std::max<double>(kFixedDelayMs, trial.ui_ms + reaction_ms);
             }
-            // printf("当前测量的视力为：%.1lf\n", atof(result[j]));
+            channel.progress(ResultChannel::str("eye", eye_names[i]) + "," +
+                             ResultChannel::str("level", result[j]) + "," +
+                             ResultChannel::num("correct", ans));
             if (ans < 3){
+                std::string measured = j > 0 ? result[j - 1] : std::string("<") + result[0];
                 if (i == 0){
-                    left = result[j];// 左眼
+                    left = measured;// 左眼
                 }else{
-                    right = result[j];// 右眼
+                    right = measured;// 右眼
                 }
                 break;
             }
         }
     }
-    //printf("视力检查结果\n左眼：%.1lf\n右眼：%.1lf\n", left, right);
-    printf("视力检查结果\n左眼：%s\n右眼：%s\n", left, right);
+    printf("视力检查结果\n左眼：%s\n右眼：%s\n", left.c_str(), right.c_str());
+    printLatencySummary(trials);
+    double total_ms = elapsed_ms(run_started, Clock::now());
+    printf("本次检测总用时 %.1f 秒（固定 3 秒节奏估计 %.1f 秒，节省 %.1f 秒）\n",
+           total_ms / 1000, fixed_estimate_ms / 1000, (fixed_estimate_ms - total_ms) / 1000);
+    appendPacingLog("pacing_log.csv", total_ms, fixed_estimate_ms, trials.size());
+    channel.result(ResultChannel::str("left", left) + "," + ResultChannel::str("right", right) + "," +
+                   ResultChannel::num("trials", trials.size()) + "," +
+                   ResultChannel::num("total_ms", total_ms));
+    cv::destroyWindow("Eyes Test");
     // 显示视力结果
-    displayVision(left, right);
+    displayVision(left.c_str(), right.c_str());
     close(fd);
     return 0;
 }
@@ -0,0 +1 @@
+"""检测结果汇总服务：多台终端的结果集中入库与查询"""
@@ -0,0 +1,184 @@
+"""检测结果汇总服务：接收各终端批量上传的结果，提供区间查询与聚合统计
+
+接口（JSON，请求体与响应体均可用 gzip 压缩）:
+    POST /api/results       上传批次 {"station": "kiosk-01", "results": [
+                                {"id": "<全局唯一>", "person": "...", "module": "height",
+                                 "ts": 1700000000.0, "data": {"height_cm": 172.5}}, ...]}
+                            返回 {"accepted": n, "duplicates": m}；重传的结果按 id 去重
+    GET  /api/results       ?person= &station= &module= &since= &until= &limit=
+    GET  /api/aggregate     ?module= &metric= [&station= &since= &until= &bucket=秒 &by=station]
+    GET  /api/stations      各终端结果条数与最后上传时间
+    GET  /healthz
+
+用法: python fleet/server.py [--host 0.0.0.0] [--port 8750] [--db fleet.sqlite3]
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fleet.store import BatchError, FleetStore, parse_batch
+
+DEFAULT_PORT = 8750
+MAX_BODY = 8 << 20       # 压缩后的请求体上限
+MAX_JSON = 64 << 20      # 解压后的上限，防止压缩炸弹
+GZIP_MIN_BYTES = 1024
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def decode_body(body, encoding):
+    if encoding in ("", "identity"):
+        data = body
+    elif encoding == "gzip":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = inflater.decompress(body, MAX_JSON)
+        except zlib.error as e:
+            raise RequestError(400, f"gzip 数据损坏: {e}") from None
+        if inflater.unconsumed_tail:
+            raise RequestError(413, "解压后的请求体过大")
+    else:
+        raise RequestError(415, f"不支持的编码 {encoding}")
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise RequestError(400, f"JSON 格式错误: {e}") from None
+
+
+def query_value(query, name, kind=str, default=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return kind(values[-1])
+    except ValueError:
+        raise RequestError(400, f"参数 {name} 取值错误: {values[-1]!r}") from None
+
+
+class FleetHandler(BaseHTTPRequestHandler):
+    server_version = "HealthFleet/1.0"
+    protocol_version = "HTTP/1.1"  # 终端复用连接连续上传
+
+    def do_POST(self):
+        self.dispatch({"/api/results": self.post_results})
+
+    def do_GET(self):
+        self.dispatch({
+            "/api/results": self.get_results,
+            "/api/aggregate": self.get_aggregate,
+            "/api/stations": self.get_stations,
+            "/healthz": lambda query: {"ok": True, **self.server.store.stats},
+        })
+
+    def dispatch(self, routes):
+        url = urlsplit(self.path)
+        handler = routes.get(url.path)
+        try:
+            if handler is None:
+                raise RequestError(404, f"未知路径 {url.path}")
+            self.reply(200, handler(parse_qs(url.query)))
+        except RequestError as e:
+            self.reply(e.status, {"error": str(e)})
+        except BatchError as e:
+            self.reply(400, {"error": str(e)})
+        except (TimeoutError, OSError, sqlite3.Error) as e:
+            self.reply(503, {"error": f"暂时无法写入: {e}"})
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise RequestError(413, "请求体过大")
+        body = self.rfile.read(length)
+        return decode_body(body, self.headers.get("Content-Encoding", "").strip().lower())
+
+    def post_results(self, query):
+        station, rows = parse_batch(self.read_body())
+        accepted, duplicates = self.server.store.ingest(station, rows)
+        return {"accepted": accepted, "duplicates": duplicates}
+
+    def get_results(self, query):
+        return {"results": self.server.store.results(
+            person=query_value(query, "person"),
+            station=query_value(query, "station"),
+            module=query_value(query, "module"),
+            since=query_value(query, "since", float),
+            until=query_value(query, "until", float),
+            limit=query_value(query, "limit", int, 500))}
+
+    def get_aggregate(self, query):
+        module, metric = query_value(query, "module"), query_value(query, "metric")
+        if not module or not metric:
+            raise RequestError(400, "需要 module 与 metric 参数")
+        bucket = query_value(query, "bucket", int, 3600)
+        if bucket < 1:
+            raise RequestError(400, "bucket 必须为正整数（秒）")
+        return {"groups": self.server.store.aggregate(
+            module, metric,
+            station=query_value(query, "station"),
+            since=query_value(query, "since", float),
+            until=query_value(query, "until", float),
+            bucket=bucket,
+            by_station=query_value(query, "by") == "station")}
+
+    def get_stations(self, query):
+        return {"stations": self.server.store.stations()}
+
+    def reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code="-", size="-"):
+        # 只记录出错的请求，正常上传量大时不刷屏
+        if str(getattr(code, "value", code)).startswith(("4", "5")):
+            super().log_request(code, size)
+
+
+class FleetServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, store):
+        super().__init__(address, FleetHandler)
+        self.store = store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default="fleet.sqlite3")
+    args = parser.parse_args()
+
+    store = FleetStore(args.db)
+    server = FleetServer((args.host, args.port), store)
+    print(f"汇总服务已启动: http://{args.host}:{server.server_port}  数据库 {os.path.abspath(args.db)}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""汇总库：多台检测终端上传的检测结果（SQLite）
+
+results 表保存每条结果的原始数据，按人员、终端、模块与时间分别建索引；
+metrics 表把结果中的数值字段展开成一行一个指标，主键即 (模块, 指标, 时间)，
+区间聚合只需顺序扫描一段连续的 B 树。
+
+写入由单独的写线程完成：各请求线程提交批次后等待，写线程把排队中的
+多个批次合并到一个事务中提交（组提交），提交后再通知请求线程返回。
+查询使用各线程自己的只读连接，WAL 模式下与写入互不阻塞。
+"""
+import json
+import math
+import queue
+import sqlite3
+import threading
+import time
+
+MAX_BATCH = 5000
+GROUP_COMMIT_ROWS = 20000
+QUERY_LIMIT = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL UNIQUE,
+    station TEXT NOT NULL,
+    person TEXT,
+    module TEXT NOT NULL,
+    ts REAL NOT NULL,
+    received REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_person ON results (person, ts);
+CREATE INDEX IF NOT EXISTS results_station ON results (station, ts);
+CREATE INDEX IF NOT EXISTS results_module ON results (module, ts);
+CREATE INDEX IF NOT EXISTS results_ts ON results (ts);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    module TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts REAL NOT NULL,
+    result_id INTEGER NOT NULL,
+    station TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (module, metric, ts, result_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metrics_station ON metrics (station, module, metric, ts);
+"""
+
+
+class BatchError(ValueError):
+    """上传的批次格式错误"""
+
+
+def parse_batch(batch):
+    """校验一个上传批次，返回 (终端名, [(uid, person, module, ts, data), ...])"""
+    if not isinstance(batch, dict):
+        raise BatchError("批次必须是 JSON 对象")
+    station = batch.get("station")
+    records = batch.get("results")
+    if not isinstance(station, str) or not station:
+        raise BatchError("缺少 station")
+    if not isinstance(records, list):
+        raise BatchError("缺少 results 列表")
+    if len(records) > MAX_BATCH:
+        raise BatchError(f"单个批次最多 {MAX_BATCH} 条结果")
+    rows = []
+    for index, record in enumerate(records):
+        try:
+            uid, module, ts, data = record["id"], record["module"], float(record["ts"]), record["data"]
+        except (KeyError, TypeError, ValueError):
+            raise BatchError(f"第 {index} 条结果缺少 id / module / ts / data") from None
+        except OverflowError:
+            raise BatchError(f"第 {index} 条结果 ts 超出范围") from None
+        if not math.isfinite(ts):
+            raise BatchError(f"第 {index} 条结果 ts 不是有限数值")
+        person = record.get("person")
+        if not isinstance(uid, str) or not isinstance(module, str) or not isinstance(data, dict):
+            raise BatchError(f"第 {index} 条结果字段类型错误")
+        if person is not None and not isinstance(person, str):
+            raise BatchError(f"第 {index} 条结果 person 必须是字符串")
+        try:
+            finite = all(math.isfinite(value) for _, value in numeric_fields(data, skip_nan=False))
+        except OverflowError:
+            finite = False
+        if not finite:
+            raise BatchError(f"第 {index} 条结果含有超出范围或非有限的数值")
+        rows.append((uid, person, module, ts, data))
+    return station, rows
+
+
+def numeric_fields(data, skip_nan=True):
+    """结果中可聚合的数值字段（布尔值记为 0/1）；过大的整数在 float 时抛出 OverflowError"""
+    for key, value in data.items():
+        if isinstance(value, (int, float)) and (value == value or not skip_nan):
+            yield key, float(value)
+
+
+class FleetStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.pending = queue.Queue()
+        self.stats = {"batches": 0, "commits": 0, "rows": 0, "duplicates": 0}
+
+        db = self.connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+        self.db = db
+        self.next_id = (db.execute("SELECT MAX(id) FROM results").fetchone()[0] or 0) + 1
+        self.writer = threading.Thread(target=self.write_loop, name="fleet-writer", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA busy_timeout=5000")
+        return db
+
+    def reader(self):
+        """当前线程的只读连接"""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = self.connect()
+            db.execute("PRAGMA query_only=ON")
+        return db
+
+    # ---- 写入 ----
+
+    def ingest(self, station, rows, timeout=30):
+        """提交一个已校验的批次并等待落盘，返回 (新写入条数, 重复条数)"""
+        job = {"station": station, "rows": rows, "done": threading.Event(), "result": None}
+        self.pending.put(job)
+        if not job["done"].wait(timeout):
+            raise TimeoutError("写入超时")
+        if isinstance(job["result"], Exception):
+            raise job["result"]
+        return job["result"]
+
+    def write_loop(self):
+        while True:
+            job = self.pending.get()
+            if job is None:
+                return
+            jobs, total = [job], len(job["rows"])
+            # 把已排队的批次并入同一个事务
+            while total < GROUP_COMMIT_ROWS:
+                try:
+                    job = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self.pending.put(None)
+                    break
+                jobs.append(job)
+                total += len(job["rows"])
+            self.commit(jobs)
+
+    def commit(self, jobs):
+        """在一个事务中写入 jobs；无论成败都设置每个批次的 done，写线程不能因异常退出"""
+        received = time.time()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+            results = [self.insert(job["station"], job["rows"], received) for job in jobs]
+            self.db.execute("COMMIT")
+        except Exception as e:
+            try:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                self.next_id = (self.db.execute("SELECT MAX(id) FROM results").fetchone()[0] or 0) + 1
+            except sqlite3.Error as rollback_error:
+                print(f"汇总库回滚失败: {rollback_error}")
+            if len(jobs) > 1:
+                # 组提交整体回滚：逐个批次单独重试，只让出错的批次失败
+                for job in jobs:
+                    self.commit([job])
+                return
+            print(f"汇总库写入失败: {e}")
+            if isinstance(e, (sqlite3.IntegrityError, ValueError, TypeError, OverflowError)):
+                # 单独写入仍失败是批次内容的问题，重传也不会成功
+                e = BatchError(f"批次无法写入: {e}")
+            results = [e]
+        else:
+            self.stats["batches"] += len(jobs)
+            self.stats["commits"] += 1
+            for accepted, duplicates in results:
+                self.stats["rows"] += accepted
+                self.stats["duplicates"] += duplicates
+        for job, result in zip(jobs, results):
+            job["result"] = result
+            job["done"].set()
+
+    def insert(self, station, rows, received):
+        # 终端重传时同一条结果会再次到达，按 uid 去重（批次内与库中）
+        uids = list({row[0] for row in rows})
+        existing = set()
+        for start in range(0, len(uids), 500):
+            chunk = uids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            existing.update(uid for (uid,) in self.db.execute(
+                f"SELECT uid FROM results WHERE uid IN ({marks})", chunk))
+
+        result_rows, metric_rows = [], []
+        for uid, person, module, ts, data in rows:
+            if uid in existing:
+                continue
+            existing.add(uid)
+            row_id = self.next_id
+            self.next_id += 1
+            result_rows.append((row_id, uid, station, person, module, ts, received,
+                                json.dumps(data, ensure_ascii=False)))
+            metric_rows.extend((module, metric, ts, row_id, station, value)
+                               for metric, value in numeric_fields(data))
+        self.db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", result_rows)
+        self.db.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)", metric_rows)
+        return len(result_rows), len(rows) - len(result_rows)
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+        self.db.close()
+
+    # ---- 查询 ----
+
+    def results(self, person=None, station=None, module=None, since=None, until=None, limit=500):
+        """按条件查询结果，时间倒序"""
+        where, args = self.filters(person=person, station=station, module=module, since=since, until=until)
+        args.append(min(limit, QUERY_LIMIT))
+        rows = self.reader().execute(
+            f"SELECT uid, station, person, module, ts, data FROM results {where} "
+            "ORDER BY ts DESC LIMIT ?", args).fetchall()
+        return [{"id": uid, "station": station, "person": person, "module": module,
+                 "ts": ts, "data": json.loads(data)}
+                for uid, station, person, module, ts, data in rows]
+
+    def aggregate(self, module, metric, station=None, since=None, until=None, bucket=3600, by_station=False):
+        """按时间桶（秒）统计某个指标的条数、最小、最大与平均值"""
+        where, args = self.filters(module=module, metric=metric, station=station, since=since, until=until)
+        group = "bucket, station" if by_station else "bucket"
+        rows = self.reader().execute(
+            f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, "
+            f"{'station' if by_station else 'NULL'}, COUNT(*), MIN(value), MAX(value), AVG(value) "
+            f"FROM metrics {where} GROUP BY {group} ORDER BY {group}",
+            [bucket, bucket] + args).fetchall()
+        return [{"bucket": start, "station": name, "count": count,
+                 "min": low, "max": high, "avg": round(mean, 3)}
+                for start, name, count, low, high, mean in rows]
+
+    def stations(self):
+        rows = self.reader().execute(
+            "SELECT station, COUNT(*), MAX(ts), MAX(received) FROM results GROUP BY station ORDER BY station")
+        return [{"station": name, "results": count, "last_ts": last_ts, "last_received": last_received}
+                for name, count, last_ts, last_received in rows]
+
+    @staticmethod
+    def filters(since=None, until=None, **equal):
+        clauses, args = [], []
+        for column, value in equal.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", args
@@ -1,12 +1,22 @@
 import sys
 import os
 import subprocess
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
-                             QHBoxLayout, QLabel, QPushButton, QFrame, QGridLayout)
+                             QHBoxLayout, QLabel, QPushButton, QFrame, QGridLayout, QLineEdit,
+                             QComboBox)
 from PyQt5.QtGui import QFont, QColor, QLinearGradient, QPainter
-from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtCore import Qt, QRectF, QTimer
 os.environ["DISPLAY"] = ":0"  # 强制本地显示
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from common import profiling
+from common.config import CONFIG_ENV, ConfigWatcher
+from common.deferred import after_first_paint
+from common.fonts import resolve_cjk_family
+from common.results import SOCKET_ENV, FrameDecoder
+from common.scheduler import SchedulerError, SessionScheduler
+
 class GradientFrame(QFrame):
     def __init__(self, color1, color2, parent=None):
         super().__init__(parent)
@@ -27,19 +37,23 @@ class HealthCheckApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("智能健康体检系统 - Linux版")
-        self.setGeometry(75, 55, 930, 180)
-        self.setStyleSheet("""
-            QMainWindow {
+        # 统一配置，子进程通过 HEALTH_CONFIG 读取同一份文件
+        self.config_watcher = ConfigWatcher(parent=self)
+        self.config_watcher.changed.connect(self.apply_config)
+        settings = self.config_watcher.config.launcher
+        self.setGeometry(75, 55, settings.window_width, settings.window_height)
+        self.setStyleSheet(f"""
+            QMainWindow {{
                 background-color: #f8f9fa;
-                font-family: 'Noto Sans CJK SC';
-            }
-            QPushButton {
+                font-family: '{resolve_cjk_family()}';
+            }}
+            QPushButton {{
                 border: none;
                 padding: 12px 20px;
                 border-radius: 8px;
                 font-size: 14px;
                 font-weight: bold;
-            }
+            }}
         """)
 
         # Linux环境下程序映射
@@ -60,7 +74,280 @@ class HealthCheckApp(QMainWindow):
             "色觉检测": "🎨"
         }
 
+        # 结果通道中的模块名 -> 卡片标题
+        self.module_map = {
+            "vitals": "血氧检测",
+            "eyes": "视力检测",
+            "height": "身高测量",
+            "weight": "体重测量",
+            "color": "色觉检测"
+        }
+        self.title_modules = {title: module for module, title in self.module_map.items()}
+        self.result_labels = {}
+
+        # 结果通道在窗口首次绘制后才监听（QtNetwork 也在那时才导入）
+        self.result_server = None
+        # 检测结果上传到汇总服务（[fleet] url 为空时不上传）
+        self.uploader = None
+        self.history = None
+        # 多名受检者可同时在不同设备上检测；selected 为操作员当前选中的场次
+        self.scheduler = SessionScheduler()
+        self.selected = None
+        self.processes = {}  # 模块名 -> 检测子进程，进程退出时释放设备
+        self.process_timer = QTimer(self)
+        self.process_timer.timeout.connect(self.reap_processes)
+        # 报告在工作进程池中生成，首次使用时创建
+        self.reports = None
         self.initUI()
+        after_first_paint(self, self.setup_result_server)
+        after_first_paint(self, self.setup_history)
+        after_first_paint(self, lambda: self.setup_uploader(self.config_watcher.config.fleet))
+
+    def apply_config(self, config):
+        self.resize(config.launcher.window_width, config.launcher.window_height)
+        self.setup_uploader(config.fleet)
+        if self.reports is not None:
+            self.reports.configure(config.report)
+
+    def setup_uploader(self, settings):
+        if not settings.url:
+            if self.uploader is not None:
+                self.uploader.close()
+                self.uploader = None
+            return
+        if self.uploader is None:
+            from common.uploader import FleetUploader
+            self.uploader = FleetUploader(settings)
+        else:
+            self.uploader.configure(settings)
+
+    def setup_result_server(self):
+        """监听子进程回传的进度与结果，数据到达时由事件循环通知，无需轮询"""
+        from PyQt5.QtNetwork import QLocalServer
+        self.result_server = QLocalServer(self)
+        name = f"health-results-{os.getpid()}"
+        QLocalServer.removeServer(name)
+        if not self.result_server.listen(name):
+            print(f"结果通道启动失败: {self.result_server.errorString()}")
+            return
+        self.result_server.newConnection.connect(self.accept_result_connection)
+
+    def setup_history(self):
+        from common.history import HistoryStore
+        try:
+            self.history = HistoryStore()
+        except (OSError, ValueError) as e:
+            print(f"历史记录库打开失败: {e}")
+            return
+        self.person_input.setEnabled(True)
+
+    def identify_person(self):
+        """刷证件 / 扫码（扫码枪以回车结束输入）后开始或切换到该受检者的场次"""
+        code = self.person_input.text().strip()
+        self.person_input.clear()
+        if not code or self.history is None:
+            return
+        session = self.scheduler.find(code)
+        if session is not None:
+            self.select_session(session)
+            self.statusBar().showMessage(f"已切换到受检者 {code}")
+            return
+
+        person, created = self.history.find_or_create(code)
+        session = self.scheduler.open(code if len(code) <= 8 else f"…{code[-4:]}", person)
+        self.history.start_session(person.id, session.started)
+        for module in self.module_map:
+            previous = self.previous_text(session, module)
+            if previous:
+                session.previous_texts[module] = previous
+        if created:
+            session.summary = f"受检者 {code}（首次检测）"
+        else:
+            last_visit = time.strftime("%Y-%m-%d", time.localtime(person.last_visit)) if person.last_visit else "-"
+            session.summary = f"受检者 {code}（第 {person.visits + 1} 次，上次 {last_visit}）"
+        self.select_session(session)
+        self.statusBar().showMessage(f"已识别受检者 {code}，请选择检测项目")
+
+    def select_session(self, session):
+        self.selected = session
+        self.refresh_sessions()
+        self.refresh_cards()
+
+    def refresh_sessions(self):
+        """场次下拉框与受检者标签"""
+        self.session_box.blockSignals(True)
+        self.session_box.clear()
+        for session in self.scheduler.sessions:
+            busy = f" · {self.module_map[session.active[0]]}" if session.active else ""
+            self.session_box.addItem(f"{session.label}{busy}", session.id)
+            if session is self.selected:
+                self.session_box.setCurrentIndex(self.session_box.count() - 1)
+        self.session_box.blockSignals(False)
+        self.session_box.setVisible(len(self.scheduler.sessions) > 1)
+        if self.selected is None:
+            self.person_label.setText("未识别受检者")
+        else:
+            self.person_label.setText(self.selected.summary)
+
+    def session_chosen(self, index):
+        session_id = self.session_box.itemData(index)
+        for session in self.scheduler.sessions:
+            if session.id == session_id:
+                self.select_session(session)
+
+    def end_session(self):
+        if self.selected is None:
+            return
+        try:
+            self.scheduler.close(self.selected)
+        except SchedulerError as e:
+            self.statusBar().showMessage(str(e))
+            return
+        self.statusBar().showMessage(f"{self.selected.label} 的检测已结束")
+        self.select_session(self.scheduler.sessions[-1] if self.scheduler.sessions else None)
+
+    def refresh_cards(self):
+        for module in self.module_map:
+            self.refresh_card(module)
+
+    def refresh_card(self, module):
+        """卡片显示：设备被占用时显示使用者与最新读数，否则显示选中受检者的结果"""
+        label = self.result_labels[self.module_map[module]]
+        holder = self.scheduler.session_for(module)
+        session = holder or self.selected
+        if session is None:
+            label.setText("")
+            label.setToolTip("")
+            return
+        message = session.results.get(module)
+        if message is not None:
+            text = self.format_result(module, message.get("type"), message.get("data", {}))
+            if module in session.previous_texts:
+                text = f"{text} · 上次 {session.previous_texts[module]}"
+        else:
+            previous = session.previous_texts.get(module)
+            text = f"上次 {previous}" if previous else ""
+        if holder is not None and len(self.scheduler.sessions) > 1:
+            text = f"{holder.label}: {text or '检测中'}"
+        label.setText(text)
+        label.setToolTip(self.trend_text(session, module) if session.person is not None else "")
+
+    def previous_values(self, session, module):
+        """本次检测之前各字段的最近一次读数"""
+        from common.history import METRICS
+        values = {}
+        for field in METRICS.get(module, ()):
+            last = self.history.last(session.person.id, f"{module}.{field}", before=session.started)
+            if last is not None:
+                values[field] = last[1]
+        return values
+
+    def previous_text(self, session, module):
+        values = self.previous_values(session, module)
+        if not values:
+            return None
+        if module == "color":
+            return f"{values['score']:.0f} 题正确"
+        if module == "eyes":
+            # 低于最小视标的一侧不保存，只显示有记录的一侧
+            return f"左 {values.get('left', '-')} 右 {values.get('right', '-')}"
+        return self.format_result(module, "result", values)
+
+    def trend_text(self, session, module):
+        """卡片提示：各指标最近十次读数"""
+        from common.history import METRICS
+        lines = []
+        for field in METRICS.get(module, ()):
+            ts, values = self.history.trend(session.person.id, f"{module}.{field}", limit=10)
+            if len(ts):
+                points = ", ".join(f"{time.strftime('%m-%d', time.localtime(t))} {v:g}" for t, v in zip(ts, values))
+                lines.append(f"{field}: {points}")
+        return "\n".join(lines)
+
+    def generate_report(self):
+        """把选中受检者本次的检测数据交给报告进程池，界面不等待"""
+        session = self.selected
+        results = {module: message.get("data", {}) for module, message in session.results.items()} if session else {}
+        if not results:
+            self.statusBar().showMessage("本次还没有检测结果，无法生成报告")
+            return
+        if self.reports is None:
+            from common.report import ReportQueue
+            self.reports = ReportQueue(self.config_watcher.config.report, resolve_cjk_family(), self)
+            self.reports.finished.connect(lambda job_id, path: self.statusBar().showMessage(f"报告已生成: {path}"))
+            self.reports.failed.connect(lambda job_id, error: self.statusBar().showMessage(f"报告生成失败: {error}"))
+
+        job = {"person": session.code, "started": session.started, "results": results,
+               "previous": {}, "trends": {}}
+        if session.person is not None:
+            from common.report import CHARTS
+            job["previous"] = {module: self.previous_values(session, module) for module in self.module_map}
+            for metric, _, _, _ in CHARTS:
+                ts, values = self.history.trend(session.person.id, metric, limit=20)
+                job["trends"][metric] = list(zip(ts.tolist(), values.tolist()))
+        job_id = self.reports.submit(job)
+        self.statusBar().showMessage(f"报告生成中（任务 {job_id}，排队 {len(self.reports.pending)} 份）")
+
+    def accept_result_connection(self):
+        while self.result_server.hasPendingConnections():
+            conn = self.result_server.nextPendingConnection()
+            decoder = FrameDecoder()
+            conn.readyRead.connect(lambda conn=conn, decoder=decoder: self.read_results(conn, decoder))
+            conn.disconnected.connect(conn.deleteLater)
+
+    def read_results(self, conn, decoder):
+        try:
+            messages = decoder.feed(bytes(conn.readAll()))
+        except ValueError as e:
+            print(f"结果消息格式错误: {e}")
+            conn.abort()
+            return
+        for message in messages:
+            self.handle_result(message)
+
+    def handle_result(self, message):
+        module = message.get("module")
+        title = self.module_map.get(module)
+        if title is None:
+            return
+        # 结果属于正在使用该设备的受检者
+        session = self.scheduler.route(module)
+        if session is None:
+            return
+        session.results[module] = message
+        self.refresh_card(module)
+        if message.get("type") == "result":
+            self.scheduler.complete(session, module)
+            data = message.get("data", {})
+            text = self.format_result(module, "result", data)
+            self.statusBar().showMessage(f"{session.label} {title} 完成 | {text}")
+            if session.person is not None:
+                self.history.record(session.person.id, module, data, message.get("ts"))
+                self.refresh_card(module)
+            if self.uploader is not None:
+                self.uploader.enqueue(module, data, person=session.code, ts=message.get("ts"))
+
+    def format_result(self, module, kind, data):
+        """把模块回传的数据整理成卡片上显示的一行文字"""
+        try:
+            if module == "height":
+                return f"{data['height_cm']:.1f} cm"
+            if module == "weight":
+                return f"{data['weight_g']:.1f} g"
+            if module == "vitals":
+                return f"{data['spo2']:.0f}% · {data['temp']:.1f}°C · {data['bpm']:.0f}次/分"
+            if module == "color":
+                if kind == "result":
+                    verdict = "正常" if data["normal"] else "异常"
+                    return f"{verdict} {data['score']}/{data['asked']}"
+                return f"已答 {data['asked']} 题"
+            if module == "eyes":
+                if kind == "result":
+                    return f"左 {data['left']} 右 {data['right']}"
+                return f"{data['eye']} {data['level']}"
+        except (KeyError, TypeError, ValueError):
+            pass
+        return "收到数据"
 
     def initUI(self):
         # 主窗口布局
@@ -87,6 +374,55 @@ class HealthCheckApp(QMainWindow):
         title_layout.addWidget(title_label)
         title_layout.addStretch()
 
+        # 受检者：证件号 / 二维码（扫码枪等同键盘输入）
+        self.person_label = QLabel("未识别受检者")
+        self.person_label.setStyleSheet("QLabel { color: white; font-size: 14px; }")
+        title_layout.addWidget(self.person_label)
+        # 同时进行多名受检者时切换操作对象
+        self.session_box = QComboBox()
+        self.session_box.setVisible(False)
+        self.session_box.setStyleSheet("QComboBox { background-color: white; border-radius: 6px; padding: 4px 8px; }")
+        self.session_box.activated.connect(self.session_chosen)
+        title_layout.addWidget(self.session_box)
+        self.person_input = QLineEdit()
+        self.person_input.setPlaceholderText("刷证件 / 扫码 / 输入编号后回车")
+        self.person_input.setFixedWidth(240)
+        self.person_input.setStyleSheet("""
+            QLineEdit {
+                background-color: white;
+                border-radius: 6px;
+                padding: 4px 8px;
+                font-size: 14px;
+            }
+        """)
+        self.person_input.setEnabled(False)  # 历史记录库打开后启用
+        self.person_input.returnPressed.connect(self.identify_person)
+        title_layout.addWidget(self.person_input)
+
+        report_btn = QPushButton("生成报告")
+        report_btn.setCursor(Qt.PointingHandCursor)
+        report_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #4ECDC4;
+                color: white;
+                padding: 6px 14px;
+            }
+        """)
+        report_btn.clicked.connect(self.generate_report)
+        title_layout.addWidget(report_btn)
+
+        end_btn = QPushButton("结束")
+        end_btn.setCursor(Qt.PointingHandCursor)
+        end_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #6c757d;
+                color: white;
+                padding: 6px 14px;
+            }
+        """)
+        end_btn.clicked.connect(self.end_session)
+        title_layout.addWidget(end_btn)
+
         main_layout.addWidget(title_bar)
 
         # 功能卡片区域
@@ -199,6 +535,18 @@ class HealthCheckApp(QMainWindow):
         """)
         card_layout.addWidget(title_label)
 
+        # 子进程回传的最新读数或结果
+        result_label = QLabel("")
+        result_label.setAlignment(Qt.AlignCenter)
+        result_label.setStyleSheet("""
+            QLabel {
+                font-size: 14px;
+                color: white;
+            }
+        """)
+        card_layout.addWidget(result_label)
+        self.result_labels[title] = result_label
+
         # 按钮
         btn = QPushButton("开始检测")
         btn.setCursor(Qt.PointingHandCursor)
@@ -238,28 +586,82 @@ class HealthCheckApp(QMainWindow):
             self.statusBar().showMessage(f"错误: 文件 {abs_path} 没有执行权限")
             return
 
+        # 设备分配给选中的受检者；没有识别受检者时按访客开始一个场次
+        module = self.title_modules[title]
+        session = self.selected
+        if session is None:
+            session = self.scheduler.open()
+            self.select_session(session)
+        try:
+            self.scheduler.start(session, module)
+        except SchedulerError as e:
+            self.statusBar().showMessage(f"无法开始{title}: {e}")
+            return
+
         try:
             self.statusBar().showMessage(f"正在启动 {title} 检测...")
 
             # 获取程序所在目录
             program_dir = os.path.dirname(abs_path)
 
+            # 子进程读取同一份配置，并通过结果套接字回传进度与结果
+            env = dict(os.environ)
+            env[CONFIG_ENV] = self.config_watcher.path
+            if self.result_server is not None and self.result_server.isListening():
+                env[SOCKET_ENV] = self.result_server.fullServerName()
+
             if program_type == "py":
-                subprocess.Popen([sys.executable, abs_path])
+                process = subprocess.Popen([sys.executable, abs_path], env=env)
             else:
-                subprocess.Popen([abs_path], cwd=program_dir)
+                process = subprocess.Popen([abs_path], cwd=program_dir, env=env)
+            self.processes[module] = process
+            self.process_timer.start(500)
 
-            self.statusBar().showMessage(f"{title} 检测已启动 | PID: {os.getpid()}")
+            self.statusBar().showMessage(f"{session.label} {title} 检测已启动 | PID: {process.pid}")
 
         except Exception as e:
+            self.scheduler.release(session)
             self.statusBar().showMessage(f"执行错误: {str(e)}")
+        self.refresh_sessions()
+        self.refresh_card(module)
+
+    def reap_processes(self):
+        """检测程序退出后释放设备，并提示下一位可以使用该设备的受检者"""
+        for module, process in list(self.processes.items()):
+            if process.poll() is None:
+                continue
+            del self.processes[module]
+            session = self.scheduler.session_for(module)
+            if session is not None and module in session.todo:
+                # 没有收到最终结果：只释放设备，该项仍待检测；进程退出后才读到的结果照常计入
+                self.scheduler.release(session, keep_route=True)
+            else:
+                session = self.scheduler.finish(module)
+            self.refresh_card(module)
+            if session is not None:
+                hints = [f"{self.module_map[m]} → {s.label}" for s, m in self.scheduler.plan()]
+                message = f"{session.label} 的{self.module_map[module]}已结束"
+                self.statusBar().showMessage(message + (f" | 可安排: {'，'.join(hints)}" if hints else ""))
+        if not self.processes:
+            self.process_timer.stop()
+        self.refresh_sessions()
+
+    def closeEvent(self, event):
+        if self.uploader is not None:
+            self.uploader.close()
+        if self.history is not None:
+            self.history.close()
+        if self.reports is not None:
+            self.reports.shutdown()  # 等正在生成的报告写完
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    profiling.install("health_check")  # HEALTH_PROFILE 或 --profile 启用性能诊断
 
     # 设置Linux下更合适的字体
-    font = QFont("Noto Sans CJK SC", 10)
+    font = QFont(resolve_cjk_family(), 10)
     app.setFont(font)
 
     window = HealthCheckApp()
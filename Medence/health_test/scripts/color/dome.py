@@ -1,62 +1,77 @@
 import os
 import sys
+import json
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, 
                             QPushButton, QVBoxLayout, QHBoxLayout, QFrame, 
                             QSpacerItem, QSizePolicy)
-from PyQt5.QtGui import QPixmap, QFont, QFontDatabase
-from PyQt5.QtCore import Qt, QCoreApplication
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QCoreApplication, QEvent
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)  # 共用的 common 包位于 scripts/
+
+from common import profiling
+from common.config import ConfigWatcher
+from common.fonts import resolve_cjk_family
+from common.results import ResultChannel
+from common.timing import TrialClock
+from plate_cache import PlateCache
+from sequencer import AdaptiveSequencer
+from test_bank import load_bank
+
+# 题库清单，可用环境变量 HEALTH_COLOR_MANIFEST 或 config.ini 的 [color] manifest 指定其他清单
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plates.json")
 
 # 必须在创建QApplication前设置高DPI缩放
 QCoreApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
 QCoreApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
 
 class ColorVisionTest(QMainWindow):
-    def __init__(self):
+    def __init__(self, manifest=None):
         super().__init__()
         if 'DISPLAY' not in os.environ:
             os.environ['DISPLAY'] = ':0'
         
+        # 统一配置；题库清单只在开始测试时读取，窗口大小随配置文件就地更新
+        self.config_watcher = ConfigWatcher(parent=self)
+        self.settings = self.config_watcher.config.color
+        self.config_watcher.changed.connect(self.apply_config)
+
         self.setWindowTitle("色觉测试系统 - Linux版")
-        self.setFixedSize(950, 550)
+        self.setFixedSize(self.settings.window_width, self.settings.window_height)
         
-        self.current_test = 0
+        self.current_test = None  # 当前题号
+        self.asked = 0
         self.score = 0
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        self.tests = [
-            {"image": os.path.join(self.script_dir, "15.png"), "correct": "15", "options": ["1", "5", "15"]},
-            {"image": os.path.join(self.script_dir, "26.png"), "correct": "26", "options": ["2", "6", "26"]},
-            {"image": os.path.join(self.script_dir, "369.png"), "correct": "369", "options": ["3", "6", "9", "369"]}
-        ]
+        self.misses = {}  # 诊断类别 -> 答错题数
+        self.clock = TrialClock()  # 每题的出题 / 首次绘制 / 作答时间
+        self.result = None
+        self.channel = ResultChannel("color")  # 由主控程序启动时回传结果
+
+        manifest = manifest or os.environ.get("HEALTH_COLOR_MANIFEST") or self.settings.manifest
+        if manifest and not os.path.isabs(manifest):
+            manifest = os.path.join(os.path.dirname(self.config_watcher.path), manifest)
+        self.tests = load_bank(manifest or DEFAULT_MANIFEST)
+        # 清单启用 adaptive 时按作答结果选题，分类确定后提前结束
+        self.sequencer = AdaptiveSequencer(self.tests, **self.tests.adaptive) if self.tests.adaptive else None
 
         self.font_family = self.init_fonts()
         self.init_ui()
+
+        # 在后台解码并缩放后续几张图版，答题时只切换已就绪的 QPixmap
+        self.plate_cache = PlateCache(500, 350, self.devicePixelRatioF(),
+                                      prepare=self.tests.ensure_image, parent=self)
         self.load_test()
     
+    def apply_config(self, config):
+        self.settings = config.color
+        self.setFixedSize(self.settings.window_width, self.settings.window_height)
+
     def init_fonts(self):
-        # 尝试加载Linux常用中文字体
-        font_paths = [
-            "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/truetype/arphic/uming.ttc"
-        ]
-        
-        loaded_fonts = []
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                font_id = QFontDatabase.addApplicationFont(font_path)
-                if font_id != -1:
-                    loaded_fonts.extend(QFontDatabase.applicationFontFamilies(font_id))
-        
-        # 优先选择支持中文的字体
-        preferred_fonts = ["WenQuanYi Micro Hei", "Noto Sans CJK SC", 
-                         "AR PL UMing CN", "DejaVu Sans", "Sans Serif"]
-        
-        for font in preferred_fonts:
-            if font in loaded_fonts or font in QFontDatabase().families():
-                return font
-        
-        return "Sans Serif"  # 最终回退
+        # 共用的字体解析结果已持久缓存，后续启动不再枚举字体库或加载字体文件
+        return resolve_cjk_family()
     
     def init_ui(self):
         central_widget = QWidget()
@@ -89,6 +104,7 @@ class ColorVisionTest(QMainWindow):
         self.image_label = QLabel()
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setFixedSize(500, 350)
+        self.image_label.installEventFilter(self)
         self.image_layout.addWidget(self.image_label)
         main_layout.addWidget(self.image_frame, alignment=Qt.AlignCenter)
         
@@ -129,28 +145,53 @@ class ColorVisionTest(QMainWindow):
             }}
         """)
     
+    def eventFilter(self, obj, event):
+        # 图版标签出题后的第一次绘制，即受试者可以看到图版的时刻
+        if obj is self.image_label and event.type() == QEvent.Paint:
+            self.clock.painted()
+        return super().eventFilter(obj, event)
+
+    def next_index(self):
+        """下一题的题号，测试结束时返回 None"""
+        if self.sequencer is not None:
+            return self.sequencer.next_plate()
+        return self.asked if self.asked < len(self.tests) else None
+
+    def upcoming(self):
+        """接下来可能出现的题号，用于后台预取"""
+        if self.sequencer is not None:
+            return self.sequencer.peek(self.current_test)
+        start = self.current_test + 1
+        return range(start, min(start + self.tests.prefetch, len(self.tests)))
+
     def load_test(self):
-        if self.current_test < len(self.tests):
+        self.current_test = self.next_index()
+        if self.current_test is not None:
             test = self.tests[self.current_test]
-            self.title_label.setText(f"测试 {self.current_test + 1}/{len(self.tests)}: 请选择图片中显示的数字")
-            
-            if os.path.exists(test["image"]):
-                pixmap = QPixmap(test["image"])
-                if not pixmap.isNull():
-                    self.image_label.setPixmap(pixmap.scaled(
-                        500, 350, Qt.KeepAspectRatio, Qt.SmoothTransformation
-                    ))
-                else:
-                    self.image_label.setText(f"图片加载失败: {os.path.basename(test['image'])}")
-                    self.image_label.setStyleSheet("color: red; font-size: 14px;")
+            self.clock.requested(test.id)
+            if self.sequencer is not None:
+                self.title_label.setText(f"第 {self.asked + 1} 题: 请选择图片中显示的数字")
             else:
-                self.image_label.setText(f"文件不存在: {test['image']}")
+                self.title_label.setText(f"测试 {self.asked + 1}/{len(self.tests)}: 请选择图片中显示的数字")
+
+            self.plate_cache.set_device_pixel_ratio(self.devicePixelRatioF())
+            pixmap = self.plate_cache.get(test.image)
+            if not pixmap.isNull():
+                self.image_label.setPixmap(pixmap)
+            elif os.path.exists(test.image):
+                self.image_label.setText(f"图片加载失败: {os.path.basename(test.image)}")
                 self.image_label.setStyleSheet("color: red; font-size: 14px;")
+            else:
+                self.image_label.setText(f"文件不存在: {test.image}")
+                self.image_label.setStyleSheet("color: red; font-size: 14px;")
+
+            # 预取后面可能出现的图版
+            self.plate_cache.preload([self.tests[i].image for i in self.upcoming()])
             
             for i in reversed(range(self.options_layout.count())): 
                 self.options_layout.itemAt(i).widget().deleteLater()
             
-            for option in test["options"]:
+            for option in test.options:
                 btn = QPushButton(option)
                 btn.setFixedSize(120, 60)
                 btn.clicked.connect(lambda checked, opt=option: self.check_answer(opt))
@@ -160,9 +201,16 @@ class ColorVisionTest(QMainWindow):
     
     def check_answer(self, selected):
         test = self.tests[self.current_test]
-        if selected == test["correct"]:
+        correct = selected == test.correct
+        self.clock.answered(answer=selected, correct=correct)
+        if correct:
             self.score += 1
-        self.current_test += 1
+        else:
+            self.misses[test.category] = self.misses.get(test.category, 0) + 1
+        if self.sequencer is not None:
+            self.sequencer.record(self.current_test, correct)
+        self.asked += 1
+        self.channel.progress(asked=self.asked, score=self.score)
         self.load_test()
     
     def show_result(self):
@@ -171,8 +219,27 @@ class ColorVisionTest(QMainWindow):
         result_widget.setLayout(result_layout)
         self.setCentralWidget(result_widget)
         
-        result_text = f"测试完成！\n\n您的得分: {self.score}/{len(self.tests)}"
-        color = "#27ae60" if self.score >= 2 else "#e74c3c"
+        if self.sequencer is not None:
+            passed = self.sequencer.classification == "normal"
+        else:
+            passed = self.score >= self.tests.pass_score()
+
+        self.result = {
+            "score": self.score,
+            "asked": self.asked,
+            "normal": passed,
+            "classification": self.sequencer.classification if self.sequencer else None,
+            "trials": self.clock.trials,
+            "latency": self.clock.summary(),
+        }
+        print(json.dumps({"color_test": self.result}, ensure_ascii=False))
+        self.channel.result(**self.result)
+
+        result_text = f"测试完成！\n\n您的得分: {self.score}/{self.asked}"
+        reaction = self.result["latency"]["reaction_ms"].get("p50")
+        if reaction is not None:
+            result_text += f"\n反应时间中位数: {reaction / 1000:.1f} 秒"
+        color = "#27ae60" if passed else "#e74c3c"
         
         result_label = QLabel(result_text)
         result_label.setFont(QFont(self.font_family, 20, QFont.Bold))
@@ -186,11 +253,19 @@ class ColorVisionTest(QMainWindow):
         diagnosis.setAlignment(Qt.AlignCenter)
         diagnosis.setWordWrap(True)
         
-        if self.score >= 2:
+        if passed:
             diagnosis.setText("您的色觉正常")
             diagnosis.setStyleSheet("color: #27ae60;")
         else:
-            diagnosis.setText("您可能存在色觉异常\n\n注意: 此测试仅为初步筛查，\n专业诊断请咨询眼科医生")
+            # 按答错最多的混淆轴给出异常类型提示
+            names = {"protan": "红色觉异常倾向 (protan)", "deutan": "绿色觉异常倾向 (deutan)",
+                     "tritan": "蓝黄色觉异常倾向 (tritan)"}
+            if self.sequencer is not None:
+                hint = f"\n类型提示: {names[self.sequencer.classification]}"
+            else:
+                axis_misses = {k: v for k, v in self.misses.items() if k in names}
+                hint = f"\n类型提示: {names[max(axis_misses, key=axis_misses.get)]}" if axis_misses else ""
+            diagnosis.setText(f"您可能存在色觉异常{hint}\n\n注意: 此测试仅为初步筛查，\n专业诊断请咨询眼科医生")
             diagnosis.setStyleSheet("color: #e74c3c;")
         
         result_layout.addWidget(diagnosis)
@@ -209,6 +284,7 @@ if __name__ == "__main__":
         os.environ['DISPLAY'] = ':0'
     
     app = QApplication(sys.argv)
+    profiling.install("color")  # HEALTH_PROFILE 或 --profile 启用性能诊断
     window = ColorVisionTest()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
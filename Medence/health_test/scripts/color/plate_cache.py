@@ -0,0 +1,97 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+
+def decode_scaled(path, width, height, dpr):
+    """解码并缩放到目标物理像素尺寸（QImage 可在工作线程使用）"""
+    image = QImage(path)
+    if image.isNull():
+        return image
+    return image.scaled(round(width * dpr), round(height * dpr),
+                        Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, cache, key):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+
+    def run(self):
+        path, width, height, dpr = self.key
+        if self.cache.prepare is not None:
+            self.cache.prepare(path)
+        image = decode_scaled(path, width, height, dpr)
+        try:
+            self.cache.decoded.emit(self.key, image)
+        except (RuntimeError, AttributeError):
+            pass  # 窗口已关闭，缓存对象已销毁
+
+
+class PlateCache(QObject):
+    """色觉图版缓存：后台线程解码缩放，按 (路径, 尺寸, 设备像素比) 缓存，LRU 淘汰
+
+    切换图版时只需取出已就绪的 QPixmap；QPixmap 只能在界面线程创建，
+    因此工作线程产出 QImage，回到界面线程再转换。
+    prepare(path) 在解码前调用，可用于按需生成图版文件。
+    """
+
+    decoded = pyqtSignal(tuple, QImage)
+
+    def __init__(self, width, height, dpr=1.0, capacity=32, prepare=None, parent=None):
+        super().__init__(parent)
+        self.prepare = prepare
+        self.width = width
+        self.height = height
+        self.dpr = dpr
+        self.capacity = capacity
+        self.pixmaps = OrderedDict()
+        self.pending = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.decoded.connect(self.on_decoded)
+
+    def key(self, path):
+        return (path, self.width, self.height, self.dpr)
+
+    def set_device_pixel_ratio(self, dpr):
+        """屏幕缩放变化后，新的请求按新比例缓存，旧条目由 LRU 自然淘汰"""
+        self.dpr = dpr
+
+    def preload(self, paths):
+        for path in paths:
+            key = self.key(path)
+            if key in self.pixmaps or key in self.pending:
+                continue
+            self.pending.add(key)
+            self.pool.start(_DecodeTask(self, key))
+
+    def on_decoded(self, key, image):
+        self.pending.discard(key)
+        self.store(key, image)
+
+    def store(self, key, image):
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(key[3])
+        self.pixmaps[key] = pixmap
+        self.pixmaps.move_to_end(key)
+        while len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+    def get(self, path):
+        """取出缩放好的图版；尚未就绪时在当前线程同步解码"""
+        key = self.key(path)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+            return pixmap
+        if self.prepare is not None:
+            self.prepare(path)
+        return self.store(key, decode_scaled(*key))
+
+    def wait(self):
+        """等待所有后台解码完成（用于测试与基准）"""
+        self.pool.waitForDone()
@@ -0,0 +1,213 @@
+"""伪同色图（Ishihara 风格）图版生成器
+
+按任意数字与混淆轴配色生成图版，点阵排布与着色全部用 NumPy 向量化完成；
+生成结果按参数哈希缓存为 PNG，同一参数只生成一次；后台解码线程与界面线程可能同时请求同一图版，
+按路径加锁，另一线程等待后直接使用生成好的文件。
+NumPy 在真正生成图版时才导入，题库只查询缓存路径时不加载。
+
+用法: python plate_gen.py 74 [--axis deutan] [--size 500] [--seed 0]
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)  # 共用的 common 包位于 scripts/
+from common.paths import cache_dir
+
+# 参数或算法变化时递增，使旧缓存失效
+GENERATOR_VERSION = 1
+
+PATH_LOCKS = {}  # 缓存路径 -> 生成该图版时持有的锁
+PATH_LOCKS_GUARD = threading.Lock()
+
+# 5x7 点阵数字字形
+DIGIT_GLYPHS = {
+    "0": ["01110", "10001", "10011", "10101", "11001", "10001", "01110"],
+    "1": ["00100", "01100", "00100", "00100", "00100", "00100", "01110"],
+    "2": ["01110", "10001", "00001", "00010", "00100", "01000", "11111"],
+    "3": ["11111", "00010", "00100", "00010", "00001", "10001", "01110"],
+    "4": ["00010", "00110", "01010", "10010", "11111", "00010", "00010"],
+    "5": ["11111", "10000", "11110", "00001", "00001", "10001", "01110"],
+    "6": ["00110", "01000", "10000", "11110", "10001", "10001", "01110"],
+    "7": ["11111", "00001", "00010", "00100", "01000", "01000", "01000"],
+    "8": ["01110", "10001", "10001", "01110", "10001", "10001", "01110"],
+    "9": ["01110", "10001", "10001", "01111", "00001", "00010", "01100"],
+}
+
+# 各混淆轴的图形色 / 背景色：同一轴上的色觉异常者难以区分两组颜色
+CONFUSION_AXES = {
+    "protan": {
+        "figure": [(205, 95, 85), (220, 112, 96), (196, 84, 78), (214, 124, 104)],
+        "background": [(150, 140, 92), (166, 154, 102), (136, 130, 86), (158, 146, 110)],
+    },
+    "deutan": {
+        "figure": [(226, 140, 62), (236, 156, 76), (214, 128, 56), (230, 166, 96)],
+        "background": [(140, 170, 82), (156, 182, 96), (126, 160, 76), (168, 178, 104)],
+    },
+    "tritan": {
+        "figure": [(132, 128, 196), (146, 140, 210), (120, 118, 186), (156, 150, 204)],
+        "background": [(112, 168, 150), (124, 178, 160), (100, 158, 140), (132, 172, 150)],
+    },
+    # 示教图：所有人都应能读出，用于检查受试者是否理解测试
+    "demo": {
+        "figure": [(232, 110, 52), (240, 128, 64), (222, 100, 48)],
+        "background": [(120, 128, 140), (136, 144, 156), (108, 116, 128)],
+    },
+}
+
+
+def digit_mask(digits):
+    """把数字串拼成一张布尔字形图（字间空一列）"""
+    import numpy as np
+    rows = []
+    for r in range(7):
+        row = "0".join(DIGIT_GLYPHS[d][r] for d in digits)
+        rows.append([c == "1" for c in row])
+    return np.array(rows, dtype=bool)
+
+
+def generate_plate(digits, axis="deutan", size=500, seed=0, palette=None):
+    """生成一张 size x size 的 RGB 图版（uint8 数组）"""
+    import numpy as np
+    digits = str(digits)
+    if not digits or any(d not in DIGIT_GLYPHS for d in digits):
+        raise ValueError(f"只支持数字: {digits!r}")
+    palette = palette or CONFUSION_AXES[axis]
+    figure_colors = np.array(palette["figure"], dtype=np.float32)
+    background_colors = np.array(palette["background"], dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    # 抖动网格排点：每个网格一个点，半径不超过与相邻点距离的一半
+    cell = max(4, size // 40)
+    grid = -(-size // cell)
+    gy, gx = np.mgrid[0:grid, 0:grid].astype(np.float32)
+    cx = (gx + 0.5 + rng.uniform(-0.25, 0.25, gx.shape)) * cell
+    cy = (gy + 0.5 + rng.uniform(-0.25, 0.25, gy.shape)) * cell
+
+    padded_x = np.pad(cx, 1, constant_values=np.inf)
+    padded_y = np.pad(cy, 1, constant_values=np.inf)
+    nearest = np.full(cx.shape, np.inf, dtype=np.float32)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dx == 0 and dy == 0:
+                continue
+            nx = padded_x[1 + dy:1 + dy + grid, 1 + dx:1 + dx + grid]
+            ny = padded_y[1 + dy:1 + dy + grid, 1 + dx:1 + dx + grid]
+            nearest = np.minimum(nearest, np.hypot(cx - nx, cy - ny))
+    radius = np.minimum(rng.uniform(0.30, 0.62, cx.shape) * cell, nearest / 2 - 0.6)
+
+    # 只保留圆形图版内的点
+    center = size / 2.0
+    plate_radius = center - cell * 0.5
+    inside = np.hypot(cx - center, cy - center) + radius <= plate_radius
+    radius = np.where(inside, radius, 0.0)
+
+    # 按点中心是否落在字形内决定取图形色还是背景色，并加少量亮度抖动
+    mask = digit_mask(digits)
+    glyph_h, glyph_w = mask.shape
+    scale = min(size * 0.62 / glyph_w, size * 0.50 / glyph_h)
+    x0 = center - glyph_w * scale / 2
+    y0 = center - glyph_h * scale / 2
+    mx = np.floor((cx - x0) / scale).astype(int)
+    my = np.floor((cy - y0) / scale).astype(int)
+    in_box = (mx >= 0) & (mx < glyph_w) & (my >= 0) & (my < glyph_h)
+    on_figure = np.zeros(cx.shape, dtype=bool)
+    on_figure[in_box] = mask[my[in_box], mx[in_box]]
+
+    colors = np.where(on_figure[..., None],
+                      figure_colors[rng.integers(len(figure_colors), size=cx.shape)],
+                      background_colors[rng.integers(len(background_colors), size=cx.shape)])
+    colors *= rng.uniform(0.9, 1.1, cx.shape)[..., None]
+    colors = np.clip(colors, 0, 255).astype(np.uint8)
+
+    # 栅格化：点互不重叠，每个像素只需检查所在网格及 8 邻域的点；
+    # 图像按 (网格行, 格内行, 网格列, 格内列) 分块，全部用广播完成
+    span = grid * cell
+    local = np.arange(cell, dtype=np.float32) + 0.5
+    ly = local[None, :, None, None]
+    lx = local[None, None, None, :]
+    blocks = np.full((grid, cell, grid, cell, 3), 255, dtype=np.uint8)
+    padded_r = np.pad(radius, 1)
+    padded_c = np.pad(colors, ((1, 1), (1, 1), (0, 0)))
+    origin_y = (np.arange(grid, dtype=np.float32) * cell)[:, None]
+    origin_x = (np.arange(grid, dtype=np.float32) * cell)[None, :]
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            window = (slice(1 + dy, 1 + dy + grid), slice(1 + dx, 1 + dx + grid))
+            # 邻域点中心相对于本格左上角的坐标
+            oy = np.nan_to_num(padded_y[window] - origin_y, posinf=-1e6)
+            ox = np.nan_to_num(padded_x[window] - origin_x, posinf=-1e6)
+            r = padded_r[window]
+            hit = ((ly - oy[:, None, :, None]) ** 2 + (lx - ox[:, None, :, None]) ** 2
+                   < (r * r)[:, None, :, None])
+            np.copyto(blocks, padded_c[window][:, None, :, None, :], where=hit[..., None])
+    image = blocks.reshape(span, span, 3)[:size, :size]
+    return image
+
+
+def write_png(path, rgb):
+    """不依赖图像库的最小 PNG 编码（8 位 RGB，无滤波）"""
+    import numpy as np
+    height, width, _ = rgb.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(height, -1)
+
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    png = (b"\x89PNG\r\n\x1a\n"
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+           + chunk(b"IEND", b""))
+    # 临时文件名唯一，多个线程或进程同时写同一路径时各自替换，结果相同
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(png)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def plate_path(digits, axis="deutan", size=500, seed=0, palette=None, create=True):
+    """返回该参数图版的缓存路径，缓存中没有且 create 为真时先生成"""
+    params = {"v": GENERATOR_VERSION, "digits": str(digits), "axis": axis,
+              "size": size, "seed": seed, "palette": palette}
+    key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir("plates"), f"{digits}_{axis}_{key}.png")
+    if create and not os.path.exists(path):
+        with PATH_LOCKS_GUARD:
+            lock = PATH_LOCKS.setdefault(path, threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                write_png(path, generate_plate(digits, axis, size, seed, palette))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成伪同色图版")
+    parser.add_argument("digits")
+    parser.add_argument("--axis", default="deutan", choices=sorted(CONFUSION_AXES))
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cached = os.path.exists(plate_path(args.digits, args.axis, args.size, args.seed, create=False))
+    started = time.perf_counter()
+    path = plate_path(args.digits, args.axis, args.size, args.seed, create=True)
+    print(f"{'缓存命中' if cached else '生成'}耗时: {(time.perf_counter() - started) * 1000:.1f} ms")
+    print(path)
@@ -0,0 +1,94 @@
+"""自适应图版排序：根据已答结果选择下一张图版，分类结果足够确定时提前结束
+
+把受试者分为 normal / protan / deutan / tritan 四类，按贝叶斯规则更新后验；
+每一步选择期望信息增益最大的类别中的下一张图版，
+最大后验概率达到 confidence（且已答满 min_plates 张）即停止。
+"""
+import math
+
+CLASSES = ("normal", "protan", "deutan", "tritan")
+
+# 人群先验（以男性色觉异常患病率为参考）
+PRIOR = {"normal": 0.92, "protan": 0.02, "deutan": 0.05, "tritan": 0.01}
+
+# 各类受试者答对各类别图版的概率
+P_CORRECT = {
+    "demo":      {"normal": 0.97, "protan": 0.97, "deutan": 0.97, "tritan": 0.97},
+    "screening": {"normal": 0.95, "protan": 0.15, "deutan": 0.15, "tritan": 0.90},
+    "protan":    {"normal": 0.95, "protan": 0.10, "deutan": 0.55, "tritan": 0.90},
+    "deutan":    {"normal": 0.95, "protan": 0.55, "deutan": 0.10, "tritan": 0.90},
+    "tritan":    {"normal": 0.95, "protan": 0.90, "deutan": 0.90, "tritan": 0.15},
+}
+
+
+def entropy(dist):
+    return -sum(p * math.log2(p) for p in dist.values() if p > 0)
+
+
+def bayes_update(posterior, category, correct):
+    likelihood = P_CORRECT[category]
+    updated = {c: posterior[c] * (likelihood[c] if correct else 1 - likelihood[c])
+               for c in CLASSES}
+    total = sum(updated.values())
+    return {c: p / total for c, p in updated.items()}
+
+
+class AdaptiveSequencer:
+    def __init__(self, bank, confidence=0.95, min_plates=2, max_plates=None, prior=None):
+        self.bank = bank
+        self.confidence = confidence
+        self.min_plates = min_plates
+        self.max_plates = max_plates or len(bank)
+        self.posterior = dict(prior or PRIOR)
+        self.unused = list(range(len(bank)))
+        self.answers = []  # (题号, 是否答对)
+
+    @property
+    def classification(self):
+        return max(self.posterior, key=self.posterior.get)
+
+    @property
+    def done(self):
+        if not self.unused or len(self.answers) >= self.max_plates:
+            return True
+        return (len(self.answers) >= self.min_plates
+                and self.posterior[self.classification] >= self.confidence)
+
+    def information_gain(self, category):
+        """回答该类别图版后后验熵的期望下降量"""
+        p_correct = sum(self.posterior[c] * P_CORRECT[category][c] for c in CLASSES)
+        expected = 0.0
+        for correct, p in ((True, p_correct), (False, 1 - p_correct)):
+            if p > 0:
+                expected += p * entropy(bayes_update(self.posterior, category, correct))
+        return entropy(self.posterior) - expected
+
+    def next_plate(self):
+        """返回下一张图版的题号；测试应结束时返回 None"""
+        if self.done:
+            return None
+        # 同类别图版信息量相同，取清单顺序中第一张未用的
+        best = {}
+        for index in self.unused:
+            best.setdefault(self.bank[index].category, index)
+        category = max(best, key=self.information_gain)
+        return best[category]
+
+    def peek(self, index):
+        """预测答对 / 答错 index 后各自的下一题，用于提前预取"""
+        candidates = []
+        for correct in (True, False):
+            branch = AdaptiveSequencer(self.bank, self.confidence, self.min_plates,
+                                       self.max_plates, self.posterior)
+            branch.unused = [i for i in self.unused if i != index]
+            branch.answers = self.answers + [(index, correct)]
+            branch.posterior = bayes_update(self.posterior, self.bank[index].category, correct)
+            following = branch.next_plate()
+            if following is not None:
+                candidates.append(following)
+        return candidates
+
+    def record(self, index, correct):
+        self.unused.remove(index)
+        self.answers.append((index, correct))
+        self.posterior = bayes_update(self.posterior, self.bank[index].category, correct)
@@ -0,0 +1,191 @@
+"""色觉测试题库：从外部清单加载图版、答案、选项与诊断类别
+
+清单只在内容变化时解析和校验一次，编译结果缓存在本地缓存目录；
+图版文件（或生成参数）在答题时才按需加载。
+
+清单格式（JSON）::
+
+    {
+        "version": 1,
+        "pass_ratio": 0.66,
+        "prefetch": 3,
+        "adaptive": {"confidence": 0.95, "min_plates": 2, "max_plates": 12},
+        "plates": [
+            {"id": "15", "image": "15.png", "correct": "15",
+             "options": ["1", "5", "15"], "category": "screening"},
+            {"id": "g74", "generate": {"digits": "74", "axis": "protan", "seed": 1},
+             "correct": "74", "options": ["21", "74", "71"], "category": "protan"}
+        ]
+    }
+
+pass_ratio 为判定色觉正常所需的答对比例，prefetch 为提前在后台准备的图版数；
+adaptive 存在时改用 sequencer.AdaptiveSequencer 按作答结果选题并提前结束；
+每题用 image（相对清单目录的图片）或 generate（plate_gen 生成参数）指定图版，
+category 取 screening / protan / deutan / tritan / demo。
+"""
+import hashlib
+import json
+import math
+import os
+import pickle
+from collections import namedtuple
+
+import plate_gen
+from common.paths import cache_dir
+
+# 编译格式变化时递增，使旧缓存失效
+BANK_FORMAT = 3
+
+CATEGORIES = ("screening", "protan", "deutan", "tritan", "demo")
+GENERATE_KEYS = {"digits", "axis", "size", "seed"}  # generate 中可用的 plate_gen.plate_path 参数
+
+Plate = namedtuple("Plate", "id image correct options category generate")
+
+
+class ManifestError(ValueError):
+    """题库清单格式错误"""
+
+
+class TestBank:
+    def __init__(self, plates, pass_ratio, prefetch, adaptive=None):
+        self.plates = tuple(plates)
+        self.pass_ratio = pass_ratio
+        self.prefetch = prefetch
+        self.adaptive = adaptive
+        self.generators = {p.image: p.generate for p in self.plates if p.generate}
+
+    def __len__(self):
+        return len(self.plates)
+
+    def __getitem__(self, index):
+        return self.plates[index]
+
+    def images(self, start, stop):
+        return [plate.image for plate in self.plates[start:stop]]
+
+    def pass_score(self, count=None):
+        """判为正常所需的最少答对题数"""
+        count = len(self.plates) if count is None else count
+        return math.ceil(self.pass_ratio * count - 1e-9)
+
+    def ensure_image(self, path):
+        """生成型图版在首次使用时才生成（由后台解码线程调用）"""
+        params = self.generators.get(path)
+        if params and not os.path.exists(path):
+            plate_gen.plate_path(create=True, **params)
+        return path
+
+
+def _fail(message, index=None):
+    where = f"第 {index + 1} 题: " if index is not None else ""
+    raise ManifestError(f"题库清单错误: {where}{message}")
+
+
+def compile_manifest(data, base_dir):
+    """校验清单内容并编译为 TestBank"""
+    if not isinstance(data, dict) or not isinstance(data.get("plates"), list):
+        _fail("缺少 plates 列表")
+    if data.get("version", 1) != 1:
+        _fail(f"不支持的版本 {data.get('version')}")
+    pass_ratio = data.get("pass_ratio", 0.66)
+    if not isinstance(pass_ratio, (int, float)) or not 0 < pass_ratio <= 1:
+        _fail("pass_ratio 必须在 (0, 1] 之间")
+    prefetch = data.get("prefetch", 3)
+    if not isinstance(prefetch, int) or prefetch < 0:
+        _fail("prefetch 必须是非负整数")
+    if not data["plates"]:
+        _fail("plates 不能为空")
+    adaptive = data.get("adaptive")
+    if adaptive is not None:
+        if not isinstance(adaptive, dict) or set(adaptive) - {"confidence", "min_plates", "max_plates"}:
+            _fail("adaptive 只支持 confidence / min_plates / max_plates")
+        confidence = adaptive.get("confidence", 0.95)
+        if not isinstance(confidence, (int, float)) or isinstance(confidence, bool) or not 0.5 <= confidence < 1:
+            _fail("adaptive.confidence 必须在 [0.5, 1) 之间")
+        min_plates = adaptive.get("min_plates", 2)
+        max_plates = adaptive.get("max_plates", len(data["plates"]))
+        for key, value in (("min_plates", min_plates), ("max_plates", max_plates)):
+            if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                _fail(f"adaptive.{key} 必须是正整数")
+        if min_plates > max_plates:
+            _fail("adaptive.min_plates 不能大于 max_plates（默认为题数）")
+
+    plates = []
+    seen = set()
+    for index, item in enumerate(data["plates"]):
+        if not isinstance(item, dict):
+            _fail("每题必须是对象", index)
+        plate_id = str(item.get("id", index))
+        if plate_id in seen:
+            _fail(f"题目 id 重复: {plate_id}", index)
+        seen.add(plate_id)
+
+        correct = item.get("correct")
+        options = item.get("options")
+        if not isinstance(correct, str) or not correct:
+            _fail("缺少 correct", index)
+        if not isinstance(options, list) or not all(isinstance(o, str) for o in options):
+            _fail("options 必须是字符串列表", index)
+        if correct not in options:
+            _fail(f"正确答案 {correct} 不在选项中", index)
+        category = item.get("category", "screening")
+        if category not in CATEGORIES:
+            _fail(f"未知类别 {category}，可选: {', '.join(CATEGORIES)}", index)
+
+        generate = item.get("generate")
+        if generate is not None:
+            if "image" in item:
+                _fail("image 与 generate 只能二选一", index)
+            if not isinstance(generate, dict) or not str(generate.get("digits", "")).isdigit():
+                _fail("generate 需要数字 digits", index)
+            if set(generate) - GENERATE_KEYS:
+                _fail(f"generate 只支持 {' / '.join(sorted(GENERATE_KEYS))}", index)
+            if generate.get("axis", "deutan") not in plate_gen.CONFUSION_AXES:
+                _fail(f"未知混淆轴 {generate.get('axis')}", index)
+            size = generate.get("size", 500)
+            if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+                _fail("generate.size 必须是正整数", index)
+            seed = generate.get("seed", 0)
+            if not isinstance(seed, int) or isinstance(seed, bool) or seed < 0:
+                _fail("generate.seed 必须是非负整数", index)
+            generate = dict(generate, digits=str(generate["digits"]))
+            image = plate_gen.plate_path(create=False, **generate)
+        else:
+            image = item.get("image")
+            if not isinstance(image, str):
+                _fail("缺少 image 或 generate", index)
+            image = os.path.join(base_dir, image)
+
+        plates.append(Plate(plate_id, image, correct, tuple(options), category, generate))
+
+    return TestBank(plates, pass_ratio, prefetch, adaptive)
+
+
+def load_bank(manifest_path):
+    """加载题库；清单未变化时直接读取编译缓存，不再解析校验"""
+    manifest_path = os.path.abspath(manifest_path)
+    stat = os.stat(manifest_path)
+    stamp = (BANK_FORMAT, plate_gen.GENERATOR_VERSION, stat.st_mtime_ns, stat.st_size)
+    name = hashlib.sha1(manifest_path.encode()).hexdigest()[:16]
+    compiled_path = os.path.join(cache_dir("color"), f"bank_{name}.pickle")
+
+    try:
+        with open(compiled_path, "rb") as f:
+            cached_stamp, bank = pickle.load(f)
+        if cached_stamp == stamp:
+            return bank
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+        pass
+
+    with open(manifest_path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ManifestError(f"题库清单不是有效的 JSON: {e}") from e
+    bank = compile_manifest(data, os.path.dirname(manifest_path))
+
+    tmp = f"{compiled_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump((stamp, bank), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, compiled_path)
+    return bank
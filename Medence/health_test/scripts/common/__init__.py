@@ -0,0 +1 @@
+"""各检测模块共用的基础组件"""
@@ -0,0 +1,181 @@
+"""设备时钟对齐与到达时间统计
+
+每条读数在到达本进程时用 time.monotonic_ns() 打上主机时间戳（host_ns）。
+设备若在数据中带有序号（seq）或时钟计数（ticks_ms、ts），ClockAligner 把它换算为主机时间。
+传输延迟只会让读数晚到、不会早到，延迟最小的读数最接近“设备产生读数的时刻”，所以拟合的是
+(设备计数, host_ns) 的下包络：每 SEGMENT_S 秒为一段，每段只保留延迟最小的一个点，
+对最近 SEGMENTS 段的这些点做最小二乘得到斜率（每个计数对应的主机纳秒，反映设备时钟的实际速率与漂移），
+再取其中延迟最小的点作截距。
+斜率要在较长时间上估计：主机按定时器读取，到达时刻量化到读取间隔，采样周期恰为读取间隔整数倍时
+量化误差随漂移极慢地变化（80 ppm 时约 4 分钟才移过 20 ms），短窗口内看不出漂移。
+对齐后的 device_ns 与各设备共用主机时间轴，可以跨设备比较；host_ns - device_ns 为超出
+最小延迟的那部分延迟。个别读数乱序（计数小于上一条）时跳过；连续 MIN_POINTS 条回退
+说明设备重启或序号回绕，重新拟合。
+
+DeviceTiming 为每台设备累计到达间隔抖动与相对延迟的直方图，供按需查看。
+"""
+import collections
+
+from common.timing import Histogram
+
+SEGMENT_S = 10
+SEGMENTS = 64
+MIN_POINTS = 8
+MIN_SEGMENTS = 4
+
+# 读数字段 -> 设备时钟标称频率（每秒计数），None 表示未知（如序号，速率由拟合得出）
+DEVICE_CLOCKS = {"ticks_ms": 1000.0, "seq": None, "ts": 1.0}
+
+
+def least_squares(xs, ys):
+    """最小二乘斜率；点数不足或斜率不为正时返回 None"""
+    n = len(xs)
+    if n < 2:
+        return None
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx <= 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    return slope if slope > 0 else None
+
+
+class ClockAligner:
+    def __init__(self, nominal_hz=None, segments=SEGMENTS):
+        self.nominal_hz = nominal_hz
+        self.envelope = collections.deque(maxlen=segments)  # 各段延迟最小的点 (计数, 主机 ns)，相对 base
+        self.segment = []       # 当前段的点
+        self.base = None        # 原点 (设备计数, host_ns)，避免大数相减损失精度
+        self.slope = None       # 每个设备计数对应的主机纳秒
+        self.intercept = None   # 相对 base 的主机纳秒
+        self.last_ticks = None
+        self.behind = 0         # 连续回退的读数条数
+        self.reordered = 0
+        self.resets = 0
+
+    def reset(self):
+        self.envelope.clear()
+        self.segment = []
+        self.base = None
+        self.slope = None
+        self.intercept = None
+        self.resets += 1
+
+    def add(self, ticks, host_ns):
+        """加入一个观测点，返回该计数对应的主机时间（拟合完成前与乱序的读数为 None）"""
+        if self.last_ticks is not None and ticks < self.last_ticks:
+            self.behind += 1
+            if self.behind < MIN_POINTS:
+                self.reordered += 1
+                return None
+            self.reset()
+        self.behind = 0
+        self.last_ticks = ticks
+        if self.base is None:
+            self.base = (ticks, host_ns)
+        point = (ticks - self.base[0], host_ns - self.base[1])
+        self.segment.append(point)
+        if point[1] - self.segment[0][1] >= SEGMENT_S * 1e9 and len(self.segment) >= 2:
+            self.close_segment()
+        elif self.slope is None or len(self.envelope) < MIN_SEGMENTS:
+            # 刚开始还没有几段下包络，用当前段的全部点粗略拟合，点数翻倍时更新
+            count = len(self.segment)
+            if count >= MIN_POINTS and count & (count - 1) == 0:
+                self.fit()
+        elif point[1] - self.slope * point[0] < self.intercept:
+            self.intercept = point[1] - self.slope * point[0]  # 出现了延迟更小的读数
+        return self.align(ticks)
+
+    def close_segment(self):
+        slope = self.slope or least_squares(*zip(*self.segment))
+        self.envelope.append(min(self.segment, key=lambda p: p[1] - slope * p[0]) if slope else self.segment[0])
+        self.segment = []
+        self.fit()
+
+    def fit(self):
+        if len(self.envelope) >= MIN_SEGMENTS:
+            points = list(self.envelope)
+        else:
+            points = list(self.envelope) + self.segment
+        slope = least_squares([x for x, _ in points], [y for _, y in points])
+        if slope is None:
+            return
+        self.slope = slope
+        # 截距取下包络与当前段中延迟最小的点：到达时刻量化时，包络中只有少数几段碰巧几乎没有量化误差
+        self.intercept = min(y - slope * x for x, y in points + self.segment)
+
+    def align(self, ticks):
+        if self.slope is None:
+            return None
+        tick0, host0 = self.base
+        return host0 + int(self.intercept + self.slope * (ticks - tick0))
+
+    def rate_hz(self):
+        """按主机时钟测得的设备计数速率"""
+        return 1e9 / self.slope if self.slope else None
+
+    def drift_ppm(self):
+        """设备时钟相对主机的快慢（正值为设备时钟偏快）；标称频率未知时为 None"""
+        if not self.slope or not self.nominal_hz:
+            return None
+        return (1e9 / (self.slope * self.nominal_hz) - 1) * 1e6
+
+
+class DeviceTiming:
+    """一台设备的到达间隔抖动、相对延迟（需要设备计数）与时钟漂移"""
+
+    def __init__(self):
+        self.aligner = None
+        self.clock = None           # 使用的设备时钟字段
+        self.latency = Histogram()  # host_ns - device_ns（超出最小延迟的部分）
+        self.jitter = Histogram()   # 到达间隔与期望间隔之差的绝对值
+        self.interval_ns = None     # 没有设备计数时，到达间隔的 EWMA 作为期望间隔
+        self.last = None            # 上一条读数的 (host_ns, 设备计数)
+
+    def observe(self, host_ns, clock=None, ticks=None):
+        """记录一条读数，返回对齐后的设备时间（没有设备计数或尚未拟合时为 None）"""
+        if clock is not None and clock != self.clock:
+            self.clock = clock
+            self.aligner = ClockAligner(DEVICE_CLOCKS.get(clock))
+        device_ns = self.aligner.add(ticks, host_ns) if ticks is not None and self.aligner is not None else None
+
+        if self.last is not None:
+            gap = host_ns - self.last[0]
+            expected = None
+            if ticks is not None and self.last[1] is not None and self.aligner.slope and ticks >= self.last[1]:
+                expected = self.aligner.slope * (ticks - self.last[1])
+            elif self.interval_ns is not None:
+                expected = self.interval_ns
+            if expected is not None:
+                self.jitter.add(abs(gap - expected) / 1e6)
+            self.interval_ns = gap if self.interval_ns is None else 0.9 * self.interval_ns + 0.1 * gap
+        self.last = (host_ns, ticks)
+        if device_ns is not None:
+            self.latency.add(max(0, host_ns - device_ns) / 1e6)
+        return device_ns
+
+    def summary(self):
+        aligner = self.aligner
+        summary = {"latency_ms": self.latency.summary(), "jitter_ms": self.jitter.summary()}
+        if aligner is not None and aligner.slope:
+            summary.update(clock=self.clock, rate_hz=round(aligner.rate_hz(), 4), resets=aligner.resets,
+                           reordered=aligner.reordered, segments=len(aligner.envelope))
+            drift = aligner.drift_ppm()
+            if drift is not None:
+                summary["drift_ppm"] = round(drift, 1)
+        return summary
+
+    def report(self, device):
+        summary = self.summary()
+        lines = [f"== {device} ==\n"]
+        if "rate_hz" in summary:
+            drift = f"，漂移 {summary['drift_ppm']:+.1f} ppm" if "drift_ppm" in summary else ""
+            # 下包络不足 MIN_SEGMENTS 段时斜率只是粗略估计
+            lines.append(f"设备时钟 {self.clock}: {summary['rate_hz']:.4f} 计数/秒{drift}"
+                         f"（下包络 {summary['segments']} 段，满 {MIN_SEGMENTS} 段后可信），重新拟合 {summary['resets']} 次，乱序 {summary['reordered']} 条\n")
+        else:
+            lines.append("数据中没有设备序号或时钟，只统计到达间隔抖动\n")
+        lines.append(f"相对延迟 {summary['latency_ms']}\n{self.latency.render()}")
+        lines.append(f"到达抖动 {summary['jitter_ms']}\n{self.jitter.render()}")
+        return "".join(lines)
@@ -0,0 +1,190 @@
+"""统一配置：串口、MQTT、定时器间隔、窗口大小与检测阈值
+
+配置文件为 INI 格式（默认 health_test/config.ini，可用环境变量 HEALTH_CONFIG 指定），
+按 SCHEMA 校验并编译为只读快照；文件未变化时直接返回内存中的快照，不再解析。
+ConfigWatcher 通过 QFileSystemWatcher（Linux 下为 inotify）监视文件，保存后发出新快照，
+各模块据此就地应用变化。
+"""
+import configparser
+import os
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, pyqtSignal
+
+CONFIG_ENV = "HEALTH_CONFIG"
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                              "config.ini")
+
+# 节 -> 键 -> (类型, 默认值, 取值约束)；约束为最小值或可选值元组
+SCHEMA = {
+    "launcher": {
+        "window_width": (int, 930, 100),
+        "window_height": (int, 180, 100),
+    },
+    "height": {
+        "port": (str, "/dev/ttyUSB0", None),
+        "baud": (int, 9600, 1),
+        "poll_ms": (int, 100, 10),
+        "stall_ms": (int, 2000, 100),
+        "window_width": (int, 960, 100),
+        "window_height": (int, 530, 100),
+    },
+    "weight": {
+        "port": (str, "/dev/ttyACM0", None),
+        "baud": (int, 115200, 1),
+        "poll_ms": (int, 100, 10),
+        "stall_ms": (int, 2000, 100),
+        "dtr_pulse_ms": (int, 0, 0),
+        "window_width": (int, 1024, 100),
+        "window_height": (int, 768, 100),
+    },
+    "vitals": {
+        "broker": (str, "broker.hivemq.com", None),
+        "port": (int, 1883, 1),
+        "topic": (str, "sensor/combined", None),
+        "device_topic": (str, "sensor/+/combined", None),
+        "transport": (str, "thread", ("thread", "asyncio")),
+        "keepalive": (int, 60, 5),
+        "table_refresh_ms": (int, 200, 10),
+        "spool_max_rows": (int, 10000, 1),
+        "spool_drain_ms": (int, 100, 10),
+        "spool_batch": (int, 200, 1),
+        "window_width": (int, 950, 100),
+        "window_height": (int, 600, 100),
+    },
+    "color": {
+        "manifest": (str, "", None),
+        "window_width": (int, 950, 100),
+        "window_height": (int, 550, 100),
+    },
+    "fleet": {
+        "url": (str, "", None),
+        "station": (str, "", None),
+        "batch": (int, 200, 1),
+        "upload_ms": (int, 5000, 100),
+        "timeout_ms": (int, 5000, 100),
+        "queue_max_rows": (int, 100000, 1),
+    },
+    "report": {
+        "workers": (int, 0, 0),
+        "format": (str, "html", ("html", "pdf")),
+        "output_dir": (str, "", None),
+    },
+    "eyes": {
+        "uart": (str, "/dev/ttyS9", None),
+        "baud": (int, 9600, 1),
+        "window_width": (int, 950, 100),
+        "window_height": (int, 600, 100),
+        "distance_mm": (float, 2500.0, 100.0),
+        "dpi": (float, 96.0, 10.0),
+        "min_exposure_ms": (int, 800, 0),
+        "timeout_ms": (int, 6000, 100),
+        "min_timeout_ms": (int, 2500, 100),
+        "max_timeout_ms": (int, 10000, 100),
+    },
+}
+
+SECTIONS = {name: namedtuple(f"{name.capitalize()}Config", list(keys)) for name, keys in SCHEMA.items()}
+Config = namedtuple("Config", list(SCHEMA))
+
+_cache = {}  # 配置文件路径 -> (文件状态, 快照)
+
+
+class ConfigError(ValueError):
+    """配置文件格式或取值错误"""
+
+
+def config_path():
+    return os.path.abspath(os.environ.get(CONFIG_ENV) or DEFAULT_CONFIG)
+
+
+def _convert(section, key, raw):
+    kind, _, rule = SCHEMA[section][key]
+    try:
+        value = kind(raw.strip())
+    except ValueError:
+        raise ConfigError(f"配置错误: [{section}] {key} = {raw!r} 不是有效的 {kind.__name__}") from None
+    if isinstance(rule, tuple) and value not in rule:
+        raise ConfigError(f"配置错误: [{section}] {key} 可选: {', '.join(rule)}")
+    if rule is not None and not isinstance(rule, tuple) and value < rule:
+        raise ConfigError(f"配置错误: [{section}] {key} 不能小于 {rule}")
+    return value
+
+
+def compile_config(parser):
+    """校验 INI 内容并编译为 Config 快照；未出现的键取默认值"""
+    for section in parser.sections():
+        if section not in SCHEMA:
+            raise ConfigError(f"配置错误: 未知的节 [{section}]")
+        unknown = set(parser[section]) - set(SCHEMA[section])
+        if unknown:
+            raise ConfigError(f"配置错误: [{section}] 未知的键 {', '.join(sorted(unknown))}")
+
+    sections = {}
+    for section, keys in SCHEMA.items():
+        values = {}
+        for key, (_, default, _) in keys.items():
+            if parser.has_option(section, key):
+                values[key] = _convert(section, key, parser.get(section, key))
+            else:
+                values[key] = default
+        sections[section] = SECTIONS[section](**values)
+    eyes = sections["eyes"]
+    if eyes.min_timeout_ms > eyes.max_timeout_ms:
+        raise ConfigError("配置错误: [eyes] min_timeout_ms 不能大于 max_timeout_ms")
+    return Config(**sections)
+
+
+def load_config(path=None):
+    """返回配置快照；文件不存在时全部取默认值"""
+    path = os.path.abspath(path) if path else config_path()
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        stamp = None
+
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    parser = configparser.ConfigParser(interpolation=None, inline_comment_prefixes=(";", "#"))
+    if stamp is not None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                parser.read_file(f)
+        except configparser.Error as e:
+            raise ConfigError(f"配置文件格式错误: {e}") from e
+    config = compile_config(parser)
+    _cache[path] = (stamp, config)
+    return config
+
+
+class ConfigWatcher(QObject):
+    """监视配置文件，内容变化且校验通过后发出 changed(新快照)"""
+
+    changed = pyqtSignal(object)
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.path = os.path.abspath(path) if path else config_path()
+        self.config = load_config(self.path)
+        self.watcher = QFileSystemWatcher(self)
+        # 编辑器常以"写临时文件再改名"的方式保存，同时监视所在目录才能跟上新文件
+        self.watcher.addPath(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            self.watcher.addPath(self.path)
+        self.watcher.fileChanged.connect(self.reload)
+        self.watcher.directoryChanged.connect(self.reload)
+
+    def reload(self, *args):
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+        try:
+            config = load_config(self.path)
+        except ConfigError as e:
+            print(f"{e}，继续使用原配置")
+            return
+        if config != self.config:
+            self.config = config
+            self.changed.emit(config)
@@ -0,0 +1,25 @@
+"""首帧绘制之后再执行的初始化
+
+串口、MQTT、NumPy 等较重的依赖在窗口第一次绘制完成后才加载，
+让界面先出现，再在事件循环中完成连接。
+"""
+from PyQt5.QtCore import QEvent, QObject, QTimer
+
+
+class _FirstPaint(QObject):
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            # 等本次绘制结束后再执行，不拖慢首帧
+            QTimer.singleShot(0, self.callback)
+        return False
+
+
+def after_first_paint(widget, callback):
+    """widget 首次绘制后在事件循环中调用一次 callback"""
+    _FirstPaint(widget, callback)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+from PyQt5.QtGui import QFontDatabase
+
+from common.paths import cache_dir
+
+# 按优先级排列的中文字体族
+CJK_FAMILIES = ["WenQuanYi Micro Hei", "Noto Sans CJK SC", "Source Han Sans SC",
+                "Microsoft YaHei", "AR PL UMing CN"]
+# 没有中文字体时的最终回退
+FALLBACK_FAMILIES = ["DejaVu Sans", "Sans Serif"]
+
+# 系统未登记时才需要手动加载的字体文件
+CJK_FONT_FILES = [
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/arphic/uming.ttc",
+]
+
+FONT_DIRS = ["/usr/share/fonts", "/usr/local/share/fonts",
+             os.path.expanduser("~/.fonts"), os.path.expanduser("~/.local/share/fonts")]
+
+_resolved = None
+
+
+def font_set_fingerprint():
+    """已安装字体集合的指纹：只读取字体目录的修改时间，不打开字体文件"""
+    digest = hashlib.sha1()
+    for root in FONT_DIRS:
+        for path, dirs, _ in os.walk(root):
+            dirs.sort()
+            try:
+                digest.update(f"{path}:{os.stat(path).st_mtime_ns}\n".encode())
+            except OSError:
+                pass
+    return digest.hexdigest()
+
+
+def _scan():
+    """完整查找：先查系统字体库，找不到再加载字体文件"""
+    families = set(QFontDatabase().families())
+    for family in CJK_FAMILIES:
+        if family in families:
+            return family, None
+
+    for path in CJK_FONT_FILES:
+        if not os.path.exists(path):
+            continue
+        font_id = QFontDatabase.addApplicationFont(path)
+        if font_id == -1:
+            continue
+        loaded = QFontDatabase.applicationFontFamilies(font_id)
+        for family in CJK_FAMILIES:
+            if family in loaded:
+                return family, path
+
+    for family in FALLBACK_FAMILIES:
+        if family in families:
+            return family, None
+    return "Sans Serif", None
+
+
+def resolve_cjk_family():
+    """返回可用的中文字体族名（需在 QApplication 创建之后调用）
+
+    结果按字体集合指纹持久缓存，之后的启动直接复用，不再枚举字体库或加载字体文件。
+    """
+    global _resolved
+    if _resolved is not None:
+        return _resolved
+
+    fingerprint = font_set_fingerprint()
+    cache_path = os.path.join(cache_dir(), "fonts.json")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["fingerprint"] == fingerprint:
+            if cached["file"]:
+                QFontDatabase.addApplicationFont(cached["file"])
+            _resolved = cached["family"]
+            return _resolved
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    family, font_file = _scan()
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "family": family, "file": font_file}, f)
+    except OSError as e:
+        print(f"字体缓存写入失败: {e}")
+    _resolved = family
+    return family
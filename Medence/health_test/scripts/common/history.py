@@ -0,0 +1,209 @@
+"""受检者与历史读数：证件号 / 二维码查人，按指标查询历次测量趋势
+
+人员与检测场次保存在 SQLite 中，证件号 / 二维码内容上建唯一索引（B 树，O(log n) 查找）。
+每个指标的历史读数按列追加到定长二进制文件（ts.f8、value.f4、prev.i4），
+用 numpy.memmap 映射读取；prev 列指向同一人该指标的上一条记录，
+heads 表记录每人每个指标的最新记录位置。查询趋势时沿链回溯，
+只触及该人自己的几十到几百条记录，与历史总量无关。
+"""
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from common.paths import data_dir
+
+# 模块回传结果中需要保存历史的字段
+METRICS = {
+    "height": ("height_cm",),
+    "weight": ("weight_g",),
+    "vitals": ("spo2", "temp", "bpm"),
+    "color": ("score",),
+    "eyes": ("left", "right"),
+}
+
+COLUMNS = (("ts", "<f8"), ("value", "<f4"), ("prev", "<i4"))
+
+Person = namedtuple("Person", "id code created visits last_visit")
+
+
+def metric_value(value):
+    """可保存的数值；视力检测以字符串回传（如 "1.0"），"<0.4" 这类下限值不保存"""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return value
+
+
+class MetricLog:
+    """单个指标的列式追加日志，记录号从 0 开始"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = {name: os.path.join(directory, f"{name}.{dtype[1:]}") for name, dtype in COLUMNS}
+        self.dtypes = dict(COLUMNS)
+        # 追加中途断电时各列长度可能不一致，按最短的一列截齐
+        lengths = [os.path.getsize(path) // np.dtype(self.dtypes[name]).itemsize if os.path.exists(path) else 0
+                   for name, path in self.paths.items()]
+        self.count = min(lengths)
+        self.files = {}
+        for name, path in self.paths.items():
+            f = open(path, "ab")
+            f.truncate(self.count * np.dtype(self.dtypes[name]).itemsize)
+            self.files[name] = f
+        self.maps = {}
+        self.mapped = 0
+
+    def append(self, ts, value, prev):
+        for name, item in (("ts", ts), ("value", value), ("prev", prev)):
+            f = self.files[name]
+            f.write(np.array([item], dtype=self.dtypes[name]).tobytes())
+            f.flush()
+        self.count += 1
+        return self.count - 1
+
+    def columns(self):
+        """当前全部记录的只读映射，有新记录时重新映射"""
+        if self.mapped != self.count:
+            self.maps = {name: np.memmap(path, dtype=self.dtypes[name], mode="r", shape=(self.count,))
+                         for name, path in self.paths.items()} if self.count else {}
+            self.mapped = self.count
+        return self.maps
+
+    def chain(self, head, since=None, limit=None):
+        """从 head 沿 prev 回溯，返回按时间升序的 (ts, value) 数组"""
+        empty = (np.empty(0, "<f8"), np.empty(0, "<f4"))
+        if head < 0 or not self.count:
+            return empty
+        maps = self.columns()
+        ts, prev = maps["ts"], maps["prev"]
+        indices = []
+        index = head
+        while index >= 0 and (limit is None or len(indices) < limit):
+            if since is not None and ts[index] < since:
+                break
+            indices.append(index)
+            index = int(prev[index])
+        if not indices:
+            return empty
+        order = np.array(indices[::-1], dtype=np.int64)
+        return np.asarray(ts[order]), np.asarray(maps["value"][order])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.maps = {}
+
+
+class HistoryStore:
+    def __init__(self, directory=None):
+        self.directory = directory or data_dir("history")
+        self.db = sqlite3.connect(os.path.join(self.directory, "people.sqlite3"), isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS persons (
+                id INTEGER PRIMARY KEY,
+                code TEXT NOT NULL UNIQUE,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                person_id INTEGER NOT NULL,
+                started REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_person ON sessions (person_id, started);
+            CREATE TABLE IF NOT EXISTS heads (
+                person_id INTEGER NOT NULL,
+                metric TEXT NOT NULL,
+                head INTEGER NOT NULL,
+                PRIMARY KEY (person_id, metric)
+            ) WITHOUT ROWID;
+        """)
+        self.logs = {}
+
+    def log(self, metric):
+        log = self.logs.get(metric)
+        if log is None:
+            log = self.logs[metric] = MetricLog(os.path.join(self.directory, "metrics", metric))
+        return log
+
+    # ---- 人员与场次 ----
+
+    def find(self, code):
+        row = self.db.execute("""
+            SELECT p.id, p.code, p.created, COUNT(s.id), MAX(s.started)
+            FROM persons p LEFT JOIN sessions s ON s.person_id = p.id
+            WHERE p.code = ? GROUP BY p.id
+        """, (code,)).fetchone()
+        return Person(*row) if row else None
+
+    def find_or_create(self, code):
+        """按证件号或二维码内容查找受检者，不存在时登记，返回 (Person, 是否新登记)"""
+        code = code.strip()
+        if not code:
+            raise ValueError("证件号不能为空")
+        person = self.find(code)
+        if person is not None:
+            return person, False
+        self.db.execute("INSERT INTO persons (code, created) VALUES (?, ?)", (code, time.time()))
+        return self.find(code), True
+
+    def start_session(self, person_id, ts=None):
+        cursor = self.db.execute("INSERT INTO sessions (person_id, started) VALUES (?, ?)",
+                                 (person_id, time.time() if ts is None else ts))
+        return cursor.lastrowid
+
+    # ---- 指标历史 ----
+
+    def record(self, person_id, module, data, ts=None):
+        """保存一次检测结果中的各项指标，返回已保存的指标名"""
+        ts = time.time() if ts is None else ts
+        saved = []
+        for field in METRICS.get(module, ()):
+            value = metric_value(data.get(field))
+            if value is None:
+                continue
+            metric = f"{module}.{field}"
+            head = self.head(person_id, metric)
+            index = self.log(metric).append(ts, value, head)
+            self.db.execute("INSERT OR REPLACE INTO heads VALUES (?, ?, ?)", (person_id, metric, index))
+            saved.append(metric)
+        return saved
+
+    def head(self, person_id, metric):
+        row = self.db.execute("SELECT head FROM heads WHERE person_id = ? AND metric = ?",
+                              (person_id, metric)).fetchone()
+        # 记录号超出当前日志长度说明对应的追加未完成，视为没有历史
+        if row is None or row[0] >= self.log(metric).count:
+            return -1
+        return row[0]
+
+    def trend(self, person_id, metric, since=None, limit=None):
+        """某人某指标的历次读数，返回按时间升序的 (ts 数组, value 数组)"""
+        return self.log(metric).chain(self.head(person_id, metric), since, limit)
+
+    def last(self, person_id, metric, before=None):
+        """最近一次读数 (ts, value)；before 给出时只看该时刻之前的读数"""
+        log = self.log(metric)
+        index = self.head(person_id, metric)
+        if index < 0:
+            return None
+        maps = log.columns()
+        while index >= 0 and before is not None and maps["ts"][index] >= before:
+            index = int(maps["prev"][index])
+        if index < 0:
+            return None
+        # float32 按最短十进制表示转换，避免 1.2 显示成 1.2000000476837158
+        return float(maps["ts"][index]), float(str(maps["value"][index]))
+
+    def close(self):
+        for log in self.logs.values():
+            log.close()
+        self.db.close()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import paho.mqtt.client as mqtt
+
+from common.mqtt_link import MqttLink
+
+
+class AsyncMqttLink(MqttLink):
+    """与 MqttLink 接口相同、但运行在 asyncio 事件循环上的 MQTT 连接
+
+    paho 的套接字读写通过 add_reader/add_writer 挂到当前事件循环，
+    配合 qasync 时该循环就是 Qt 主循环：没有网络线程，回调直接在界面线程执行。
+    只有 TCP 建连这一步放进默认执行器，避免 DNS 解析卡住界面。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loop = None
+        self.loop_thread = None
+        self.tasks = []
+        self.disconnected = None
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def start(self):
+        self.loop = asyncio.get_event_loop()
+        self.loop_thread = threading.get_ident()
+        self.disconnected = asyncio.Event()
+        self.tasks = [self.loop.create_task(self.run()),
+                      self.loop.create_task(self.misc_loop())]
+
+    def stop(self):
+        self.stopping.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        for task in self.tasks:
+            task.cancel()
+
+    def request_reconnect(self):
+        self.connected = False
+        if self.loop is not None:
+            self.in_loop(self.disconnected.set)
+
+    async def run(self):
+        first = True
+        while not self.stopping.is_set():
+            self.disconnected.clear()
+            try:
+                if first:
+                    await self.loop.run_in_executor(None, self.purge_session)
+                    await self.loop.run_in_executor(
+                        None, self.client.connect, self.broker, self.port, self.keepalive)
+                    first = False
+                else:
+                    await self.loop.run_in_executor(None, self.client.reconnect)
+                self.connected = True
+                await self.disconnected.wait()
+                if self.stopping.is_set():
+                    break
+                self.connected = False
+                delay = self.backoff_delay()
+                self.handle_status(f"MQTT连接断开，{delay:.1f} 秒后重连...", "red")
+            except (OSError, ValueError) as e:
+                delay = self.backoff_delay()
+                self.handle_status(f"连接失败: {e}，{delay:.1f} 秒后重试", "red")
+            await asyncio.sleep(delay)
+
+    async def misc_loop(self):
+        """心跳与超时处理，相当于 loop_forever 中的 loop_misc"""
+        while not self.stopping.is_set():
+            if self.connected:
+                self.client.loop_misc()
+            await asyncio.sleep(1)
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.connected = False
+        self.disconnected.set()
+
+    def in_loop(self, func, *args):
+        """在事件循环线程执行 func：建连发生在执行器线程，需要切回循环线程"""
+        if threading.get_ident() == self.loop_thread:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def on_socket_open(self, client, userdata, sock):
+        self.in_loop(self.loop.add_reader, sock, self.on_readable)
+
+    def on_socket_close(self, client, userdata, sock):
+        self.in_loop(self.loop.remove_reader, sock)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.in_loop(self.loop.add_writer, sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.in_loop(self.loop.remove_writer, sock)
+
+    def on_readable(self):
+        if self.client.loop_read() != mqtt.MQTT_ERR_SUCCESS:
+            self.connected = False
+            self.disconnected.set()
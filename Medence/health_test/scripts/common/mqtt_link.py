@@ -0,0 +1,128 @@
+import random
+import socket
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+
+class MqttLink:
+    """在专用网络线程中运行的 MQTT 连接
+
+    - 固定 client_id + clean_session=False 的持久会话，断线期间的 QoS 1 消息由服务器保留；
+      持久会话只用于本次运行中的重连：进程启动后首次连接前先清除服务器上的旧会话，
+      否则程序关闭期间积压的读数（可能是上一位受检者的）会在下次启动时全部补发
+    - 重连使用带随机抖动的指数退避，只在本线程执行，不在任何回调线程里阻塞
+    - on_message(topic, payload) 与 on_status(text, color) 都在网络线程调用，
+      调用方需要自行切换到界面线程
+    """
+
+    def __init__(self, broker, port, topics, on_message, on_status,
+                 client_id=None, qos=1, keepalive=60, min_delay=1.0, max_delay=120.0):
+        self.broker = broker
+        self.port = port
+        self.topics = [topics] if isinstance(topics, str) else list(topics)
+        self.qos = qos
+        self.keepalive = keepalive
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.handle_message = on_message
+        self.handle_status = on_status
+
+        self.client_id = client_id or f"health-{socket.gethostname()}"
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id,
+                                  clean_session=False, protocol=mqtt.MQTTv311)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.on_disconnect = self.on_disconnect
+        self.client.enable_logger()
+
+        self.connected = False
+        self.attempt = 0
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="mqtt-link", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        self.thread.join(timeout=2)
+
+    def request_reconnect(self):
+        """请求网络线程立即断开并重连（任何线程都可以调用，不阻塞）"""
+        self.connected = False
+        self.wakeup.set()
+
+    def backoff_delay(self):
+        """全抖动指数退避：[min_delay, min(max_delay, min_delay*2^n)] 内均匀取值"""
+        ceiling = min(self.max_delay, self.min_delay * (2 ** self.attempt))
+        self.attempt += 1
+        return random.uniform(self.min_delay, max(self.min_delay, ceiling))
+
+    def purge_session(self, timeout=5.0):
+        """以同一 client_id、clean_session=True 连上后立即断开，服务器丢弃旧会话与积压的消息（阻塞）"""
+        purge = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id,
+                            clean_session=True, protocol=mqtt.MQTTv311)
+        purge.connect(self.broker, self.port, self.keepalive)
+        try:
+            deadline = time.monotonic() + timeout
+            while not purge.is_connected():
+                if time.monotonic() > deadline:
+                    raise OSError("清除旧会话超时")
+                if purge.loop(timeout=0.1) != mqtt.MQTT_ERR_SUCCESS:
+                    raise OSError("清除旧会话时连接断开")
+        finally:
+            purge.disconnect()
+
+    def wait(self, delay):
+        self.wakeup.wait(delay)
+        self.wakeup.clear()
+
+    def run(self):
+        first = True
+        while not self.stopping.is_set():
+            if not self.connected:
+                self.wakeup.clear()
+                try:
+                    if first:
+                        self.purge_session()
+                        self.client.connect(self.broker, self.port, self.keepalive)
+                        first = False
+                    else:
+                        self.client.reconnect()
+                    self.connected = True
+                except (OSError, ValueError) as e:
+                    delay = self.backoff_delay()
+                    self.handle_status(f"连接失败: {e}，{delay:.1f} 秒后重试", "red")
+                    self.wait(delay)
+                    continue
+
+            if self.client.loop(timeout=1.0) != mqtt.MQTT_ERR_SUCCESS:
+                self.connected = False
+            if not self.connected and not self.stopping.is_set():
+                delay = self.backoff_delay()
+                self.handle_status(f"MQTT连接断开，{delay:.1f} 秒后重连...", "red")
+                self.wait(delay)
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            self.attempt = 0
+            resumed = " (已恢复会话)" if flags.session_present else ""
+            self.handle_status(f"已连接到MQTT服务器{resumed}", "green")
+            client.subscribe([(topic, self.qos) for topic in self.topics])
+        else:
+            self.connected = False
+            self.handle_status(f"连接失败（代码 {reason_code}）", "red")
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.connected = False
+
+    def on_message(self, client, userdata, message):
+        self.handle_message(message.topic, message.payload)
@@ -0,0 +1,17 @@
+import os
+
+
+def cache_dir(*parts):
+    """返回（并创建）本系统的本地缓存目录，遵循 XDG_CACHE_HOME"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "health_test", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_dir(*parts):
+    """返回（并创建）需要长期保存的数据目录，遵循 XDG_DATA_HOME"""
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    path = os.path.join(base, "health_test", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
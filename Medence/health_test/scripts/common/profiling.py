@@ -0,0 +1,253 @@
+"""可选的性能诊断：CPU 剖析、内存快照与界面线程卡顿检测
+
+默认关闭。设置环境变量 HEALTH_PROFILE 或在命令行加 --profile 后启用：
+    HEALTH_PROFILE=1 / --profile        启用 cpu、mem、stall
+    HEALTH_PROFILE=sample,stall         按逗号选择：cpu（cProfile 确定性剖析）、
+                                        sample（定时采样界面线程调用栈）、
+                                        mem（tracemalloc）、stall（卡顿检测）
+    HEALTH_PROFILE_STALL_MS=16          界面线程阻塞超过该时长即记录调用栈
+    HEALTH_PROFILE_DIR=/path            输出目录，默认 ~/.cache/health_test/profiles
+
+进程退出时或收到 SIGUSR1 时把结果写入 <输出目录>/<模块>-<pid>/：
+cpu.prof（可用 pstats / snakeviz 查看）与 cpu.txt、samples.txt（折叠栈格式，
+可直接生成火焰图）、memory.txt、stalls.txt。
+"""
+import atexit
+import collections
+import io
+import os
+import signal
+import sys
+import threading
+import time
+import traceback  # 卡顿时在监视线程中使用，提前导入
+
+from PyQt5.QtCore import QCoreApplication, QObject, Qt, QTimer
+
+from common.paths import cache_dir
+from common.timing import percentiles
+
+PROFILE_ENV = "HEALTH_PROFILE"
+FEATURES = ("cpu", "sample", "mem", "stall")
+DEFAULT_FEATURES = ("cpu", "mem", "stall")
+SAMPLE_INTERVAL_S = 0.005
+MEMORY_FRAMES = 25
+
+
+def requested_features():
+    """解析环境变量与命令行，未启用时返回空元组"""
+    value = os.environ.get(PROFILE_ENV, "").strip().lower()
+    if "--profile" in sys.argv and not value:
+        value = "1"
+    if value in ("", "0", "off", "no"):
+        return ()
+    if value in ("1", "on", "yes", "all"):
+        return DEFAULT_FEATURES
+    features = tuple(f.strip() for f in value.split(",") if f.strip())
+    unknown = set(features) - set(FEATURES)
+    if unknown:
+        print(f"未知的 {PROFILE_ENV} 选项: {', '.join(sorted(unknown))}，可选: {', '.join(FEATURES)}")
+    return tuple(f for f in features if f in FEATURES)
+
+
+def format_stack(frame, limit=30):
+    return "".join(traceback.format_stack(frame, limit=limit))
+
+
+class StallWatchdog(QObject):
+    """界面线程心跳 + 监视线程：心跳中断超过阈值时抓取界面线程的调用栈
+
+    每次卡顿只在首次发现时抓一次栈，卡顿结束后补记总时长。
+    """
+
+    def __init__(self, threshold_ms=16, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000.0
+        self.interval = max(1, threshold_ms // 2)
+        self.gui_ident = threading.get_ident()
+        self.stalls = []  # (开始时间, 时长秒, 调用栈)
+        self.lock = threading.Lock()
+        self.last_beat = time.monotonic()
+        self.stopping = threading.Event()
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.beat)
+        self.timer.start(self.interval)
+        self.thread = threading.Thread(target=self.watch, name="stall-watchdog", daemon=True)
+        self.thread.start()
+
+    def beat(self):
+        self.last_beat = time.monotonic()
+
+    def watch(self):
+        # 心跳本身有 interval 的间隔，超出部分才算阻塞
+        limit = self.threshold + self.interval / 1000.0
+        current = None  # 正在进行的卡顿: [最后心跳时间, 调用栈, 已阻塞秒数]
+        while not self.stopping.wait(self.threshold / 4):
+            beat = self.last_beat
+            gap = time.monotonic() - beat
+            if current is not None and beat != current[0]:
+                self.record(current[0], current[2], current[1])
+                current = None
+            if current is None and gap > limit:
+                frame = sys._current_frames().get(self.gui_ident)
+                stack = format_stack(frame) if frame is not None else "(无法获取调用栈)\n"
+                current = [beat, stack, gap]
+            elif current is not None:
+                current[2] = gap
+
+    def record(self, beat, gap, stack):
+        with self.lock:
+            self.stalls.append((time.time() - (time.monotonic() - beat), gap, stack))
+
+    def stop(self):
+        self.stopping.set()
+        self.timer.stop()
+
+    def report(self):
+        with self.lock:
+            stalls = list(self.stalls)
+        durations = [gap * 1000 for _, gap, _ in stalls]
+        lines = [f"阈值 {self.threshold * 1000:.0f} ms，共 {len(stalls)} 次卡顿，"
+                 f"时长 ms {percentiles(durations)}，最长 {max(durations, default=0):.1f} ms\n"]
+        for started, gap, stack in sorted(stalls, key=lambda s: -s[1]):
+            stamp = time.strftime("%H:%M:%S", time.localtime(started))
+            lines.append(f"\n== {stamp} 阻塞 {gap * 1000:.1f} ms ==\n{stack}")
+        return "".join(lines)
+
+
+class StackSampler:
+    """定时采样界面线程调用栈，按折叠栈计数（开销与调用次数无关）"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.gui_ident = threading.get_ident()
+        self.counts = collections.Counter()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.gui_ident)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.counts[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopping.set()
+
+    def report(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class Profiler:
+    def __init__(self, name, features, stall_ms=16, out_dir=None):
+        self.name = name
+        self.features = features
+        base = out_dir or os.environ.get("HEALTH_PROFILE_DIR") or cache_dir("profiles")
+        self.out_dir = os.path.join(base, f"{name}-{os.getpid()}")
+        self.dump_lock = threading.Lock()
+        self.running = True
+
+        # 剖析相关的标准库只在启用时导入
+        import cProfile
+        import tracemalloc
+
+        self.cpu = None
+        if "cpu" in features:
+            self.cpu = cProfile.Profile()
+            self.cpu.enable()
+        self.sampler = StackSampler() if "sample" in features else None
+        self.memory_baseline = None
+        if "mem" in features:
+            tracemalloc.start(MEMORY_FRAMES)
+            self.memory_baseline = tracemalloc.take_snapshot()
+        self.watchdog = StallWatchdog(stall_ms) if "stall" in features else None
+
+    def dump(self):
+        """把当前结果写入输出目录（可多次调用，后一次覆盖前一次）
+
+        由 SIGUSR1 处理函数与 atexit 在主线程调用：导出过程中再次收到信号时处理函数会在
+        同一线程重入，此时跳过这一次，不能等锁（会死锁）。
+        """
+        if not self.dump_lock.acquire(blocking=False):
+            print("性能诊断结果正在导出，忽略本次请求")
+            return
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            if self.cpu is not None:
+                self.cpu.disable()
+                self.cpu.dump_stats(os.path.join(self.out_dir, "cpu.prof"))
+                import pstats
+                text = io.StringIO()
+                pstats.Stats(self.cpu, stream=text).sort_stats("cumulative").print_stats(40)
+                self.write("cpu.txt", text.getvalue())
+                if self.running:
+                    self.cpu.enable()
+            if self.sampler is not None:
+                self.write("samples.txt", self.sampler.report())
+            if self.memory_baseline is not None:
+                self.write("memory.txt", self.memory_report())
+            if self.watchdog is not None:
+                self.write("stalls.txt", self.watchdog.report())
+        finally:
+            self.dump_lock.release()
+        print(f"性能诊断结果已写入 {self.out_dir}")
+
+    def memory_report(self):
+        import tracemalloc
+        # 排除 tracemalloc 与本模块自身的分配
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"当前 {current / 1024:.0f} KiB，峰值 {peak / 1024:.0f} KiB\n\n按代码行占用前 30:\n"]
+        lines += [f"{stat}\n" for stat in snapshot.statistics("lineno")[:30]]
+        lines.append("\n启动以来增长前 30:\n")
+        lines += [f"{stat}\n" for stat in snapshot.compare_to(self.memory_baseline, "lineno")[:30]]
+        return "".join(lines)
+
+    def write(self, filename, text):
+        with open(os.path.join(self.out_dir, filename), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def stop(self):
+        self.running = False
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.cpu is not None:
+            self.cpu.disable()
+
+
+def install(name):
+    """在创建 QApplication 之后调用；未启用时返回 None，不产生任何开销"""
+    features = requested_features()
+    if not features:
+        return None
+    stall_ms = int(os.environ.get("HEALTH_PROFILE_STALL_MS", "16"))
+    profiler = Profiler(name, features, stall_ms)
+
+    def dump_at_exit():
+        profiler.stop()
+        profiler.dump()
+
+    # 事件循环结束时停止采集（此时 Qt 对象仍有效），进程退出前写出结果
+    QCoreApplication.instance().aboutToQuit.connect(profiler.stop)
+    atexit.register(dump_at_exit)
+
+    # Python 信号处理要等到下一次执行 Python 代码时才运行；
+    # 卡顿检测的心跳定时器保证界面空闲时也能及时响应，未启用时另设一个空定时器
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.dump())
+    if profiler.watchdog is None:
+        profiler.signal_timer = QTimer()
+        profiler.signal_timer.timeout.connect(lambda: None)
+        profiler.signal_timer.start(250)
+    print(f"性能诊断已启用: {', '.join(features)}，kill -USR1 {os.getpid()} 可随时导出")
+    return profiler
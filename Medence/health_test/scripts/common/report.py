@@ -0,0 +1,280 @@
+"""体检报告：在独立的工作进程池中生成 HTML（可选 PDF）报告
+
+界面线程只收集本次检测数据、提交任务，模板填充、趋势图（内联 SVG）与写文件
+都在工作进程中完成，生成多份报告时界面和正在进行的检测不受影响。
+工作进程以 spawn 方式启动（不复制 Qt 进程状态）并降低调度优先级；
+模板、徽标和字体设置在每个工作进程启动时读取一次，之后的任务直接复用。
+PDF 需要安装 weasyprint，未安装时改为输出 HTML。
+"""
+import base64
+import html
+import os
+import re
+import string
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from common.paths import data_dir
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_assets")
+WORKER_NICE = 10
+
+# 报告中的项目：(行标题, 模块, 字段, 单位, 小数位)
+ROWS = (
+    ("身高", "height", "height_cm", "cm", 1),
+    ("体重", "weight", "weight_kg", "kg", 1),
+    ("BMI", "weight", "bmi", "", 1),
+    ("血氧饱和度", "vitals", "spo2", "%", 0),
+    ("体温", "vitals", "temp", "°C", 1),
+    ("心率", "vitals", "bpm", "次/分", 0),
+    ("色觉", "color", "score", "", 0),
+    ("视力（左）", "eyes", "left", "", 1),
+    ("视力（右）", "eyes", "right", "", 1),
+)
+
+# 趋势图：历史库中的指标 -> (标题, 单位, 换算系数)
+CHARTS = (
+    ("height.height_cm", "身高", "cm", 1.0),
+    ("weight.weight_g", "体重", "kg", 0.001),
+    ("vitals.spo2", "血氧饱和度", "%", 1.0),
+    ("vitals.temp", "体温", "°C", 1.0),
+)
+
+_assets = None  # 工作进程内缓存的模板与静态资源
+
+
+def init_worker(asset_dir, font_family):
+    """工作进程初始化：降低优先级，读取并缓存模板、徽标与字体设置"""
+    try:
+        os.nice(WORKER_NICE)
+    except OSError:
+        pass
+    load_assets(asset_dir, font_family)
+
+
+def load_assets(asset_dir, font_family):
+    global _assets
+    with open(os.path.join(asset_dir, "report.html"), encoding="utf-8") as f:
+        template = string.Template(f.read())
+    with open(os.path.join(asset_dir, "logo.svg"), "rb") as f:
+        logo = "data:image/svg+xml;base64," + base64.b64encode(f.read()).decode("ascii")
+    families = [font_family, "Noto Sans CJK SC", "WenQuanYi Micro Hei", "sans-serif"]
+    font = ", ".join(name if name == "sans-serif" else f"'{name}'" for name in dict.fromkeys(families) if name)
+    try:
+        import weasyprint
+    except ImportError:
+        weasyprint = None
+    _assets = {"template": template, "logo": logo, "font_family": font, "weasyprint": weasyprint}
+
+
+def derived_values(results):
+    """各模块结果整理为报告字段，体重换算为 kg 并计算 BMI"""
+    values = {module: dict(data) for module, data in results.items()}
+    weight = values.get("weight", {})
+    if isinstance(weight.get("weight_g"), (int, float)):
+        weight["weight_kg"] = weight["weight_g"] / 1000.0
+        height = values.get("height", {}).get("height_cm")
+        if isinstance(height, (int, float)) and height > 0:
+            weight["bmi"] = weight["weight_kg"] / (height / 100.0) ** 2
+    return values
+
+
+def assess(field, value, data):
+    """返回 (参考说明, 是否需要关注)；无法判断时为 ("", False)"""
+    if field == "bmi":
+        if value < 18.5:
+            return "偏瘦（18.5–23.9）", True
+        if value < 24:
+            return "正常（18.5–23.9）", False
+        return ("超重" if value < 28 else "肥胖") + "（18.5–23.9）", True
+    if field == "spo2":
+        return ("正常" if value >= 95 else "偏低") + "（≥95%）", value < 95
+    if field == "temp":
+        normal = 36.0 <= value <= 37.3
+        return ("正常" if normal else "异常") + "（36.0–37.3°C）", not normal
+    if field == "bpm":
+        normal = 60 <= value <= 100
+        return ("正常" if normal else "异常") + "（60–100）", not normal
+    if field == "score" and "normal" in data:
+        return ("色觉正常" if data["normal"] else "疑似色觉异常"), not data["normal"]
+    if field in ("left", "right"):
+        return ("正常" if value >= 1.0 else "偏低") + "（≥1.0）", value < 1.0
+    return "", False
+
+
+def format_value(module, field, value, unit, digits, data):
+    if module == "color" and field == "score":
+        return f"{value:.0f}/{data['asked']}" if "asked" in data else f"{value:.0f}"
+    if isinstance(value, str):
+        return html.escape(value)
+    return f"{value:.{digits}f} {unit}".strip()
+
+
+def numeric(value):
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def table_rows(current, previous):
+    rows = []
+    for title, module, field, unit, digits in ROWS:
+        data = current.get(module, {})
+        value = data.get(field)
+        before = previous.get(module, {}).get(field)
+        cells = [html.escape(title)]
+        if value is None:
+            cells.append('<span class="muted">未检测</span>')
+            note, attention = "", False
+        else:
+            number = numeric(value)
+            note, attention = assess(field, number, data) if number is not None else ("", False)
+            text = format_value(module, field, value, unit, digits, data)
+            css = "attention" if attention else "normal" if note else None
+            cells.append(f'<span class="{css}">{text}</span>' if css else text)
+        cells.append(format_value(module, field, before, unit, digits, previous.get(module, {}))
+                     if before is not None else '<span class="muted">-</span>')
+        cells.append(html.escape(note))
+        rows.append("  <tr><td>{}</td><td class=\"value\">{}</td><td>{}</td><td>{}</td></tr>".format(*cells))
+    return "\n".join(rows)
+
+
+def svg_chart(points, unit, width=320, height=120):
+    """折线图（内联 SVG），points 为按时间升序的 (ts, value)"""
+    pad_left, pad_right, pad_y = 40, 10, 14
+    times = [t for t, _ in points]
+    values = [v for _, v in points]
+    low, high = min(values), max(values)
+    if high - low < 1e-9:
+        low, high = low - 1, high + 1
+    start, end = times[0], times[-1] if times[-1] > times[0] else times[0] + 1
+
+    def x(t):
+        return pad_left + (t - start) / (end - start) * (width - pad_left - pad_right)
+
+    def y(v):
+        return height - pad_y - (v - low) / (high - low) * (height - 2 * pad_y)
+
+    path = " ".join(f"{x(t):.1f},{y(v):.1f}" for t, v in points)
+    dots = "".join(f'<circle cx="{x(t):.1f}" cy="{y(v):.1f}" r="2.5" fill="#0984e3"/>' for t, v in points)
+    first = time.strftime("%Y-%m-%d", time.localtime(start))
+    last = time.strftime("%Y-%m-%d", time.localtime(times[-1]))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%">'
+            f'<text x="2" y="{pad_y}" font-size="10" fill="#636e72">{high:.1f}{unit}</text>'
+            f'<text x="2" y="{height - pad_y + 4}" font-size="10" fill="#636e72">{low:.1f}{unit}</text>'
+            f'<line x1="{pad_left}" y1="{height - pad_y}" x2="{width - pad_right}" y2="{height - pad_y}" stroke="#dfe6e9"/>'
+            f'<polyline points="{path}" fill="none" stroke="#0984e3" stroke-width="1.5"/>{dots}'
+            f'<text x="{pad_left}" y="{height - 1}" font-size="9" fill="#b2bec3">{first}</text>'
+            f'<text x="{width - pad_right}" y="{height - 1}" font-size="9" fill="#b2bec3" text-anchor="end">{last}</text>'
+            '</svg>')
+
+
+def charts_html(trends):
+    blocks = []
+    for metric, title, unit, scale in CHARTS:
+        points = [(t, v * scale) for t, v in trends.get(metric, ())]
+        if len(points) < 2:
+            continue
+        blocks.append(f'<div class="chart"><h3>{html.escape(title)}趋势（近 {len(points)} 次）</h3>'
+                      f'{svg_chart(points, unit)}</div>')
+    return f'<div class="charts">\n{"".join(blocks)}\n</div>' if blocks else ""
+
+
+def render_report(job):
+    """在工作进程中执行：生成报告文件并返回其路径"""
+    if _assets is None:  # 未经进程池直接调用（如基准测试）时就地读取
+        load_assets(ASSET_DIR, job.get("font_family", ""))
+    previous = derived_values(job.get("previous", {}))
+    document = _assets["template"].substitute(
+        title="健康体检报告",
+        font_family=_assets["font_family"],
+        logo=_assets["logo"],
+        person=html.escape(job.get("person") or "未登记"),
+        date=time.strftime("%Y-%m-%d %H:%M", time.localtime(job["started"])),
+        rows=table_rows(derived_values(job["results"]), previous),
+        charts=charts_html(job.get("trends", {})),
+        generated=time.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+    path = job["output"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if job.get("format") == "pdf" and _assets["weasyprint"] is not None:
+        _assets["weasyprint"].HTML(string=document).write_pdf(path)
+        return path
+    if path.endswith(".pdf"):
+        path = path[:-4] + ".html"  # 未安装 weasyprint
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(document)
+    os.replace(tmp, path)
+    return path
+
+
+def report_filename(person, started, fmt):
+    name = re.sub(r"[^\w.-]", "_", person) if person else "anonymous"
+    return f"{name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}.{fmt}"
+
+
+class ReportQueue(QObject):
+    """报告任务队列：submit 立即返回，完成或失败时在界面线程发出信号"""
+
+    finished = pyqtSignal(int, str)  # 任务号, 报告路径
+    failed = pyqtSignal(int, str)    # 任务号, 错误说明
+
+    def __init__(self, settings, font_family="", parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.font_family = font_family
+        self.executor = None
+        self.next_id = 1
+        self.pending = {}  # 任务号 -> Future
+
+    def workers(self):
+        return self.settings.workers or max(1, (os.cpu_count() or 2) - 1)
+
+    def start(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers(), mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker, initargs=(ASSET_DIR, self.font_family))
+
+    def configure(self, settings):
+        """工作进程数变化时，等现有任务完成后换用新的进程池"""
+        resize = settings.workers != self.settings.workers
+        self.settings = settings
+        if resize and self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def submit(self, job):
+        """job: person、started、results（模块 -> 数据）、previous、trends；返回任务号"""
+        if self.executor is None:
+            self.start()
+        job = dict(job, format=self.settings.format, font_family=self.font_family)
+        directory = self.settings.output_dir or data_dir("reports")
+        job["output"] = os.path.join(directory, report_filename(job.get("person"), job["started"], job["format"]))
+        job_id = self.next_id
+        self.next_id += 1
+        future = self.executor.submit(render_report, job)
+        self.pending[job_id] = future
+        # 回调在进程池的管理线程中执行，信号会排队回到界面线程
+        future.add_done_callback(lambda f, job_id=job_id: self.done(job_id, f))
+        return job_id
+
+    def done(self, job_id, future):
+        self.pending.pop(job_id, None)
+        try:
+            path = future.result()
+        except Exception as e:
+            self.failed.emit(job_id, f"{type(e).__name__}: {e}")
+        else:
+            self.finished.emit(job_id, path)
+
+    def shutdown(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
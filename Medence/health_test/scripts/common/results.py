@@ -0,0 +1,88 @@
+"""检测模块向主控程序回传进度与结果的通道
+
+帧格式：4 字节大端长度 + UTF-8 JSON 对象
+    {"module": "height", "type": "progress" | "result", "ts": 1700000000.0, "data": {...}}
+主控程序 main.py 用 QLocalServer 监听，并通过环境变量 HEALTH_RESULT_SOCKET
+把套接字路径传给子进程；单独运行模块时该变量不存在，发送自动变为空操作。
+"""
+import json
+import os
+import socket
+import struct
+import time
+
+SOCKET_ENV = "HEALTH_RESULT_SOCKET"
+HEADER = struct.Struct(">I")
+MAX_FRAME = 1 << 20
+
+
+def encode_frame(message):
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(payload)) + payload
+
+
+class FrameDecoder:
+    """增量解帧：feed 任意切分的字节流，返回已完整的消息列表"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        while len(self.buffer) >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer)
+            if length > MAX_FRAME:
+                raise ValueError(f"帧长度异常: {length}")
+            end = HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            payload = bytes(self.buffer[HEADER.size:end])
+            del self.buffer[:end]
+            messages.append(json.loads(payload.decode("utf-8")))
+        return messages
+
+
+class ResultChannel:
+    def __init__(self, module, path=None):
+        self.module = module
+        self.path = path or os.environ.get(SOCKET_ENV)
+        self.sock = None
+        self.failed = False
+
+    @property
+    def enabled(self):
+        return bool(self.path) and not self.failed
+
+    def connect(self):
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(0.5)
+            self.sock.connect(self.path)
+
+    def send(self, kind, data):
+        if not self.enabled:
+            return
+        message = {"module": self.module, "type": kind, "ts": time.time(), "data": data}
+        try:
+            self.connect()
+            self.sock.sendall(encode_frame(message))
+        except OSError as e:
+            # 主控程序不在或已退出时不影响检测本身，之后不再尝试
+            print(f"结果回传失败: {e}")
+            self.failed = True
+            self.close()
+
+    def progress(self, **data):
+        self.send("progress", data)
+
+    def result(self, **data):
+        self.send("result", data)
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
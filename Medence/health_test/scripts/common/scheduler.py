@@ -0,0 +1,173 @@
+"""多工位并行检测：同一台终端上多名受检者各自的检测场次与设备占用
+
+每台设备（身高立柱、体重秤、血氧仪、显示屏）同一时间只属于一个场次，
+一名受检者同一时间也只在一台设备上；色觉与视力检测共用显示屏。
+检测模块回传的结果按“哪个场次正在使用该模块的设备”路由到对应的受检者。
+plan / dispatch 给出空闲设备与等待中受检者的匹配，供界面提示与吞吐仿真使用。
+"""
+import itertools
+import time
+
+# 设备 -> 使用该设备的检测模块
+DEVICES = {
+    "height_post": ("height",),
+    "scale": ("weight",),
+    "oximeter": ("vitals",),
+    "screen": ("color", "eyes"),
+}
+MODULES = tuple(module for modules in DEVICES.values() for module in modules)
+
+
+class SchedulerError(Exception):
+    """设备或受检者正忙等无法开始检测的情况，消息可直接显示给操作员"""
+
+
+class Session:
+    def __init__(self, session_id, label, person=None, modules=MODULES, now=None):
+        self.id = session_id
+        self.label = label
+        self.summary = label          # 界面上显示的说明
+        self.person = person          # 历史库中的受检者，未识别时为 None
+        self.started = time.time() if now is None else now
+        self.todo = list(modules)     # 尚未完成的检测模块
+        self.done = []
+        self.active = None            # (模块, 设备)
+        self.results = {}             # 模块 -> 最新一条进度/结果消息
+        self.previous_texts = {}      # 模块 -> 上次检测结果文字
+
+    @property
+    def code(self):
+        return self.person.code if self.person is not None else None
+
+
+class SessionScheduler:
+    def __init__(self, devices=None):
+        self.devices = dict(devices or DEVICES)
+        self.device_of = {}
+        for device, modules in self.devices.items():
+            for module in modules:
+                self.device_of.setdefault(module, []).append(device)
+        self.holders = {device: None for device in self.devices}  # 设备 -> 场次
+        self.last_holders = {}  # 模块 -> 最近一次用完该检测设备的场次，接收迟到的消息
+        self.sessions = []  # 按开始时间排列的进行中场次
+        self.ids = itertools.count(1)
+
+    def open(self, label=None, person=None, modules=MODULES, now=None):
+        session_id = next(self.ids)
+        session = Session(session_id, label or f"访客 {session_id}", person, modules, now)
+        self.sessions.append(session)
+        return session
+
+    def find(self, code):
+        for session in self.sessions:
+            if code is not None and session.code == code:
+                return session
+        return None
+
+    def close(self, session):
+        if session.active is not None:
+            raise SchedulerError(f"{session.label} 正在进行检测，不能结束")
+        self.sessions.remove(session)
+
+    def free_device(self, module):
+        for device in self.device_of.get(module, ()):
+            if self.holders[device] is None:
+                return device
+        return None
+
+    def start(self, session, module):
+        """session 开始 module 检测，返回占用的设备；设备或受检者正忙时抛出 SchedulerError"""
+        if module not in self.device_of:
+            raise SchedulerError(f"未知的检测项目 {module}")
+        if session.active is not None:
+            raise SchedulerError(f"{session.label} 正在进行另一项检测")
+        device = self.free_device(module)
+        if device is None:
+            holder = self.holders[self.device_of[module][0]]
+            raise SchedulerError(f"设备正被 {holder.label} 使用")
+        self.holders[device] = session
+        session.active = (module, device)
+        return device
+
+    def finish(self, module, now=None, session=None):
+        """module 的检测结束并得到了结果，释放设备并返回对应场次；没有进行中的检测时返回 None
+
+        同类设备有多台时由调用方指明 session。
+        """
+        session = session or self.session_for(module)
+        if session is None or session.active is None or session.active[0] != module:
+            return None
+        self.release(session)
+        self.complete(session, module)
+        return session
+
+    def release(self, session, keep_route=False):
+        """只释放 session 占用的设备，不记为已完成（检测程序启动失败或没有给出结果就退出）
+
+        keep_route 为 True 时，该模块之后回传的消息仍路由到 session（进程退出后才读到的最终结果）。
+        """
+        if session.active is None:
+            return None
+        module, device = session.active
+        self.holders[device] = None
+        session.active = None
+        if keep_route:
+            self.last_holders[module] = session
+        return session
+
+    def complete(self, session, module):
+        """收到 module 的最终结果：记为已完成，之后迟到的消息也归这个场次"""
+        self.last_holders[module] = session
+        if module in session.todo:
+            session.todo.remove(module)
+            session.done.append(module)
+
+    def session_for(self, module):
+        """正在进行 module 检测的场次，用于结果路由"""
+        for device in self.device_of.get(module, ()):
+            session = self.holders[device]
+            if session is not None and session.active[0] == module:
+                return session
+        return None
+
+    def route(self, module):
+        """模块回传消息所属的场次：正在检测的场次，或刚结束该检测的场次
+
+        检测程序在退出前发送最终结果，发现进程退出与读到最后一条消息的先后不确定。
+        """
+        session = self.session_for(module)
+        if session is None:
+            session = self.last_holders.get(module)
+            if session not in self.sessions:
+                return None
+        return session
+
+    def plan(self):
+        """空闲设备与等待中受检者的匹配 [(场次, 模块), ...]，不改变状态
+
+        按到达先后排：先到的受检者优先拿到空闲设备，尽快做完离开
+        （按空闲时间轮流会让所有人都只做了一半）；同一受检者有多项可做时，
+        优先做剩余需求最多的设备（瓶颈优先）。
+        """
+        free = {device for device, holder in self.holders.items() if holder is None}
+        backlog = {device: 0 for device in self.devices}
+        for session in self.sessions:
+            for module in session.todo:
+                for device in self.device_of.get(module, ()):
+                    backlog[device] += 1
+        matches = []
+        for session in self.sessions:
+            if session.active is not None:
+                continue
+            options = [(backlog[device], module, device) for module in session.todo
+                       for device in self.device_of.get(module, ()) if device in free]
+            if not options:
+                continue
+            _, module, device = max(options, key=lambda option: option[0])
+            free.discard(device)
+            matches.append((session, module))
+        return matches
+
+    def dispatch(self):
+        """按 plan 立即开始检测，返回 [(场次, 模块, 设备), ...]"""
+        return [(session, module, self.start(session, module)) for session, module in self.plan()]
@@ -0,0 +1,400 @@
+"""传感器数据源：串口、MQTT 与文件回放统一为按批取出的带时间戳读数
+
+各检测模块的用法相同，与设备和接入方式无关：
+    source = SerialSource("height", parse_height, port, baud)
+    source.open()
+    # 定时器中
+    for sample in source.poll():
+        ...  # sample.device / sample.ts / sample.values / sample.host_ns / sample.device_ns
+poll 不阻塞，返回上次调用以来到达的全部读数（一批）；不依赖 Qt 的程序可用 batches() 迭代。
+新增一种传感器只需写一个解析函数（一条原始记录 bytes -> 读数字典，无法识别时返回 None），
+新增一种接入方式只需实现一个后端（open / read_records / close）。
+
+无法解析的记录计入 invalid，不生成读数；每次 poll 收到的字节数记在 received，供看门狗判断
+“无数据”还是“乱码”。设置环境变量 HEALTH_SENSOR_RECORD=目录 后，各数据源把收到的原始记录
+写入 <目录>/<设备>-<pid>.jsonl，可用 ReplaySource（或在配置的端口处填 replay:文件路径）回放。
+
+每条记录在进程收到时打上 time.monotonic_ns()（host_ns）。设备在数据中带有序号（串口行尾 #123，
+JSON 的 seq）或时钟计数（串口行尾 @123456、JSON 的 ticks_ms，单位 ms）时，按设备用
+common.clock.ClockAligner 对齐到主机时钟，得到 device_ns（设备产生读数的主机时刻）；
+MQTT 设备只带 ts 时用 ts 对齐。每台设备的延迟、抖动直方图与时钟漂移见 timing_report()，
+模块调用 install_timing_report 后 kill -USR2 <pid> 可随时导出。
+"""
+import collections
+import json
+import os
+import signal
+import threading
+import time
+import weakref
+
+from common.clock import DeviceTiming
+
+RECORD_ENV = "HEALTH_SENSOR_RECORD"
+REPLAY_PREFIX = "replay:"
+MAX_LINE = 4096     # 串口一行的最大长度，超过仍无换行时按乱码丢弃
+DEFAULT_BATCH = 200
+
+# 读数中可作为设备时钟的字段，按优先顺序（读出后从读数字典中移除，ts 另作 Sample.ts）
+CLOCK_FIELDS = ("ticks_ms", "seq", "ts")
+SERIAL_COUNTERS = {"#": "seq", "@": "ticks_ms"}
+
+# 读数：设备名、时间戳（设备上报的 ts 优先，否则为到达时刻，Unix 秒）、读数字典、
+# 到达时的 monotonic_ns、对齐到主机时钟的设备时刻（没有设备时钟或尚未拟合时为 None）
+Sample = collections.namedtuple("Sample", "device ts values host_ns device_ns")
+
+SOURCES = weakref.WeakSet()  # 供 timing_report 汇总
+
+
+def split_counter(text):
+    """"172.5 cm #123" -> ("172.5 cm", {"seq": 123})；行尾没有序号或时钟计数时原样返回"""
+    if not text[-1:].isdigit():
+        return text, {}
+    head, _, tail = text.rpartition(" ")
+    field = SERIAL_COUNTERS.get(tail[:1])
+    if head and field and tail[1:].isdigit():
+        return head, {field: int(tail[1:])}
+    return text, {}
+
+
+def parse_height(raw):
+    """b"height: 172.5 cm" -> {"height_cm": 172.5}"""
+    text, values = split_counter(raw.decode("utf-8", errors="replace").strip().lower())
+    if "height" not in text or "cm" not in text:
+        return None
+    start, end = text.find(":") + 1, text.find("cm")
+    if not 0 < start < end:
+        return None
+    values["height_cm"] = float(text[start:end])
+    return values
+
+
+def parse_weight(raw):
+    """b"Weight: 70100.0 g" -> {"weight_g": 70100.0}"""
+    text, values = split_counter(raw.decode("utf-8", errors="replace").strip())
+    if "Weight:" not in text:
+        return None
+    values["weight_g"] = float(text.split(":")[1].split()[0])
+    return values
+
+
+def parse_vitals(raw):
+    """MQTT JSON -> {"spo2", "temp", "bpm", "ts", "seq", "ticks_ms"} 中出现的字段"""
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        return None
+    values = {key: float(data[key]) for key in ("spo2", "temp", "bpm", "ts") if data.get(key) is not None}
+    values.update((key, int(data[key])) for key in ("seq", "ticks_ms") if data.get(key) is not None)
+    return values
+
+
+class SensorSource:
+    """数据源基类：子类实现 open / close / read_records"""
+
+    finished = False  # 回放到结尾时为 True，实时数据源始终为 False
+
+    def __init__(self, device, parser, batch=DEFAULT_BATCH):
+        self.device = device
+        self.parser = parser
+        self.batch = batch
+        self.received = 0       # 最近一次 poll 收到的字节数
+        self.invalid = 0        # 最近一次 poll 中无法解析的记录数
+        self.last_invalid = b""
+        self.totals = {"samples": 0, "invalid": 0, "bytes": 0}
+        self.timing = {}        # 设备名 -> DeviceTiming
+        self.recorder = None
+        SOURCES.add(self)
+
+    def open(self):
+        directory = os.environ.get(RECORD_ENV)
+        if directory and self.recorder is None:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{self.device}-{os.getpid()}.jsonl")
+            self.recorder = open(path, "a", encoding="utf-8")
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def reopen(self):
+        """看门狗判定中断时调用：关闭后重新打开，失败时抛出 OSError"""
+        self.close()
+        self.open()
+
+    def read_records(self):
+        """返回自上次调用以来到达的原始记录 [(到达时刻, monotonic_ns, 主题或 None, bytes)]，不阻塞"""
+        raise NotImplementedError
+
+    def device_for(self, topic):
+        """MQTT 主题 sensor/<设备>/combined 中的设备名；没有主题时为数据源自身的设备名"""
+        if topic:
+            parts = topic.split("/")
+            if len(parts) > 2:
+                return parts[1]
+        return self.device
+
+    def poll(self):
+        """取出一批读数；读端口出错时抛出异常，由调用方交给看门狗处理"""
+        records = self.read_records()
+        samples = []
+        received = invalid = 0
+        for arrived, host_ns, topic, raw in records:
+            received += len(raw)
+            if self.recorder is not None:
+                self.recorder.write(json.dumps({"t": arrived, "host_ns": host_ns, "topic": topic,
+                                                "raw": raw.decode("utf-8", errors="replace")},
+                                               ensure_ascii=False) + "\n")
+            try:
+                values = self.parser(raw)
+            except (ValueError, TypeError, IndexError, KeyError):
+                values = None
+            if values is None:
+                invalid += 1
+                self.last_invalid = raw
+                continue
+            device = self.device_for(topic)
+            timing = self.timing.get(device)
+            if timing is None:
+                timing = self.timing[device] = DeviceTiming()
+            clock = ticks = None
+            for field in CLOCK_FIELDS:
+                if field in values:
+                    clock, ticks = field, values[field]
+                    break
+            ts = values.pop("ts", arrived)
+            if clock is not None and clock != "ts":
+                values.pop("seq", None)
+                values.pop("ticks_ms", None)
+            device_ns = timing.observe(host_ns, clock, ticks)
+            samples.append(Sample(device, ts, values, host_ns, device_ns))
+        self.received, self.invalid = received, invalid
+        self.totals["samples"] += len(samples)
+        self.totals["invalid"] += invalid
+        self.totals["bytes"] += received
+        return samples
+
+    def timing_summary(self):
+        return {device: timing.summary() for device, timing in self.timing.items()}
+
+    def batches(self, interval=0.05, stop=None):
+        """不依赖 Qt 的消费方式：每 interval 秒轮询一次，逐批产出；回放结束或 stop 被设置时返回"""
+        while stop is None or not stop.is_set():
+            batch = self.poll()
+            if batch:
+                yield batch
+            elif self.finished:
+                return
+            else:
+                time.sleep(interval)
+
+
+class SerialSource(SensorSource):
+    """串口设备：按行切分（\\n 结尾，去掉 \\r），不完整的行留到下一次读取"""
+
+    def __init__(self, device, parser, port, baud, dtr_pulse_ms=0, batch=DEFAULT_BATCH):
+        super().__init__(device, parser, batch)
+        self.port = port
+        self.baud = baud
+        self.dtr_pulse_ms = dtr_pulse_ms
+        self.ser = None
+        self.buffer = b""
+        self.lines = collections.deque()  # 已切分、超出一批的行
+        self.dtr_release = None  # 拉低 DTR 后应恢复的时刻（monotonic）
+
+    def open(self):
+        import serial
+        self.ser = serial.Serial(self.port, self.baud, timeout=0)
+        self.buffer = b""
+        self.lines.clear()
+        super().open()
+
+    def close(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except OSError:
+                pass
+            self.ser = None
+        super().close()
+
+    def reopen(self):
+        """重开串口；配置了 dtr_pulse_ms 时拉低 DTR 使设备复位，到时在下一次 poll 中恢复"""
+        super().reopen()
+        if self.dtr_pulse_ms:
+            try:
+                self.ser.dtr = False
+            except OSError as e:  # 部分 USB 转串口芯片或虚拟串口不支持
+                print(f"拉低 DTR 失败: {e}")
+            else:
+                self.dtr_release = time.monotonic() + self.dtr_pulse_ms / 1000
+
+    def read_records(self):
+        if self.dtr_release is not None and time.monotonic() >= self.dtr_release:
+            self.dtr_release = None
+            try:
+                self.ser.dtr = True
+            except OSError as e:
+                print(f"恢复 DTR 失败: {e}")
+        data = self.ser.read_all()
+        if data:
+            arrived, host_ns = time.time(), time.monotonic_ns()
+            lines = (self.buffer + data).split(b"\n")
+            self.buffer = lines.pop()
+            if len(self.buffer) > MAX_LINE:
+                lines.append(self.buffer)
+                self.buffer = b""
+            self.lines.extend((arrived, host_ns, None, line.rstrip(b"\r")) for line in lines if line.strip())
+        count = min(self.batch, len(self.lines))
+        return [self.lines.popleft() for _ in range(count)]
+
+
+class MqttSource(SensorSource):
+    """MQTT 订阅：网络线程收到的消息先进入队列，poll 在调用方线程按批取出
+
+    给出 spool（common.spool.DiskSpool）时消息先落盘，按到达顺序取出（设备上报的 ts 会因设备重启
+    或时钟重设而回退，不用于排序），断线期间由服务器补发的旧读数在重连后先于新读数到达；
+    否则使用内存队列。
+    link_class 为 common.mqtt_link.MqttLink 或 common.mqtt_async.AsyncMqttLink。
+    """
+
+    def __init__(self, device, parser, broker, port, topics, link_class, on_status=None,
+                 client_id=None, qos=1, keepalive=60, spool=None, batch=DEFAULT_BATCH):
+        super().__init__(device, parser, batch)
+        self.link_args = (broker, port, topics)
+        self.link_kwargs = {"client_id": client_id, "qos": qos, "keepalive": keepalive}
+        self.link_class = link_class
+        self.on_status = on_status or (lambda text, color: None)
+        self.spool = spool
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+        self.link = None
+
+    def open(self):
+        self.link = self.link_class(*self.link_args, on_message=self.on_message,
+                                    on_status=self.on_status, **self.link_kwargs)
+        self.link.start()
+        super().open()
+
+    def close(self):
+        if self.link is not None:
+            self.link.stop()
+            self.link = None
+        super().close()
+
+    def request_reconnect(self):
+        if self.link is not None:
+            self.link.request_reconnect()
+
+    def on_message(self, topic, payload):
+        """网络线程：打上到达时刻后只入队或落盘，不解析"""
+        arrived, host_ns = time.time(), time.monotonic_ns()
+        if self.spool is None:
+            with self.lock:
+                self.queue.append((arrived, host_ns, topic, payload))
+            return
+        self.spool.put(topic, payload, arrived, host_ns)
+
+    def read_records(self):
+        if self.spool is not None:
+            # 升级前落盘的消息没有 host_ns，以取出的时刻代替
+            now_ns = time.monotonic_ns()
+            return [(ts, now_ns if host_ns is None else host_ns, topic, bytes(payload))
+                    for ts, topic, payload, host_ns in self.spool.drain(self.batch)]
+        with self.lock:
+            count = min(self.batch, len(self.queue))
+            return [self.queue.popleft() for _ in range(count)]
+
+
+class ReplaySource(SensorSource):
+    """回放 HEALTH_SENSOR_RECORD 录下的 JSONL 文件
+
+    speed=1 按原始间隔回放（时间戳平移到当前时刻），speed=2 为两倍速；
+    speed=0 不等待，每次 poll 取出至多 batch 条并保留原始时间戳（含录制时的 host_ns），
+    用于离线分析与基准测试；按速度回放时 host_ns 为该条记录的回放时刻。
+    """
+
+    def __init__(self, device, parser, path, speed=1.0, batch=DEFAULT_BATCH):
+        super().__init__(device, parser, batch)
+        self.path = path
+        self.speed = speed
+        self.file = None
+        self.pending = None   # 已读出但还没到回放时刻的一条记录
+        self.offset = 0.0     # 原始时刻 -> 回放时刻
+        self.finished = False
+
+    def open(self):
+        self.file = open(self.path, encoding="utf-8")
+        self.pending = None
+        self.offset = None
+        self.finished = False
+        super().open()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        super().close()
+
+    def next_record(self):
+        for line in self.file:
+            if line.strip():
+                record = json.loads(line)
+                host_ns = record.get("host_ns") or int(record["t"] * 1e9)  # 早期录制没有 host_ns
+                return record["t"], host_ns, record.get("topic"), record["raw"].encode("utf-8")
+        return None
+
+    def read_records(self):
+        if self.finished:
+            return []
+        now, now_ns = time.time(), time.monotonic_ns()
+        records = []
+        while len(records) < self.batch:
+            record = self.pending or self.next_record()
+            self.pending = None
+            if record is None:
+                self.finished = True
+                break
+            t, host_ns, topic, raw = record
+            if self.speed:
+                if self.offset is None:
+                    self.offset = now - t / self.speed
+                t = t / self.speed + self.offset
+                if t > now:
+                    self.pending = record
+                    break
+                host_ns = now_ns - int((now - t) * 1e9)
+            records.append((t, host_ns, topic, raw))
+        return records
+
+
+def serial_source(device, parser, port, baud, **kwargs):
+    """按配置的端口创建数据源：replay:路径 为文件回放，其余为串口"""
+    if port.startswith(REPLAY_PREFIX):
+        return ReplaySource(device, parser, port[len(REPLAY_PREFIX):], batch=kwargs.get("batch", DEFAULT_BATCH))
+    return SerialSource(device, parser, port, baud, **kwargs)
+
+
+def timing_report():
+    """本进程所有数据源中每台设备的到达延迟、抖动直方图与时钟漂移（文本）"""
+    parts = []
+    for source in list(SOURCES):
+        for device, timing in source.timing.items():
+            parts.append(timing.report(device))
+    return "\n".join(parts) or "还没有收到读数\n"
+
+
+def install_timing_report(name):
+    """收到 SIGUSR2 时把 timing_report 写入 ~/.cache/health_test/timing/<模块>-<pid>.txt
+
+    信号处理在下一次执行 Python 代码时运行，模块的读数定时器保证空闲时也能及时响应。
+    """
+    from common.paths import cache_dir
+
+    def dump(signum, frame):
+        path = os.path.join(cache_dir("timing"), f"{name}-{os.getpid()}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(timing_report())
+        print(f"设备时间统计已写入 {path}")
+
+    signal.signal(signal.SIGUSR2, dump)
@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+import time
+
+
+class DiskSpool:
+    """有界的磁盘消息队列（SQLite），按时间戳顺序取出
+
+    网络线程只负责 put，界面线程按批 drain，突发流量先落盘再慢慢消化；
+    超出容量时丢弃最旧的记录。
+    """
+
+    def __init__(self, path, max_rows=10000):
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                topic TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                host_ns INTEGER
+            )
+        """)
+        # 旧版本建的表没有 host_ns 列
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(spool)")]
+        if "host_ns" not in columns:
+            self.db.execute("ALTER TABLE spool ADD COLUMN host_ns INTEGER")
+        self.db.execute("CREATE INDEX IF NOT EXISTS spool_ts ON spool (ts, id)")
+        self.count = self.db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def __len__(self):
+        return self.count
+
+    def put(self, topic, payload, ts=None, host_ns=None):
+        """写入一条消息，ts 缺省为到达时间；host_ns 为到达时的 time.monotonic_ns()"""
+        with self.lock:
+            self.db.execute("INSERT INTO spool (ts, topic, payload, host_ns) VALUES (?, ?, ?, ?)",
+                            (time.time() if ts is None else ts, topic, payload, host_ns))
+            self.count += 1
+            if self.count > self.max_rows:
+                overflow = self.count - self.max_rows
+                self.db.execute("""
+                    DELETE FROM spool WHERE id IN
+                    (SELECT id FROM spool ORDER BY ts, id LIMIT ?)
+                """, (overflow,))
+                self.count -= overflow
+
+    def drain(self, limit=200):
+        """按时间戳升序取出至多 limit 条消息并从队列删除，返回 (ts, topic, payload, host_ns)"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, ts, topic, payload, host_ns FROM spool ORDER BY ts, id LIMIT ?",
+                (limit,)).fetchall()
+            if rows:
+                self.db.executemany("DELETE FROM spool WHERE id = ?", [(row[0],) for row in rows])
+                self.count -= len(rows)
+        return [row[1:] for row in rows]
+
+    def peek(self, limit=200):
+        """按时间戳升序读取至多 limit 条消息但不删除，返回 (id, ts, topic, payload)
+
+        处理成功后再用 discard 删除，进程中途退出时消息仍留在队列中。
+        """
+        with self.lock:
+            return self.db.execute(
+                "SELECT id, ts, topic, payload FROM spool ORDER BY ts, id LIMIT ?",
+                (limit,)).fetchall()
+
+    def discard(self, ids):
+        with self.lock:
+            before = self.db.total_changes
+            self.db.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+            self.count -= self.db.total_changes - before
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,112 @@
+import bisect
+import time
+
+
+def now_ns():
+    """单调时钟时间戳（纳秒），不受系统时间调整影响"""
+    return time.monotonic_ns()
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """最近秩法百分位数，values 为空时返回空字典"""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    result = {}
+    for point in points:
+        rank = max(1, -(-point * len(ordered) // 100))
+        result[f"p{point}"] = round(ordered[rank - 1], 3)
+    return result
+
+
+class TrialClock:
+    """单题计时：出题请求 -> 首次绘制 -> 作答
+
+    ui_ms 为界面延迟（请求到首帧），reaction_ms 为受试者反应时间（首帧到作答）。
+    """
+
+    def __init__(self):
+        self.trials = []
+        self.current = None
+
+    def requested(self, item):
+        self.current = {"item": item, "requested_ns": now_ns(), "painted_ns": None}
+
+    def painted(self):
+        if self.current is not None and self.current["painted_ns"] is None:
+            self.current["painted_ns"] = now_ns()
+
+    def answered(self, **extra):
+        trial = self.current
+        if trial is None:
+            return None
+        trial["answered_ns"] = now_ns()
+        if trial["painted_ns"] is None:
+            trial["painted_ns"] = trial["answered_ns"]
+        trial["ui_ms"] = (trial["painted_ns"] - trial["requested_ns"]) / 1e6
+        trial["reaction_ms"] = (trial["answered_ns"] - trial["painted_ns"]) / 1e6
+        trial.update(extra)
+        self.trials.append(trial)
+        self.current = None
+        return trial
+
+    def summary(self):
+        return {
+            "count": len(self.trials),
+            "ui_ms": percentiles([t["ui_ms"] for t in self.trials]),
+            "reaction_ms": percentiles([t["reaction_ms"] for t in self.trials]),
+        }
+
+
+# 直方图桶上界（ms），大于最后一个上界的计入溢出桶
+HISTOGRAM_EDGES_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """固定对数刻度桶的计数直方图：记录只是一次二分查找，长期运行也不积累样本"""
+
+    def __init__(self, edges=HISTOGRAM_EDGES_MS):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value_ms):
+        self.counts[bisect.bisect_left(self.edges, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def quantile(self, q):
+        """q 分位数所在桶的上界（溢出桶为最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for edge, count in zip(self.edges, self.counts):
+            seen += count
+            if seen >= target:
+                return min(edge, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": round(self.total / self.count, 3),
+                "p50": round(self.quantile(0.5), 3), "p99": round(self.quantile(0.99), 3), "max": round(self.max, 3)}
+
+    def render(self, width=40):
+        """文本直方图，每行一个非空桶"""
+        if not self.count:
+            return "  (无数据)\n"
+        peak = max(self.counts)
+        lines = []
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            label = f"<= {self.edges[index]:g}" if index < len(self.edges) else f"> {self.edges[-1]:g}"
+            bar = "#" * max(1, round(count / peak * width))
+            lines.append(f"  {label:>9s} ms {count:8d} {bar}\n")
+        return "".join(lines)
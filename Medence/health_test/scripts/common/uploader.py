@@ -0,0 +1,153 @@
+"""把本机检测结果上传到汇总服务（fleet/server.py）
+
+结果先写入本地磁盘队列，后台线程按批读取、gzip 压缩后 POST 到汇总服务，
+服务确认后才从队列删除；网络中断或服务不可用时按指数退避重试，
+终端重启后继续上传未确认的结果。每条结果带全局唯一 id，重传不会重复入库。
+服务端拒收整批（400 / 422）时逐条重传，只丢弃被拒收的那几条；请求体过大（413）时把批次减半。
+"""
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from common.paths import cache_dir
+from common.spool import DiskSpool
+
+UPLOAD_PATH = "/api/results"
+MAX_BACKOFF_S = 60.0
+
+
+# 批次内容有误，原样重传不会成功；408 / 429 / 5xx 按网络故障退避重试
+REJECTED_STATUS = (400, 422)
+
+
+class BatchTooLarge(Exception):
+    """汇总服务因请求体过大拒收（413），应拆小后重传"""
+
+
+def post_batch(url, station, records, timeout=5.0):
+    """上传一个批次，返回服务端的 {"accepted", "duplicates"}
+
+    服务端拒收批次内容时抛出 ValueError，请求体过大时抛出 BatchTooLarge，其他失败抛出 OSError。
+    """
+    body = gzip.compress(json.dumps({"station": station, "results": records}).encode("utf-8"),
+                         compresslevel=5)
+    request = urllib.request.Request(
+        url.rstrip("/") + UPLOAD_PATH, data=body, method="POST",
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        if e.code in REJECTED_STATUS:
+            raise ValueError(f"汇总服务拒绝了批次: {e.code} {e.read()[:200]!r}") from None
+        if e.code == 413:
+            raise BatchTooLarge(f"汇总服务拒绝了过大的批次: {len(records)} 条") from None
+        raise
+
+
+class FleetUploader:
+    def __init__(self, settings, spool_path=None):
+        self.settings = settings
+        self.station = settings.station or socket.gethostname()
+        self.spool = DiskSpool(spool_path or os.path.join(cache_dir("fleet"), "upload.sqlite3"),
+                               settings.queue_max_rows)
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.failing = False
+        self.thread = threading.Thread(target=self.run, name="fleet-uploader", daemon=True)
+        self.thread.start()
+
+    def configure(self, settings):
+        self.settings = settings
+        self.station = settings.station or socket.gethostname()
+        self.spool.max_rows = settings.queue_max_rows
+        self.wake.set()
+
+    def enqueue(self, module, data, person=None, ts=None):
+        """登记一条结果，由后台线程择机上传"""
+        record = {"id": uuid.uuid4().hex, "person": person, "module": module,
+                  "ts": time.time() if ts is None else ts, "data": data}
+        self.spool.put(module, json.dumps(record, ensure_ascii=False).encode("utf-8"), record["ts"])
+
+    def run(self):
+        backoff = 0.0
+        while not self.stopping.is_set():
+            delay = backoff or self.settings.upload_ms / 1000.0
+            self.wake.wait(delay)
+            self.wake.clear()
+            if self.upload_pending():
+                backoff = 0.0
+            else:
+                backoff = min(MAX_BACKOFF_S, max(1.0, backoff * 2))
+
+    def upload_pending(self):
+        """上传队列中的全部结果，全部成功（或队列为空）时返回 True"""
+        limit = self.settings.batch
+        while not self.stopping.is_set():
+            rows = self.spool.peek(limit)
+            if not rows:
+                return True
+            records = [json.loads(payload) for _, _, _, payload in rows]
+            try:
+                self.post(records)
+            except BatchTooLarge as e:
+                if len(rows) > 1:
+                    limit = max(1, len(rows) // 2)
+                    continue
+                print(f"{e}，丢弃")
+            except ValueError as e:
+                print(e)
+                if len(rows) > 1:
+                    # 逐条重传，只丢弃服务端拒收的那几条
+                    if not self.upload_each(rows):
+                        return False
+                    continue
+            except OSError as e:
+                if not self.failing:
+                    print(f"结果上传失败，稍后重试: {e}")
+                    self.failing = True
+                return False
+            self.recovered()
+            self.spool.discard([row_id for row_id, _, _, _ in rows])
+        return False
+
+    def upload_each(self, rows):
+        """逐条上传被整批拒收的结果，丢弃仍被拒收的；网络故障时返回 False，剩下的留在队列"""
+        for row_id, _, _, payload in rows:
+            if self.stopping.is_set():
+                return False
+            try:
+                self.post([json.loads(payload)])
+            except (ValueError, BatchTooLarge) as e:
+                print(f"{e}，丢弃该条结果")
+            except OSError as e:
+                if not self.failing:
+                    print(f"结果上传失败，稍后重试: {e}")
+                    self.failing = True
+                return False
+            else:
+                self.recovered()
+            self.spool.discard([row_id])
+        return True
+
+    def post(self, records):
+        return post_batch(self.settings.url, self.station, records, self.settings.timeout_ms / 1000.0)
+
+    def recovered(self):
+        if self.failing:
+            print("结果上传已恢复")
+            self.failing = False
+
+    def close(self, flush_timeout=2.0):
+        """停止后台线程；尚未上传的结果留在磁盘队列中，下次启动继续"""
+        self.stopping.set()
+        self.wake.set()
+        self.thread.join(flush_timeout)
+        if not self.thread.is_alive():
+            self.spool.close()
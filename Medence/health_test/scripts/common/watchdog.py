@@ -0,0 +1,124 @@
+"""设备数据流看门狗：串口长时间没有有效读数时判定中断，由模块重开端口恢复
+
+用指数加权平均（EWMA）跟踪有效读数的到达间隔及其平均偏差（与 TCP 估计重传超时的方法相同），
+判定窗口取间隔的 STALL_FACTOR 倍与“间隔 + DEVIATION_FACTOR 倍偏差”中的较大者，
+限制在 [MIN_WINDOW_MS, stall_ms] 之间：速率稳定的设备很快判定，时快时慢的设备窗口自动放宽。
+还没学到速率时（刚打开端口）用 stall_ms。学到的是主机读到有效读数的间隔，不短于读取间隔 poll_ms。
+误判会在测量中途重开串口（体重秤还会拉低 DTR 复位），宁可多等几个周期：中断时长 p99 在 20 Hz 以上
+才在 1 秒以内，5 ~ 10 Hz 的设备 p50 约 0.8 ~ 1.2 s、p99 约 1.5 ~ 2.1 s（bench/stream_watchdog.py）。
+超过窗口没有有效读数即判定中断：期间完全没有字节为“无数据”，有字节但解析不出读数为“乱码”；
+读写串口抛出异常时立即判定。判定后立即要求重开一次端口，仍未恢复则按退避间隔重试。
+恢复后记录两个时长：重连用时（判定 -> 首个有效读数）与中断时长（上一个有效读数 -> 首个有效读数）。
+看门狗只做判定与统计，不涉及 Qt 和串口，由 check 的返回值驱动模块重开端口。
+"""
+from common.timing import now_ns, percentiles
+
+EWMA_ALPHA = 0.125
+DEVIATION_DECAY = 1 / 64
+STALL_FACTOR = 5
+DEVIATION_FACTOR = 4
+MIN_WINDOW_MS = 300
+BACKOFF_MAX_MS = 5000
+
+REASONS = {"silence": "无数据", "garbage": "数据无法解析", "error": "串口错误"}
+
+
+class StreamWatchdog:
+    def __init__(self, stall_ms=2000, clock=now_ns):
+        self.stall_ns = stall_ms * 1_000_000
+        self.clock = clock
+        self.interval_ns = None     # 有效读数到达间隔的 EWMA
+        self.deviation_ns = 0       # 到达间隔平均偏差的 EWMA
+        self.reference_ns = clock()  # 上一个有效读数（或端口打开）的时刻
+        self.last_valid_ns = None
+        self.last_bytes_ns = None
+        self.stalled_since = None   # 判定中断的时刻，正常时为 None
+        self.reason = None
+        self.attempts = 0           # 本次中断已重开端口的次数
+        self.next_reset_ns = None
+        self.stalls = 0
+        self.resets = 0
+        self.recovery_ms = []
+        self.outage_ms = []
+
+    def configure(self, stall_ms):
+        self.stall_ns = stall_ms * 1_000_000
+
+    def window_ns(self):
+        if self.interval_ns is None:
+            return self.stall_ns
+        adaptive = max(STALL_FACTOR * self.interval_ns, self.interval_ns + DEVIATION_FACTOR * self.deviation_ns)
+        return min(self.stall_ns, max(MIN_WINDOW_MS * 1_000_000, adaptive))
+
+    def received(self, nbytes):
+        """从端口读到了字节（不论能否解析）"""
+        if nbytes:
+            self.last_bytes_ns = self.clock()
+
+    def valid(self):
+        """得到一个有效读数；若此前处于中断状态，返回 (重连用时 ms, 中断时长 ms)，否则返回 None"""
+        now = self.clock()
+        recovered = None
+        if self.stalled_since is not None:
+            recovered = ((now - self.stalled_since) / 1e6, (now - self.reference_ns) / 1e6)
+            self.recovery_ms.append(recovered[0])
+            self.outage_ms.append(recovered[1])
+            self.stalled_since = None
+            self.reason = None
+            self.attempts = 0
+        elif self.last_valid_ns is not None:
+            # 中断前后的间隔不计入到达速率
+            gap = now - self.last_valid_ns
+            if self.interval_ns is None:
+                self.interval_ns = gap
+            else:
+                # 偏差升高时立即跟上、回落时缓慢衰减，偶发的迟到会让窗口放宽一段时间
+                deviation = abs(gap - self.interval_ns)
+                self.deviation_ns = deviation if deviation > self.deviation_ns else \
+                    int(DEVIATION_DECAY * deviation + (1 - DEVIATION_DECAY) * self.deviation_ns)
+                self.interval_ns = int(EWMA_ALPHA * gap + (1 - EWMA_ALPHA) * self.interval_ns)
+        self.last_valid_ns = now
+        self.reference_ns = now
+        return recovered
+
+    def fault(self):
+        """读写端口出错：不等窗口，立即判定中断"""
+        if self.stalled_since is None:
+            self.stall("error", self.clock())
+
+    def stall(self, reason, now):
+        self.stalled_since = now
+        self.reason = reason
+        self.stalls += 1
+        self.next_reset_ns = now
+
+    def check(self):
+        """定时调用；需要重开端口时返回中断原因（silence / garbage / error），否则返回 None"""
+        now = self.clock()
+        if self.stalled_since is None:
+            if now - self.reference_ns <= self.window_ns():
+                return None
+            garbage = self.last_bytes_ns is not None and self.last_bytes_ns > self.reference_ns
+            self.stall("garbage" if garbage else "silence", now)
+        if now < self.next_reset_ns:
+            return None
+        # 设备拔出等情况下重开会一直失败，重试间隔逐次加倍
+        backoff = min(BACKOFF_MAX_MS * 1_000_000, self.window_ns() << min(self.attempts, 16))
+        self.attempts += 1
+        self.resets += 1
+        self.next_reset_ns = now + backoff
+        return self.reason
+
+    @property
+    def stalled(self):
+        return self.stalled_since is not None
+
+    def summary(self):
+        return {
+            "interval_ms": round(self.interval_ns / 1e6, 1) if self.interval_ns else None,
+            "stalls": self.stalls,
+            "resets": self.resets,
+            "recovery_ms": percentiles(self.recovery_ms, (50, 100)),
+            "outage_ms": percentiles(self.outage_ms, (50, 100)),
+        }
+
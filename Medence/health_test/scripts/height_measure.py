@@ -1,5 +1,4 @@
 import sys
-import serial
 import os
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, 
                             QPushButton, QVBoxLayout, QHBoxLayout, QFrame, 
@@ -7,22 +6,36 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel,
 from PyQt5.QtCore import QTimer, Qt, QDateTime, QCoreApplication
 from PyQt5.QtGui import QFont, QColor, QPalette, QLinearGradient, QBrush
 
+from common import profiling
+from common.config import ConfigWatcher
+from common.deferred import after_first_paint
+from common.fonts import resolve_cjk_family
+from common.results import ResultChannel
+from common.sensors import install_timing_report, parse_height, serial_source
+from common.watchdog import REASONS, StreamWatchdog
+
 os.environ["DISPLAY"] = ":0"
 
 class HeightMonitor(QMainWindow):
     def __init__(self):
         super().__init__()
-        # 串口初始化
-        try:
-            self.ser = serial.Serial('/dev/ttyUSB0', 9600, timeout=0.1)
-            self.connected = True
-        except serial.SerialException as e:
-            QMessageBox.critical(self, "串口错误", f"无法打开串口:\n{str(e)}")
-            sys.exit(1)
+        # 统一配置，文件保存后由 apply_config 就地生效
+        self.config_watcher = ConfigWatcher(parent=self)
+        self.settings = self.config_watcher.config.height
+
+        # 串口在窗口首次绘制后才打开（pyserial 也在那时才导入）
+        self.source = None
+        self.connected = False
+        # 读数中断或只收到乱码时自动重开串口
+        self.watchdog = None
+
+        # 由主控程序启动时，把读数回传给主界面
+        self.channel = ResultChannel("height")
+        self.last_height = None
 
         # 界面设置
         self.setWindowTitle("身高监测系统 - 专业版")
-        self.setFixedSize(960, 530)  # 固定窗口大小
+        self.setFixedSize(self.settings.window_width, self.settings.window_height)  # 固定窗口大小
         
         # 设置现代UI风格
         self.setStyleSheet("""
@@ -162,68 +175,132 @@ class HeightMonitor(QMainWindow):
         # 定时器
         self.timer = QTimer()
         self.timer.timeout.connect(self.read_data)
-        self.timer.start(100)
+        self.timer.start(self.settings.poll_ms)
 
         # 初始化时间
         self.update_time()
+        self.config_watcher.changed.connect(self.apply_config)
+        after_first_paint(self, self.connect_serial)
+
+    def connect_serial(self):
+        self.source = serial_source("height", parse_height, self.settings.port, self.settings.baud)
+        try:
+            self.source.open()
+            self.connected = True
+        except OSError as e:
+            QMessageBox.critical(self, "串口错误", f"无法打开串口:\n{str(e)}")
+            QApplication.exit(1)
+            return
+        self.watchdog = StreamWatchdog(self.settings.stall_ms)
+
+    def apply_config(self, config):
+        """配置文件变化：按需重开串口、调整采样间隔和窗口大小"""
+        old, new = self.settings, config.height
+        self.settings = new
+        if self.watchdog is not None:
+            self.watchdog.configure(new.stall_ms)
+        if self.source is not None and ((new.port, new.baud) != (old.port, old.baud) or not self.connected):
+            source = serial_source("height", parse_height, new.port, new.baud)
+            try:
+                source.open()
+            except OSError as e:
+                self.status_bar.showMessage(f"配置已更新，但无法打开串口 {new.port}: {e}")
+            else:
+                self.source.close()
+                self.source = source
+                self.connected = True
+                self.status_bar.showMessage(f"已切换到串口 {new.port} ({new.baud})")
+        self.timer.setInterval(new.poll_ms)
+        self.setFixedSize(new.window_width, new.window_height)
 
     def update_time(self):
         current_time = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
         self.time_label.setText(current_time)
 
+    def set_indicator(self, color, border):
+        self.status_indicator.setStyleSheet(f"""
+            background-color: {color};
+            border-radius: 8px;
+            border: 1px solid {border};
+        """)
+
+    def reset_port(self, reason):
+        """看门狗判定中断：关闭并重新打开串口"""
+        self.set_indicator("#fdcb6e", "#e17055")
+        attempt = self.watchdog.attempts
+        try:
+            self.source.reopen()
+            self.connected = True
+        except OSError as e:
+            self.connected = False
+            self.status_bar.showMessage(f"数据中断（{REASONS[reason]}），第 {attempt} 次重连失败: {e}")
+        else:
+            self.status_bar.showMessage(f"数据中断（{REASONS[reason]}），已重开串口，等待数据... (第 {attempt} 次)")
+
     def read_data(self):
+        if self.watchdog is None:
+            return
+        reason = self.watchdog.check()
+        if reason is not None:
+            self.reset_port(reason)
         if not self.connected:
             return
 
         try:
-            data = self.ser.read_all().decode('utf-8', errors='ignore').strip()
-            if data:
-                self.update_time()
-                self.status_indicator.setStyleSheet("""
-                    background-color: #00b894;
-                    border-radius: 8px;
-                    border: 1px solid #00a884;
-                """)
-
-                # 解析height: X.X cm格式的数据
-                if "height" in data.lower() and "cm" in data.lower():
-                    try:
-                        start_idx = data.lower().find(":") + 1
-                        end_idx = data.lower().find("cm")
-                        if start_idx < end_idx:
-                            value_str = data[start_idx:end_idx].strip()
-                            height = float(value_str)
-                            self.height_value.setText(f"<b>{height:.1f}</b>")
-                            self.status_bar.showMessage(f"最新数据: 身高 {height:.1f} cm | 数据接收正常")
-                            
-                            # 数值变化动画效果
-                            self.height_value.setStyleSheet(f"""
-                                font-size: 100px;
-                                font-weight: bold;
-                                color: #0984e3;
-                                qproperty-alignment: AlignCenter;
-                                border-bottom: 2px solid #74b9ff;
-                            """)
-                        else:
-                            self.status_bar.showMessage(f"数据格式异常: {data}")
-                    except (ValueError, IndexError) as e:
-                        self.status_bar.showMessage(f"数据解析失败: {data} ({str(e)})")
-                        self.status_indicator.setStyleSheet("""
-                            background-color: #fdcb6e;
-                            border-radius: 8px;
-                            border: 1px solid #e17055;
-                        """)
-                else:
-                    self.status_bar.showMessage(f"未识别数据格式: {data}")
-
+            batch = self.source.poll()
         except Exception as e:
-            self.status_indicator.setStyleSheet("""
-                background-color: #d63031;
-                border-radius: 8px;
-                border: 1px solid #c0392b;
-            """)
-            self.status_bar.showMessage(f"通信错误: {str(e)}")
+            self.set_indicator("#d63031", "#c0392b")
+            self.status_bar.showMessage(f"通信错误: {str(e)}，正在重连...")
+            # 交给看门狗在下一次定时读取时重开串口
             self.connected = False
+            self.watchdog.fault()
+            return
+
+        self.watchdog.received(self.source.received)
+        if not self.source.received:
+            return
+        self.update_time()
+        if not batch:
+            # 收到数据但没有一行是 "height: X.X cm"
+            self.set_indicator("#fdcb6e", "#e17055")
+            text = self.source.last_invalid.decode("utf-8", errors="replace")
+            self.status_bar.showMessage(f"未识别数据格式: {text}")
+            return
+
+        # 一批读数只显示最新的一个
+        self.set_indicator("#00b894", "#00a884")
+        height = batch[-1].values["height_cm"]
+        self.height_value.setText(f"<b>{height:.1f}</b>")
+        self.status_bar.showMessage(f"最新数据: 身高 {height:.1f} cm | 数据接收正常")
+        self.last_height = height
+        self.channel.progress(height_cm=height)
+        recovered = self.watchdog.valid()
+        if recovered is not None:
+            self.report_recovery(*recovered)
+
+        # 数值变化动画效果
+        self.height_value.setStyleSheet(f"""
+            font-size: 100px;
+            font-weight: bold;
+            color: #0984e3;
+            qproperty-alignment: AlignCenter;
+            border-bottom: 2px solid #74b9ff;
+        """)
+
+    def report_recovery(self, recovery_ms, outage_ms):
+        self.status_bar.showMessage(f"数据已恢复：重连用时 {recovery_ms:.0f} ms，中断 {outage_ms:.0f} ms")
+        print(f"身高串口已恢复: 重连 {recovery_ms:.0f} ms，中断 {outage_ms:.0f} ms")
+
+    def closeEvent(self, event):
+        # 窗口关闭时以最后一次读数作为本次测量结果，附带串口中断与恢复统计、到达延迟与抖动
+        if self.last_height is not None:
+            link = self.watchdog.summary() if self.watchdog is not None else {}
+            timing = self.source.timing_summary() if self.source is not None else {}
+            self.channel.result(height_cm=self.last_height, link=link, timing=timing)
+        self.channel.close()
+        if self.source is not None:
+            self.source.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     # 设置高DPI缩放
@@ -233,8 +310,10 @@ if __name__ == "__main__":
         QCoreApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
     
     app = QApplication(sys.argv)
+    profiling.install("height")  # HEALTH_PROFILE 或 --profile 启用性能诊断
+    install_timing_report("height")  # kill -USR2 <pid> 导出设备时间统计
     # 设置全局字体
-    font = QFont("Microsoft YaHei", 10) if sys.platform == "linux" else QFont("Arial", 10)
+    font = QFont(resolve_cjk_family(), 10)
     app.setFont(font)
     
     window = HeightMonitor()
@@ -1,17 +1,31 @@
+import os
 import sys
-import json
+import math
 import random
+import socket
 import threading
-import paho.mqtt.client as mqtt
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout,
-                             QWidget, QHBoxLayout, QFrame)
-from PyQt5.QtCore import Qt, QTimer, QRectF
+                             QWidget, QHBoxLayout, QFrame, QTableView,
+                             QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import (Qt, QTimer, QRectF, QAbstractTableModel, QModelIndex,
+                          pyqtSignal)
 from PyQt5.QtGui import QFont, QColor, QLinearGradient, QPainter
 
-# MQTT 配置
-MQTT_BROKER = "broker.hivemq.com"
-MQTT_PORT = 1883
-MQTT_TOPIC = "sensor/combined"
+from common import profiling
+from common.config import ConfigWatcher, load_config
+from common.deferred import after_first_paint
+from common.fonts import resolve_cjk_family
+from common.paths import cache_dir
+from common.results import ResultChannel
+from common.sensors import MqttSource, install_timing_report, parse_vitals
+
+# MQTT 服务器、主题、刷新间隔与离线缓冲参数见 config.ini 的 [vitals] 节
+# 传输方式：thread（paho 网络线程）或 asyncio（经 qasync 运行在 Qt 主循环上）；
+# 事件循环在启动时确定，修改后需重启，环境变量 HEALTH_MQTT_TRANSPORT 优先
+MQTT_TRANSPORT = os.environ.get("HEALTH_MQTT_TRANSPORT") or load_config().vitals.transport
+# 设备 ts 倒退超过该秒数时视为设备重启或时钟重设，而不是重发的旧读数
+TS_RESTART_S = 5
 
 
 class GradientFrame(QFrame):
@@ -35,18 +49,38 @@ class GradientFrame(QFrame):
 
 
 class HealthMonitor(QMainWindow):
+    # 订阅主题取自配置中的哪一项
+    topic_key = "topic"
+    # 持久会话名：决定 MQTT client_id 与本地缓冲文件名
+    session_name = "vitals"
+
+    # MQTT 网络线程通过信号把状态变化交给界面线程
+    status_changed = pyqtSignal(str, str)
+
     def __init__(self):
         super().__init__()
-        self.setup_ui()
-        self.setup_mqtt()
-
         # 初始化数据
         self.bpm_simulated = 70
         self.has_received_data = False  # 标记是否收到过血氧和温度数据
+        self.last_ts = 0.0
+        # 由主控程序启动时，把最新生命体征回传给主界面
+        self.channel = ResultChannel(self.session_name)
+        self.vitals = None
+        self.vitals_dirty = False
+        # 统一配置，文件保存后由 apply_config 就地生效
+        self.config_watcher = ConfigWatcher(parent=self)
+        self.settings = self.config_watcher.config.vitals
+
+        # 离线缓冲与 MQTT 数据源在窗口首次绘制后才建立（sqlite3、paho 也在那时才导入）
+        self.source = None
+        self.spool = None
+        self.setup_ui()
+        after_first_paint(self, self.setup_mqtt)
+        self.config_watcher.changed.connect(self.apply_config)
 
     def setup_ui(self):
         self.setWindowTitle("智能健康监测系统")
-        self.setFixedSize(950, 600)
+        self.setFixedSize(self.settings.window_width, self.settings.window_height)
         self.setStyleSheet("QMainWindow { background-color: #f5f7fa; }")
 
         central_widget = QWidget()
@@ -110,27 +144,57 @@ class HealthMonitor(QMainWindow):
     def setup_mqtt(self):
         # 设置线程异常处理
         threading.excepthook = self.handle_thread_exception
-
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv311)
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
-        self.client.on_disconnect = self.on_disconnect
-
-        # 启用日志和自动重连
-        self.client.enable_logger()
-        self.client.reconnect_delay_set(min_delay=1, max_delay=120)
-
-        try:
-            self.client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
-            self.client.loop_start()
-        except Exception as e:
-            self.update_status(f"连接失败: {str(e)}", "red")
+        self.status_changed.connect(self.update_status)
+
+        from common.spool import DiskSpool
+        spool_path = os.path.join(cache_dir(), f"{self.session_name}_spool.sqlite3")
+        self.spool = DiskSpool(spool_path, self.settings.spool_max_rows)
+        self.spool_timer = QTimer(self)
+        self.spool_timer.timeout.connect(self.drain_spool)
+        self.spool_timer.start(self.settings.spool_drain_ms)
+        self.start_source()
+
+    def start_source(self):
+        # 固定 client_id 的持久会话，本次运行中断线期间的 QoS 1 消息由服务器保留并在重连后补发
+        # （启动时先清除上次运行留下的会话）；
+        # 消息在网络线程中只落盘，由 drain_spool 在界面线程按到达顺序取出
+        client_id = f"health-{self.session_name}-{socket.gethostname()}"
+        if MQTT_TRANSPORT == "asyncio":
+            from common.mqtt_async import AsyncMqttLink as link_class
+        else:
+            from common.mqtt_link import MqttLink as link_class
+        self.source = MqttSource(self.session_name, parse_vitals,
+                                 self.settings.broker, self.settings.port,
+                                 getattr(self.settings, self.topic_key), link_class,
+                                 on_status=self.status_changed.emit,
+                                 client_id=client_id, qos=1,
+                                 keepalive=self.settings.keepalive,
+                                 spool=self.spool, batch=self.settings.spool_batch)
+        self.source.open()
+
+    def apply_config(self, config):
+        """配置文件变化：服务器或主题改变时重建连接，其余参数就地调整"""
+        old, new = self.settings, config.vitals
+        self.settings = new
+        if self.source is not None:
+            link_keys = ("broker", "port", self.topic_key, "keepalive")
+            if any(getattr(old, key) != getattr(new, key) for key in link_keys):
+                self.source.close()
+                self.start_source()
+            self.source.batch = new.spool_batch
+            self.spool.max_rows = new.spool_max_rows
+            self.spool_timer.setInterval(new.spool_drain_ms)
+        if (new.window_width, new.window_height) != (old.window_width, old.window_height):
+            self.resize_window(new.window_width, new.window_height)
+
+    def resize_window(self, width, height):
+        self.setFixedSize(width, height)
 
     def handle_thread_exception(self, args):
-        """处理线程异常"""
+        """处理线程异常：只记录并通知网络线程重连，不在此处阻塞"""
         print(f"线程异常: {args.exc_type.__name__}: {args.exc_value}")
-        self.update_status("MQTT连接异常，尝试重连...", "red")
-        self.client.reconnect()
+        self.status_changed.emit("MQTT连接异常，尝试重连...", "red")
+        self.source.request_reconnect()
 
     def create_data_card(self, color1, color2, title, value):
         card = GradientFrame(color1, color2)
@@ -168,41 +232,48 @@ class HealthMonitor(QMainWindow):
 
         return card
 
-    def on_connect(self, client, userdata, flags, reason_code, properties):
-        if reason_code == 0:
-            self.update_status("已连接到MQTT服务器", "green")
-            client.subscribe(MQTT_TOPIC)
-        else:
-            self.update_status(f"连接失败（代码 {reason_code}）", "red")
-
-    def on_disconnect(self, client, userdata, rc):
-        self.update_status("MQTT连接断开，正在重连...", "red")
-
-    def on_message(self, client, userdata, message):
-        try:
-            data = json.loads(message.payload.decode())
-
-            # 更新血氧和温度数据
-            spo2 = data.get("spo2", "--")
-            temp = data.get("temp", "--")
-
-            self.spo2_value.setText(f"{spo2} %")
-            self.temp_value.setText(f"{float(temp):.1f} °C" if temp != "--" else "-- °C")
-
-            # 只有当收到有效数据时才更新心率
-            if spo2 != "--" and temp != "--":
-                if not self.has_received_data:
-                    # 第一次收到数据时初始化心率
-                    self.has_received_data = True
-                    self.update_heart_rate()
-                else:
-                    # 后续随机波动心率
-                    delta = random.choice([-1, 0, 1])
-                    self.bpm_simulated = max(65, min(75, self.bpm_simulated + delta))
-                    self.bpm_value.setText(f"{self.bpm_simulated} 次/分")
-
-        except Exception as e:
-            print(f"消息处理错误: {e}")
+    def drain_spool(self):
+        """界面线程：按到达顺序取出一批读数（含断线期间补发的数据）"""
+        for sample in self.source.poll():
+            try:
+                self.apply_reading(sample)
+            except Exception as e:
+                print(f"消息处理错误: {e}")
+        if self.source.invalid:
+            print(f"消息处理错误: {self.source.invalid} 条无法解析，如 {self.source.last_invalid[:80]!r}")
+        # 一批读数只回传最后的状态
+        if self.vitals_dirty:
+            self.vitals_dirty = False
+            self.channel.progress(**self.vitals)
+
+    def apply_reading(self, sample):
+        # 重发的旧数据不覆盖已显示的更新读数；ts 大幅倒退说明设备重启过，从新的 ts 重新比较
+        if sample.ts < self.last_ts:
+            if self.last_ts - sample.ts <= TS_RESTART_S:
+                return
+            print(f"设备时间戳倒退 {self.last_ts - sample.ts:.0f} s，按设备重启处理")
+        self.last_ts = sample.ts
+
+        # 更新血氧和温度数据
+        spo2 = sample.values.get("spo2")
+        temp = sample.values.get("temp")
+
+        self.spo2_value.setText(f"{spo2:.0f} %" if spo2 is not None else "-- %")
+        self.temp_value.setText(f"{temp:.1f} °C" if temp is not None else "-- °C")
+
+        # 只有当收到有效数据时才更新心率
+        if spo2 is not None and temp is not None:
+            if not self.has_received_data:
+                # 第一次收到数据时初始化心率
+                self.has_received_data = True
+                self.update_heart_rate()
+            else:
+                # 后续随机波动心率
+                delta = random.choice([-1, 0, 1])
+                self.bpm_simulated = max(65, min(75, self.bpm_simulated + delta))
+                self.bpm_value.setText(f"{self.bpm_simulated} 次/分")
+            self.vitals = {"spo2": spo2, "temp": temp, "bpm": self.bpm_simulated}
+            self.vitals_dirty = True
 
     def update_heart_rate(self):
         """初始化心率显示"""
@@ -214,14 +285,225 @@ class HealthMonitor(QMainWindow):
         self.status_indicator.setStyleSheet(f"font-size: 24px; color: {colors.get(color, 'gray')};")
 
     def closeEvent(self, event):
-        self.client.disconnect()
-        self.client.loop_stop()
+        if self.source is not None:
+            self.source.close()
+            self.spool_timer.stop()
+            self.drain_spool()
+            self.spool.close()
+        if self.vitals is not None:
+            timing = self.source.timing_summary() if self.source is not None else {}
+            self.channel.result(timing=timing, **self.vitals)
+        self.channel.close()
         event.accept()
 
 
+class DeviceTable:
+    """多设备状态的列式存储：每个字段一列数组，行号对应设备
+
+    NumPy 只有多设备看板用到，在创建表格时才导入，单设备界面不加载。
+    """
+
+    def __init__(self, capacity=64):
+        import numpy as np
+        self.lock = threading.Lock()
+        self.index = {}  # 设备ID -> 行号
+        self.ids = []
+        self.spo2 = np.full(capacity, np.nan, dtype=np.float32)
+        self.temp = np.full(capacity, np.nan, dtype=np.float32)
+        self.bpm = np.full(capacity, np.nan, dtype=np.float32)
+        self.updated = np.zeros(capacity, dtype=np.float64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _grow(self):
+        """容量翻倍，已有数据原样保留"""
+        import numpy as np
+        capacity = len(self.dirty) * 2
+        for name in ("spo2", "temp", "bpm"):
+            column = np.full(capacity, np.nan, dtype=np.float32)
+            column[:len(self.ids)] = getattr(self, name)[:len(self.ids)]
+            setattr(self, name, column)
+        self.updated = np.resize(self.updated, capacity)
+        dirty = np.zeros(capacity, dtype=bool)
+        dirty[:len(self.ids)] = self.dirty[:len(self.ids)]
+        self.dirty = dirty
+
+    def update(self, device_id, spo2, temp, bpm, timestamp):
+        """写入一台设备的最新读数（可在MQTT线程调用）"""
+        with self.lock:
+            row = self.index.get(device_id)
+            if row is None:
+                if len(self.ids) == len(self.dirty):
+                    self._grow()
+                row = len(self.ids)
+                self.index[device_id] = row
+                self.ids.append(device_id)
+            elif timestamp < self.updated[row]:
+                return  # 补发的旧读数不覆盖更新的状态
+            self.spo2[row] = spo2
+            self.temp[row] = temp
+            self.bpm[row] = bpm
+            self.updated[row] = timestamp
+            self.dirty[row] = True
+
+    def take_dirty(self):
+        """取出并清除脏行范围，返回 (首行, 末行, 当前行数)，无更新时首行为 -1"""
+        import numpy as np
+        with self.lock:
+            count = len(self.ids)
+            rows = np.flatnonzero(self.dirty[:count])
+            if rows.size == 0:
+                return -1, -1, count
+            self.dirty[:count] = False
+            return int(rows[0]), int(rows[-1]), count
+
+
+class DeviceTableModel(QAbstractTableModel):
+    """直接读取 DeviceTable 列数组的表格模型，不为每个字段创建控件"""
+
+    headers = ["设备", "🩸 血氧 (%)", "🌡 体温 (°C)", "❤ 心率 (次/分)", "最后更新"]
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.shown_rows = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.shown_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role != Qt.DisplayRole:
+            return None
+
+        row, col = index.row(), index.column()
+        table = self.table
+        if col == 0:
+            return table.ids[row]
+        if col == 4:
+            return time.strftime("%H:%M:%S", time.localtime(table.updated[row]))
+        value = (table.spo2, table.temp, table.bpm)[col - 1][row]
+        if math.isnan(value):
+            return "--"
+        return f"{value:.1f}" if col == 2 else f"{value:.0f}"
+
+    def refresh(self):
+        """把上一刷新周期内的所有更新合并为一次插入和一次 dataChanged"""
+        first, last, count = self.table.take_dirty()
+        if count > self.shown_rows:
+            self.beginInsertRows(QModelIndex(), self.shown_rows, count - 1)
+            self.shown_rows = count
+            self.endInsertRows()
+        if first >= 0:
+            self.dataChanged.emit(self.index(first, 0),
+                                  self.index(last, len(self.headers) - 1),
+                                  [Qt.DisplayRole])
+
+
+class MultiDeviceMonitor(HealthMonitor):
+    """多设备汇总看板：订阅通配主题，按设备汇总显示"""
+
+    topic_key = "device_topic"
+    session_name = "fleet"
+
+    def setup_ui(self):
+        self.setWindowTitle("智能健康监测系统 - 多设备看板")
+        self.resize(self.settings.window_width, self.settings.window_height)
+        self.setStyleSheet("QMainWindow { background-color: #f5f7fa; }")
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        main_layout.setContentsMargins(40, 40, 40, 40)
+        main_layout.setSpacing(20)
+
+        title = QLabel("多设备健康监测看板")
+        title.setStyleSheet("""
+            QLabel {
+                color: #2c3e50;
+                font-size: 28px;
+                font-weight: bold;
+            }
+        """)
+        title.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(title)
+
+        self.device_table = DeviceTable()
+        self.device_model = DeviceTableModel(self.device_table, self)
+
+        view = QTableView()
+        view.setModel(self.device_model)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        view.setSelectionMode(QAbstractItemView.NoSelection)
+        view.setAlternatingRowColors(True)
+        view.verticalHeader().hide()
+        # 固定行高与列宽模式，避免每次更新都重新测量内容
+        view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        view.verticalHeader().setDefaultSectionSize(32)
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        view.setStyleSheet("""
+            QTableView {
+                background-color: white;
+                border-radius: 10px;
+                font-size: 16px;
+                gridline-color: #e0e6ed;
+            }
+            QHeaderView::section {
+                background-color: #45b7d1;
+                color: white;
+                font-size: 16px;
+                font-weight: bold;
+                padding: 6px;
+                border: none;
+            }
+        """)
+        main_layout.addWidget(view, 1)
+        self.device_view = view
+
+        self.setup_status_bar(main_layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.device_model.refresh)
+        self.refresh_timer.start(self.settings.table_refresh_ms)
+
+    def apply_config(self, config):
+        super().apply_config(config)
+        self.refresh_timer.setInterval(self.settings.table_refresh_ms)
+
+    def resize_window(self, width, height):
+        # 看板窗口可自由缩放，只调整大小不固定
+        self.resize(width, height)
+
+    def apply_reading(self, sample):
+        # 设备名由数据源从主题 sensor/<设备>/combined 中取出
+        values = sample.values
+        self.device_table.update(
+            sample.device,
+            values.get("spo2", math.nan),
+            values.get("temp", math.nan),
+            values.get("bpm", math.nan),
+            sample.ts,
+        )
+
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    app.setFont(QFont("Microsoft YaHei", 10))
+    profiling.install("vitals")  # HEALTH_PROFILE 或 --profile 启用性能诊断
+    install_timing_report("vitals")  # kill -USR2 <pid> 导出设备时间统计
+    app.setFont(QFont(resolve_cjk_family(), 10))
 
 
     # 捕获未处理的异常
@@ -232,6 +514,23 @@ if __name__ == "__main__":
 
     sys.excepthook = excepthook
 
-    window = HealthMonitor()
+    if "--transport" in sys.argv[:-1]:
+        MQTT_TRANSPORT = sys.argv[sys.argv.index("--transport") + 1]
+
+    if MQTT_TRANSPORT == "asyncio":
+        # 以 qasync 事件循环替代 app.exec_()，asyncio 协程与 Qt 事件共用主线程
+        import asyncio
+        import qasync
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+
+    # --multi 启动多设备看板，默认仍为单设备界面
+    window = MultiDeviceMonitor() if "--multi" in sys.argv else HealthMonitor()
     window.show()
+
+    if MQTT_TRANSPORT == "asyncio":
+        app.lastWindowClosed.connect(loop.stop)
+        with loop:
+            loop.run_forever()
+        sys.exit(0)
     sys.exit(app.exec_())
\ No newline at end of file
@@ -1,24 +1,39 @@
 import sys
-import serial
 import os
-from PyQt5.QtWidgets import *
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QVBoxLayout,
+                             QHBoxLayout, QStatusBar, QSizePolicy, QMessageBox,
+                             QGraphicsOpacityEffect)
 from PyQt5.QtCore import QTimer, Qt, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QFont, QColor, QPalette, QLinearGradient, QBrush
-from PyQt5.QtWidgets import QGraphicsOpacityEffect
+
+from common import profiling
+from common.config import ConfigWatcher
+from common.deferred import after_first_paint
+from common.fonts import resolve_cjk_family
+from common.results import ResultChannel
+from common.sensors import SerialSource, install_timing_report, parse_weight, serial_source
+from common.watchdog import REASONS, StreamWatchdog
 
 os.environ["DISPLAY"] = ":0"
 
 class WeightMonitor(QMainWindow):
     def __init__(self):
         super().__init__()
-        try:
-            self.ser = serial.Serial('/dev/ttyACM0', 115200, timeout=0.1)
-        except serial.SerialException as e:
-            QMessageBox.critical(self, "串口错误", f"无法打开串口:\n{str(e)}")
-            sys.exit(1)
+        # 统一配置，文件保存后由 apply_config 就地生效
+        self.config_watcher = ConfigWatcher(parent=self)
+        self.settings = self.config_watcher.config.weight
+        # 串口在窗口首次绘制后才打开（pyserial 也在那时才导入）
+        self.source = None
+        self.connected = False
+        # 读数中断或只收到乱码时自动重开串口（可选拉低 DTR 使秤复位）
+        self.watchdog = None
+
+        # 由主控程序启动时，把读数回传给主界面
+        self.channel = ResultChannel("weight")
+        self.last_weight = None
 
         self.setWindowTitle("高精度体重监测系统")
-        self.setGeometry(100, 100, 1024, 768)
+        self.setGeometry(100, 100, self.settings.window_width, self.settings.window_height)
         self.setMinimumSize(600, 400)
 
         # 渐变背景
@@ -29,6 +44,8 @@ class WeightMonitor(QMainWindow):
         palette.setBrush(QPalette.Window, QBrush(gradient))
         self.setPalette(palette)
 
+        family = resolve_cjk_family()
+
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout()
@@ -37,7 +54,7 @@ class WeightMonitor(QMainWindow):
 
         # 标题
         title_label = QLabel("实时体重监测")
-        title_font = QFont("微软雅黑", 28, QFont.Bold)
+        title_font = QFont(family, 28, QFont.Bold)
         title_label.setFont(title_font)
         title_label.setAlignment(Qt.AlignCenter)
         title_label.setStyleSheet("color: #2c3e50; margin-bottom: 20px;")
@@ -46,7 +63,7 @@ class WeightMonitor(QMainWindow):
         # 状态灯
         status_layout = QHBoxLayout()
         status_label = QLabel("设备状态:")
-        status_label.setFont(QFont("微软雅黑", 14))
+        status_label.setFont(QFont(family, 14))
         status_label.setStyleSheet("color: #555;")
 
         self.status_indicator = QLabel()
@@ -72,7 +89,7 @@ class WeightMonitor(QMainWindow):
 
         # 数值标签
         self.value_label = QLabel("--")
-        value_font = QFont("微软雅黑", 64, QFont.Bold)  # 减小字体大小
+        value_font = QFont(family, 64, QFont.Bold)  # 减小字体大小
         self.value_label.setFont(value_font)
         self.value_label.setAlignment(Qt.AlignCenter)
         self.value_label.setStyleSheet("color: #2980b9;")
@@ -92,7 +109,7 @@ class WeightMonitor(QMainWindow):
 
         # 单位标签
         unit_label = QLabel("单位: 克 (g)")
-        unit_font = QFont("微软雅黑", 18)
+        unit_font = QFont(family, 18)
         unit_label.setFont(unit_font)
         unit_label.setAlignment(Qt.AlignCenter)
         unit_label.setStyleSheet("color: #7f8c8d;")
@@ -104,39 +121,124 @@ class WeightMonitor(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.setStyleSheet("background-color: transparent; color: #555; font-size: 14px;")
-        self.status_bar.showMessage("设备已连接，等待数据...")
+        self.status_bar.showMessage("正在连接设备...")
 
         central_widget.setLayout(layout)
 
         # 定时器
         self.timer = QTimer()
         self.timer.timeout.connect(self.read_data)
-        self.timer.start(100)
+        self.config_watcher.changed.connect(self.apply_config)
+        after_first_paint(self, self.connect_serial)
+
+    def connect_serial(self):
+        self.source = self.make_source(self.settings)
+        try:
+            self.source.open()
+            self.connected = True
+        except OSError as e:
+            QMessageBox.critical(self, "串口错误", f"无法打开串口:\n{str(e)}")
+            QApplication.exit(1)
+            return
+        self.watchdog = StreamWatchdog(self.settings.stall_ms)
+        self.status_bar.showMessage("设备已连接，等待数据...")
+        self.timer.start(self.settings.poll_ms)
+
+    def make_source(self, settings):
+        return serial_source("weight", parse_weight, settings.port, settings.baud,
+                             dtr_pulse_ms=settings.dtr_pulse_ms)
+
+    def apply_config(self, config):
+        """配置文件变化：按需重开串口、调整采样间隔和窗口大小"""
+        old, new = self.settings, config.weight
+        self.settings = new
+        if self.watchdog is not None:
+            self.watchdog.configure(new.stall_ms)
+        if self.source is not None and (new.port, new.baud) != (old.port, old.baud):
+            source = self.make_source(new)
+            try:
+                source.open()
+            except OSError as e:
+                self.status_bar.showMessage(f"配置已更新，但无法打开串口 {new.port}: {e}")
+            else:
+                self.source.close()
+                self.source = source
+                self.connected = True
+                self.status_bar.showMessage(f"已切换到串口 {new.port} ({new.baud})")
+        elif isinstance(self.source, SerialSource):
+            self.source.dtr_pulse_ms = new.dtr_pulse_ms
+        self.timer.setInterval(new.poll_ms)
+        if (new.window_width, new.window_height) != (old.window_width, old.window_height):
+            self.resize(new.window_width, new.window_height)
+
+    def reset_port(self, reason):
+        """看门狗判定中断：关闭并重新打开串口，配置了 dtr_pulse_ms 时拉低 DTR 使秤复位"""
+        self.status_indicator.setStyleSheet("border-radius: 10px; background-color: #f1c40f;")
+        attempt = self.watchdog.attempts
+        try:
+            self.source.reopen()
+            self.connected = True
+        except OSError as e:
+            self.connected = False
+            self.status_bar.showMessage(f"数据中断（{REASONS[reason]}），第 {attempt} 次重连失败: {e}")
+            return
+        self.status_bar.showMessage(f"数据中断（{REASONS[reason]}），已重开串口，等待数据... (第 {attempt} 次)")
 
     def read_data(self):
+        reason = self.watchdog.check()
+        if reason is not None:
+            self.reset_port(reason)
+        if not self.connected:
+            return
         try:
-            data = self.ser.read_all().decode('utf-8').strip()
-            if data:
-                self.status_indicator.setStyleSheet("border-radius: 10px; background-color: #2ecc71;")
-                lines = [line for line in data.split('\n') if line]
-                for line in lines:
-                    if 'Weight:' in line:
-                        try:
-                            weight_str = line.split(':')[1].strip().split()[0]
-                            weight = float(weight_str)
-                            self.value_label.setText(f"{weight:.1f}")
-                            self.value_animation.stop()
-                            self.value_animation.start()
-                            self.status_bar.showMessage(f"最后更新: {line.strip()}")
-                        except (IndexError, ValueError) as e:
-                            print(f"数据解析错误: {line} | {str(e)}")
+            batch = self.source.poll()
         except Exception as e:
             self.status_indicator.setStyleSheet("border-radius: 10px; background-color: #e74c3c;")
             print(f"串口读取错误: {str(e)}")
+            self.connected = False
+            self.watchdog.fault()
+            return
+
+        # 乱码不抛异常，由看门狗按“有字节但没有读数”判定
+        self.watchdog.received(self.source.received)
+        if self.source.invalid:
+            text = self.source.last_invalid.decode("utf-8", errors="replace")
+            print(f"数据解析错误: {self.source.invalid} 行无法识别，如 {text!r}")
+        if not batch:
+            return
+        # 一批读数只显示最新的一个，淡入动画每批播放一次
+        self.status_indicator.setStyleSheet("border-radius: 10px; background-color: #2ecc71;")
+        weight = batch[-1].values["weight_g"]
+        self.value_label.setText(f"{weight:.1f}")
+        self.value_animation.stop()
+        self.value_animation.start()
+        self.status_bar.showMessage(f"最后更新: Weight: {weight:.1f} g")
+        self.last_weight = weight
+        self.channel.progress(weight_g=weight)
+        recovered = self.watchdog.valid()
+        if recovered is not None:
+            self.report_recovery(*recovered)
+
+    def report_recovery(self, recovery_ms, outage_ms):
+        self.status_bar.showMessage(f"数据已恢复：重连用时 {recovery_ms:.0f} ms，中断 {outage_ms:.0f} ms")
+        print(f"体重串口已恢复: 重连 {recovery_ms:.0f} ms，中断 {outage_ms:.0f} ms")
+
+    def closeEvent(self, event):
+        # 窗口关闭时以最后一次读数作为本次测量结果，附带串口中断与恢复统计、到达延迟与抖动
+        if self.last_weight is not None:
+            link = self.watchdog.summary() if self.watchdog is not None else {}
+            timing = self.source.timing_summary() if self.source is not None else {}
+            self.channel.result(weight_g=self.last_weight, link=link, timing=timing)
+        self.channel.close()
+        if self.source is not None:
+            self.source.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    font = QFont("微软雅黑", 12)
+    profiling.install("weight")  # HEALTH_PROFILE 或 --profile 启用性能诊断
+    install_timing_report("weight")  # kill -USR2 <pid> 导出设备时间统计
+    font = QFont(resolve_cjk_family(), 12)
     app.setFont(font)
     window = WeightMonitor()
     window.show()